@@ -0,0 +1,38 @@
+"""
+Helpers shared by the AnythingLLM MCP servers (sse/ and stdio/).
+
+The servers add the AnythingLLM_MCP directory to sys.path and import from here.
+"""
+
+from .breaker import CircuitBreaker, CircuitOpenError, get_breaker
+from .cache import ResponseCache, SharedResponseCache, normalize_prompt
+from .client import AnythingLLMClient, AnythingLLMError
+from .governor import RETRY_STATUSES, UpstreamGovernor, parse_retry_after
+from .logs import configure_logging
+from .metrics import MetricsRegistry
+from .singleflight import SingleFlight
+from .sse import SSEDecoder, SSEError, SSEEvent, iter_sse_events
+from .workspaces import UnknownWorkspaceError, WorkspaceCatalog
+
+__all__ = [
+    "AnythingLLMClient",
+    "AnythingLLMError",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "RETRY_STATUSES",
+    "MetricsRegistry",
+    "ResponseCache",
+    "SharedResponseCache",
+    "SingleFlight",
+    "SSEDecoder",
+    "SSEError",
+    "SSEEvent",
+    "UnknownWorkspaceError",
+    "UpstreamGovernor",
+    "WorkspaceCatalog",
+    "configure_logging",
+    "get_breaker",
+    "iter_sse_events",
+    "normalize_prompt",
+    "parse_retry_after",
+]
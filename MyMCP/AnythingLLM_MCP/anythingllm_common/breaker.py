@@ -0,0 +1,155 @@
+"""
+Circuit breaker for an unreachable AnythingLLM backend.
+
+After ``failure_threshold`` consecutive backend failures (connection errors,
+timeouts, 5xx responses) the breaker opens and calls fail immediately with
+CircuitOpenError instead of waiting out timeouts and retries. Once
+``reset_timeout`` has passed it lets a single probe through (half-open);
+the probe's outcome closes or re-opens the circuit.
+
+Breakers are shared per base URL via get_breaker(), so every tool talking
+to the same instance sees the same state.
+"""
+
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised without contacting the backend while the circuit is open."""
+
+
+def is_backend_failure(exc: Optional[BaseException] = None, status_code: Optional[int] = None) -> bool:
+    """True for outcomes that suggest the backend is down, as opposed to a bad request."""
+    if status_code is not None:
+        return status_code >= 500
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker.
+
+    Args:
+        name: Label used in error messages (usually the base URL)
+        failure_threshold: Consecutive failures that open the circuit; 0 disables the breaker
+        reset_timeout: Seconds the circuit stays open before a probe is allowed
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self.opened = 0
+        self.last_error: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        """Build a breaker from ANYTHINGLLM_BREAKER_THRESHOLD / ANYTHINGLLM_BREAKER_RESET."""
+        try:
+            threshold = int(os.getenv("ANYTHINGLLM_BREAKER_THRESHOLD", 5))
+        except ValueError:
+            threshold = 5
+        try:
+            reset_timeout = float(os.getenv("ANYTHINGLLM_BREAKER_RESET", 30))
+        except ValueError:
+            reset_timeout = 30.0
+        return cls(name, failure_threshold=threshold, reset_timeout=reset_timeout)
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+        return self._state
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must not go out; every allowed call must be followed by record()."""
+        if self.failure_threshold <= 0:
+            return
+        state = self.state
+        if state == CLOSED:
+            return
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        self.rejected += 1
+        retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(
+            f"AnythingLLM at {self.name} is unavailable: circuit open after "
+            f"{self._failures} consecutive failures (last error: {self.last_error}); "
+            f"next attempt in {retry_in:.0f}s"
+        )
+
+    def record(self, exc: Optional[BaseException] = None, status_code: Optional[int] = None) -> None:
+        """Record the outcome of an allowed call (exception raised, or HTTP status received)."""
+        self._probing = False
+        if not is_backend_failure(exc, status_code):
+            self._failures = 0
+            self._state = CLOSED
+            return
+        self._failures += 1
+        self.last_error = f"HTTP {status_code}" if status_code is not None else f"{type(exc).__name__}: {exc}"
+        if self.failure_threshold > 0 and (self._state == HALF_OPEN or self._failures >= self.failure_threshold):
+            if self._state != OPEN:
+                self.opened += 1
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give back a half-open probe slot without an outcome (e.g. the call was cancelled)."""
+        self._probing = False
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Wrap one backend call: fail fast while open, then record the outcome of the block."""
+        self.before_call()
+        try:
+            yield
+        except Exception as e:
+            self.record(e)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.record()
+
+    def stats(self) -> dict:
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "times_opened": self.opened,
+            "rejected_calls": self.rejected,
+            "last_error": self.last_error,
+            "retry_in": round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            if state == OPEN else None,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(base_url: str) -> CircuitBreaker:
+    """Return the process-wide breaker for ``base_url``, creating it from the environment."""
+    key = base_url.rstrip("/")
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker.from_env(key)
+    return breaker
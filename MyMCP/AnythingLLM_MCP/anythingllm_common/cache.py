@@ -0,0 +1,298 @@
+"""
+Size-bounded LRU + TTL cache for AnythingLLM query/chat responses.
+
+Entries are keyed on (workspace, mode, normalized prompt). The cache is
+opt-in: with a TTL of 0 every lookup is a miss and nothing is stored.
+
+ResponseCache lives in process memory. SharedResponseCache keeps the same
+entries in a SQLite file so several worker processes see each other's
+answers and invalidations.
+
+Every invalidation also bumps a per-workspace generation. A caller that
+takes ``generation(workspace)`` before a slow upstream request and passes
+it to ``set`` never stores an answer computed before an invalidation that
+landed while the request was in flight.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+CacheKey = Tuple[str, str, str]
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse runs of whitespace so trivially different prompts share an entry."""
+    return " ".join(prompt.split())
+
+
+class ResponseCache:
+    """
+    LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Args:
+        ttl: Seconds an entry stays valid; 0 disables the cache
+        max_entries: Maximum number of entries kept before evicting the least recently used
+    """
+
+    def __init__(self, ttl: float = 0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_skips = 0
+        self._generations: Dict[str, int] = {}
+        self._cleared = 0
+
+    @classmethod
+    def from_env(cls, path: Union[str, Path, None] = None) -> "ResponseCache":
+        """
+        Build a cache from ANYTHINGLLM_QUERY_CACHE_TTL / ANYTHINGLLM_QUERY_CACHE_SIZE.
+
+        With ``path`` the entries are kept in that SQLite file (SharedResponseCache).
+        """
+        try:
+            ttl = float(os.getenv("ANYTHINGLLM_QUERY_CACHE_TTL", 0))
+        except ValueError:
+            ttl = 0
+        try:
+            max_entries = int(os.getenv("ANYTHINGLLM_QUERY_CACHE_SIZE", 256))
+        except ValueError:
+            max_entries = 256
+        if path is not None:
+            return SharedResponseCache(path, ttl=ttl, max_entries=max_entries)
+        return cls(ttl=ttl, max_entries=max_entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def make_key(workspace: str, mode: str, prompt: str) -> CacheKey:
+        return (workspace, mode, normalize_prompt(prompt))
+
+    def get(self, workspace: str, mode: str, prompt: str) -> Optional[Any]:
+        """Return the cached response, or None on a miss or expired entry."""
+        if not self.enabled:
+            return None
+        key = self.make_key(workspace, mode, prompt)
+        item = self._entries.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def generation(self, workspace: str) -> int:
+        """Counter that grows whenever ``workspace`` (or the whole cache) is invalidated."""
+        return self._cleared + self._generations.get(workspace, 0)
+
+    def set(self, workspace: str, mode: str, prompt: str, value: Any,
+            generation: Optional[int] = None) -> None:
+        """
+        Store ``value``. With ``generation`` (taken before the upstream request),
+        the value is dropped if the workspace was invalidated in the meantime.
+        """
+        if not self.enabled:
+            return
+        if generation is not None and generation != self.generation(workspace):
+            self.stale_skips += 1
+            return
+        key = self.make_key(workspace, mode, prompt)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_workspace(self, workspace: str) -> int:
+        """Drop every entry for ``workspace``; call whenever its embeddings change."""
+        stale = [key for key in self._entries if key[0] == workspace]
+        for key in stale:
+            del self._entries[key]
+        self._generations[workspace] = self._generations.get(workspace, 0) + 1
+        self.invalidations += 1
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._cleared += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "max_entries": self.max_entries,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_skips": self.stale_skips,
+        }
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    workspace TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    expires REAL NOT NULL,
+    used REAL NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (workspace, mode, prompt)
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+CREATE TABLE IF NOT EXISTS generations (
+    workspace TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# generations row bumped by clear(); workspace slugs are never empty
+_ALL = ""
+
+
+class SharedResponseCache(ResponseCache):
+    """
+    ResponseCache stored in a SQLite file shared by several processes.
+
+    Values must be JSON-serializable. Expiry uses wall-clock time so all
+    processes agree on it; hit/miss counters are per process. Generations
+    are stored in the file too, so an invalidation by one process also
+    stops the others from storing answers that raced it. Every method is a
+    short synchronous transaction (WAL mode) and may be called from the
+    event loop.
+
+    Args:
+        path: SQLite file, created if missing
+        ttl: Seconds an entry stays valid; 0 disables the cache
+        max_entries: Maximum number of entries kept across all processes
+    """
+
+    def __init__(self, path: Union[str, Path], ttl: float = 0, max_entries: int = 256):
+        super().__init__(ttl=ttl, max_entries=max_entries)
+        self.path = Path(path)
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """Run the block in one write transaction, so check-then-write steps see no other writer."""
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _bump(db: sqlite3.Connection, workspace: str) -> None:
+        db.execute(
+            "INSERT INTO generations (workspace, value) VALUES (?, 1)"
+            " ON CONFLICT (workspace) DO UPDATE SET value = value + 1",
+            (workspace,),
+        )
+
+    @staticmethod
+    def _read_generation(db: sqlite3.Connection, workspace: str) -> int:
+        return db.execute(
+            "SELECT COALESCE(SUM(value), 0) FROM generations WHERE workspace IN (?, ?)", (workspace, _ALL)
+        ).fetchone()[0]
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def get(self, workspace: str, mode: str, prompt: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        key = self.make_key(workspace, mode, prompt)
+        db = self._conn()
+        row = db.execute(
+            "SELECT expires, value FROM responses WHERE workspace = ? AND mode = ? AND prompt = ?", key
+        ).fetchone()
+        now = time.time()
+        if row is None or row[0] < now:
+            if row is not None:
+                db.execute("DELETE FROM responses WHERE workspace = ? AND mode = ? AND prompt = ?", key)
+            self.misses += 1
+            return None
+        db.execute("UPDATE responses SET used = ? WHERE workspace = ? AND mode = ? AND prompt = ?", (now, *key))
+        self.hits += 1
+        return json.loads(row[1])
+
+    def generation(self, workspace: str) -> int:
+        if not self.enabled:
+            return 0
+        return self._read_generation(self._conn(), workspace)
+
+    def set(self, workspace: str, mode: str, prompt: str, value: Any,
+            generation: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        key = self.make_key(workspace, mode, prompt)
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._write() as db:
+            if generation is not None and generation != self._read_generation(db, workspace):
+                self.stale_skips += 1
+                return
+            now = time.time()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (workspace, mode, prompt, expires, used, value)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, now + self.ttl, now, encoded),
+            )
+            excess = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                db.execute(
+                    "DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses ORDER BY used LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+
+    def invalidate_workspace(self, workspace: str) -> int:
+        if not self.enabled:
+            self.invalidations += 1
+            return 0
+        with self._write() as db:
+            removed = db.execute("DELETE FROM responses WHERE workspace = ?", (workspace,)).rowcount
+            self._bump(db, workspace)
+        self.invalidations += 1
+        return removed
+
+    def clear(self) -> None:
+        if self.enabled:
+            with self._write() as db:
+                db.execute("DELETE FROM responses")
+                self._bump(db, _ALL)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["entries"] = self._conn().execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self.enabled else 0
+        stats["shared"] = str(self.path)
+        return stats
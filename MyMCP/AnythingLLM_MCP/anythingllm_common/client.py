@@ -0,0 +1,649 @@
+"""
+Async client for the AnythingLLM developer API, shared by all MCP servers.
+
+One AnythingLLMClient owns one pooled httpx.AsyncClient and routes every
+request through the same pipeline:
+
+* the circuit breaker for the base URL (fail fast while AnythingLLM is down),
+* the UpstreamGovernor (rate limit, adaptive concurrency, backoff),
+* retries on connection errors and 429/502/503/504, honoring Retry-After
+  (a request that is not idempotent is only retried on 429, or 503 with
+  Retry-After, since the backend may already have processed it),
+* single-flight coalescing of identical concurrent GETs and queries,
+* the query ResponseCache, invalidated by every call that changes a
+  workspace's embeddings,
+* per-attempt latency, retry and upload metrics in a MetricsRegistry.
+
+Endpoint methods cover anythingllm_api.md and return the decoded JSON,
+annotated with the TypedDicts below. A failed request raises
+AnythingLLMError (or CircuitOpenError while the breaker is open).
+
+Configuration is read by from_env():
+    ANYTHINGLLM_BASE_URL, ANYTHINGLLM_API_KEY
+    ANYTHINGLLM_MAX_CONNECTIONS, ANYTHINGLLM_MAX_KEEPALIVE, ANYTHINGLLM_KEEPALIVE_EXPIRY
+    ANYTHINGLLM_CONNECT_TIMEOUT, ANYTHINGLLM_READ_TIMEOUT, ANYTHINGLLM_WRITE_TIMEOUT,
+    ANYTHINGLLM_POOL_TIMEOUT, ANYTHINGLLM_HTTP2
+plus the variables of UpstreamGovernor, ResponseCache, WorkspaceCatalog and
+CircuitBreaker.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, TypedDict, Union
+
+import httpx
+
+from .breaker import CircuitBreaker, get_breaker
+from .cache import ResponseCache
+from .governor import RETRY_STATUSES, UpstreamGovernor, parse_retry_after
+from .metrics import MetricsRegistry
+from .singleflight import SingleFlight
+from .sse import iter_sse_events
+from .workspaces import WorkspaceCatalog
+
+_log = logging.getLogger("anythingllm.client")
+
+
+# ---------- response types ----------
+class Document(TypedDict, total=False):
+    id: str
+    url: str
+    title: str
+    docAuthor: str
+    description: str
+    docSource: str
+    chunkSource: str
+    published: str
+    wordCount: int
+    token_count_estimate: int
+    location: str
+
+
+class UploadResponse(TypedDict, total=False):
+    success: bool
+    error: Optional[str]
+    documents: List[Document]
+
+
+class Workspace(TypedDict, total=False):
+    id: int
+    name: str
+    slug: str
+    createdAt: str
+    lastUpdatedAt: str
+    openAiTemp: Optional[float]
+    openAiHistory: int
+    openAiPrompt: Optional[str]
+    similarityThreshold: float
+    topN: int
+    chatMode: str
+    documents: List[dict]
+    threads: List[dict]
+
+
+class Source(TypedDict, total=False):
+    id: str
+    title: str
+    text: str
+    score: float
+    chunkSource: str
+    url: str
+
+
+class ChatResponse(TypedDict, total=False):
+    id: str
+    type: str
+    textResponse: Optional[str]
+    sources: List[Source]
+    close: bool
+    error: Optional[str]
+
+
+class StreamChunk(TypedDict, total=False):
+    uuid: str
+    type: str
+    textResponse: Optional[str]
+    sources: List[Source]
+    close: bool
+    error: Union[bool, str, None]
+
+
+class AnythingLLMError(Exception):
+    """A request failed: HTTP error status, connection error after retries, or an invalid response."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, endpoint: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.endpoint = endpoint
+
+
+# ---------- helpers ----------
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Methods whose requests may be repeated after the backend has processed them;
+# other requests (uploads, update-embeddings) are retried on a status only when
+# the backend rejected them unprocessed, see _retryable_status
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+def _retryable_status(response: httpx.Response, idempotent: bool) -> bool:
+    """Whether to retry a response; a 502/504 from a proxy may follow a request the backend processed."""
+    status = response.status_code
+    if status not in RETRY_STATUSES:
+        return False
+    return idempotent or status == 429 or (status == 503 and "Retry-After" in response.headers)
+
+
+_WORKSPACE_ENDPOINT = re.compile(r"^(/?api/v1/workspace)/[^/]+/")
+
+
+def endpoint_label(endpoint: str) -> str:
+    """Metric label for an endpoint: the workspace slug becomes {slug} to bound label cardinality."""
+    match = _WORKSPACE_ENDPOINT.match(endpoint)
+    return f"{match.group(1)}/{{slug}}/{endpoint[match.end():]}" if match else endpoint
+
+
+def _request_key(method: str, endpoint: str, payload) -> tuple:
+    """Coalescing key: method, endpoint and the canonical JSON body."""
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False) if payload is not None else None
+    return (method, endpoint, body)
+
+
+def _first(value):
+    """GET /workspace/{slug} returns a one-element list in newer AnythingLLM versions."""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+class AnythingLLMClient:
+    """
+    Pooled, retrying client for one AnythingLLM instance.
+
+    Args:
+        base_url: AnythingLLM URL, e.g. http://localhost:3001
+        api_key: Developer API key (sent as a Bearer token)
+        limits: Connection pool limits
+        timeout: Request timeouts
+        http2: Use HTTP/2 when the h2 package is installed
+        max_retries: Retries for connection errors and 429/502/503/504
+        governor: Shared UpstreamGovernor (a default one is created if omitted)
+        breaker: Circuit breaker (defaults to the process-wide breaker for base_url)
+        cache: Query response cache (disabled if omitted)
+        catalog_ttl: Seconds the workspace list is cached by ``catalog``
+        catalog_miss_refresh: Minimum seconds between catalog refreshes forced by unknown names
+        metrics: Registry receiving the upstream_* metrics (a private one if omitted)
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, *,
+                 limits: Optional[httpx.Limits] = None,
+                 timeout: Union[httpx.Timeout, float, None] = None,
+                 http2: bool = False, max_retries: int = 3,
+                 governor: Optional[UpstreamGovernor] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 cache: Optional[ResponseCache] = None,
+                 catalog_ttl: float = 60.0,
+                 catalog_miss_refresh: float = 5.0,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.limits = limits or httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+        self.timeout = timeout if timeout is not None else httpx.Timeout(120.0, connect=10.0, pool=30.0)
+        self.http2 = http2
+        self.max_retries = max_retries
+        self.governor = governor if governor is not None else UpstreamGovernor()
+        self.breaker = breaker if breaker is not None else get_breaker(self.base_url)
+        self.cache = cache if cache is not None else ResponseCache()
+        self.singleflight = SingleFlight()
+        self.catalog = WorkspaceCatalog(self.list_workspaces, ttl=catalog_ttl,
+                                        miss_refresh_interval=catalog_miss_refresh)
+        self._http: Optional[httpx.AsyncClient] = None
+        self._register_metrics(metrics if metrics is not None else MetricsRegistry())
+
+    @classmethod
+    def from_env(cls, metrics: Optional[MetricsRegistry] = None,
+                 shared_dir: Union[str, Path, None] = None) -> "AnythingLLMClient":
+        """
+        Build a client from the ANYTHINGLLM_* environment variables listed in the module docstring.
+
+        Pass ``shared_dir`` when several worker processes serve the same tools: the query
+        cache is then kept in ``shared_dir``/query_cache.sqlite3, and unknown workspace names
+        always refetch the list, since another worker may just have created the workspace.
+        """
+        return cls(
+            os.getenv("ANYTHINGLLM_BASE_URL", "http://localhost:3001"),
+            os.getenv("ANYTHINGLLM_API_KEY"),
+            limits=httpx.Limits(
+                max_connections=_env_int("ANYTHINGLLM_MAX_CONNECTIONS", 100),
+                max_keepalive_connections=_env_int("ANYTHINGLLM_MAX_KEEPALIVE", 20),
+                keepalive_expiry=_env_float("ANYTHINGLLM_KEEPALIVE_EXPIRY", 30.0),
+            ),
+            timeout=httpx.Timeout(
+                connect=_env_float("ANYTHINGLLM_CONNECT_TIMEOUT", 10.0),
+                read=_env_float("ANYTHINGLLM_READ_TIMEOUT", 120.0),
+                write=_env_float("ANYTHINGLLM_WRITE_TIMEOUT", 120.0),
+                pool=_env_float("ANYTHINGLLM_POOL_TIMEOUT", 30.0),
+            ),
+            http2=_env_bool("ANYTHINGLLM_HTTP2"),
+            governor=UpstreamGovernor.from_env(),
+            cache=ResponseCache.from_env(Path(shared_dir) / "query_cache.sqlite3" if shared_dir else None),
+            catalog_ttl=_env_float("ANYTHINGLLM_WORKSPACE_TTL", 60.0),
+            catalog_miss_refresh=0.0 if shared_dir else 5.0,
+            metrics=metrics,
+        )
+
+    def _register_metrics(self, metrics: MetricsRegistry) -> None:
+        self._seconds = metrics.histogram(
+            "upstream_request_duration_seconds", "AnythingLLM HTTP request duration per attempt",
+            ("method", "endpoint", "status"))
+        self._in_flight = metrics.gauge("upstream_requests_in_flight", "AnythingLLM HTTP requests in progress")
+        self._retries = metrics.counter(
+            "upstream_retries_total", "AnythingLLM requests retried", ("endpoint", "reason"))
+        self._uploads_in_flight = metrics.gauge("uploads_in_flight", "Document uploads in progress")
+        self._upload_bytes = metrics.counter("upload_bytes_total", "File bytes uploaded successfully")
+        metrics.gauge("upstream_queue_depth", "Requests waiting for a rate token or concurrency slot",
+                      func=lambda: self.governor.waiting)
+        metrics.gauge("upstream_concurrency_limit", "Current adaptive upstream concurrency limit",
+                      func=lambda: int(self.governor.limit))
+        metrics.counter("upstream_overloads_total", "Upstream responses treated as overload",
+                        func=lambda: self.governor.overloads)
+        metrics.gauge("circuit_breaker_state", "Circuit breaker state (1 for the current state)", ("state",),
+                      func=lambda: {(state,): int(self.breaker.state == state)
+                                    for state in ("closed", "open", "half_open")})
+        metrics.counter("circuit_breaker_rejected_total", "Calls rejected while the circuit was open",
+                        func=lambda: self.breaker.rejected)
+        metrics.counter("query_cache_hits_total", "Query cache hits", func=lambda: self.cache.hits)
+        metrics.counter("query_cache_misses_total", "Query cache misses", func=lambda: self.cache.misses)
+        metrics.counter("coalesced_requests_total", "Requests served by an identical in-flight request",
+                        func=lambda: self.singleflight.saved)
+
+    # ---------- transport ----------
+    def _transport(self) -> httpx.AsyncClient:
+        """The pooled client, created on first use (and again after aclose())."""
+        if self._http is None or self._http.is_closed:
+            http2 = self.http2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    _log.warning("h2 is not installed, falling back to HTTP/1.1 (pip install 'httpx[http2]')")
+                    http2 = False
+            self._http = httpx.AsyncClient(
+                headers=self.headers, http2=http2, limits=self.limits, timeout=self.timeout)
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def __aenter__(self) -> "AnythingLLMClient":
+        self._transport()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "circuit_breaker": self.breaker.stats(),
+            "query_cache": self.cache.stats(),
+            "coalescing": self.singleflight.stats(),
+            "upstream": self.governor.stats(),
+        }
+
+    # ---------- request pipeline ----------
+    async def request(self, method: str, endpoint: str, *, json=None, data=None, files=None,
+                      content=None, headers=None, max_retries: Optional[int] = None,
+                      coalesce: Optional[bool] = None, idempotent: Optional[bool] = None) -> Any:
+        """
+        Send a request and return the decoded JSON response.
+
+        Args:
+            content: Raw request body; must be re-iterable for retries. A body with a
+                ``file_size`` attribute (e.g. a streaming multipart upload) counts as an upload.
+            coalesce: Share one upstream call among identical concurrent requests; defaults to
+                GET only. Requests with form data, files or a raw body are never coalesced.
+            idempotent: Whether repeating the request is harmless; defaults to True for
+                IDEMPOTENT_METHODS. Other requests are retried on connection errors, 429 and
+                503 with Retry-After only, not on 502/503/504 that may follow a processed request.
+
+        Raises:
+            CircuitOpenError: if the circuit breaker is open
+            AnythingLLMError: if the request failed
+        """
+        method = method.upper()
+        if coalesce is None:
+            coalesce = method == "GET"
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        send = lambda: self._send(method, endpoint, json=json, data=data, files=files, content=content,
+                                  headers=headers, max_retries=self.max_retries if max_retries is None else max_retries,
+                                  idempotent=idempotent)
+        if coalesce and data is None and files is None and content is None:
+            return await self.singleflight.do(_request_key(method, endpoint, json), send)
+        return await send()
+
+    async def _send(self, method: str, endpoint: str, *, json, data, files, content, headers,
+                    max_retries: int, idempotent: bool) -> Any:
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        # requests of one kind (e.g. "POST chat") share a latency baseline regardless of workspace
+        governor_key = f"{method} {endpoint.rstrip('/').rsplit('/', 1)[-1]}"
+        label = endpoint_label(endpoint)
+        upload_size = getattr(content, "file_size", None)
+        # a failed connect or pool wait never reached the server and is always safe to retry;
+        # read timeouts are retried for GET only
+        retry_exceptions = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+        if method == "GET":
+            retry_exceptions += (httpx.ReadTimeout,)
+
+        client = self._transport()
+        attempt = 0
+        while True:
+            error: Optional[Exception] = None
+            retry_after = None
+            response = None
+            self.breaker.before_call()
+            try:
+                async with self.governor.slot(governor_key) as slot:
+                    self._in_flight.inc()
+                    if upload_size is not None:
+                        self._uploads_in_flight.inc()
+                    start = time.perf_counter()
+                    try:
+                        response = await client.request(
+                            method, url, json=json, data=data, files=files, content=content, headers=headers)
+                    except (httpx.ConnectError, httpx.TimeoutException) as e:
+                        slot.overloaded = True
+                        error = e
+                    except Exception as e:
+                        error = e
+                    else:
+                        if response.status_code in RETRY_STATUSES:
+                            slot.overloaded = True
+                            retry_after = slot.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    finally:
+                        if response is not None:
+                            outcome = str(response.status_code)
+                        else:
+                            outcome = type(error).__name__ if error is not None else "cancelled"
+                        self._seconds.observe(time.perf_counter() - start, method, label, outcome)
+                        self._in_flight.dec()
+                        if upload_size is not None:
+                            self._uploads_in_flight.dec()
+            except BaseException:
+                self.breaker.release()
+                raise
+            self.breaker.record(error, response.status_code if response is not None else None)
+
+            retryable = (
+                isinstance(error, retry_exceptions)
+                or (response is not None and _retryable_status(response, idempotent))
+            )
+            if retryable and attempt < max_retries:
+                delay = self.governor.backoff_delay(attempt, retry_after)
+                attempt += 1
+                reason = type(error).__name__ if error is not None else f"HTTP {response.status_code}"
+                self._retries.inc(label, reason)
+                _log.info("Request throttled or failed, retrying", extra={
+                    "endpoint": label, "reason": reason, "delay": round(delay, 2),
+                    "attempt": attempt, "max_retries": max_retries})
+                await asyncio.sleep(delay)
+                continue
+
+            if error is None:
+                try:
+                    response.raise_for_status()
+                    result = response.json()
+                except Exception as e:
+                    error = e
+                else:
+                    if upload_size is not None:
+                        self._upload_bytes.inc(amount=upload_size)
+                    return result
+            break
+
+        status = response.status_code if response is not None else None
+        _log.warning("Request failed", extra={"method": method, "endpoint": label, "status_code": status,
+                                              "error": str(error)})
+        raise AnythingLLMError(f"Request failed: {error}", status_code=status, endpoint=endpoint) from error
+
+    async def _stream(self, endpoint: str, payload: dict) -> AsyncIterator[StreamChunk]:
+        """
+        POST and yield the decoded SSE events of a streaming endpoint.
+
+        Not retried: part of the answer may already have been consumed. The
+        governor slot is held until the stream ends or the consumer stops.
+        """
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        governor_key = f"POST {endpoint.rstrip('/').rsplit('/', 1)[-1]}"
+        label = endpoint_label(endpoint)
+        status = None
+        start = time.perf_counter()
+        self.breaker.before_call()
+        try:
+            async with self.governor.slot(governor_key) as slot:
+                self._in_flight.inc()
+                try:
+                    async with self._transport().stream(
+                            "POST", url, json=payload, headers={"Accept": "text/event-stream"}) as response:
+                        status = response.status_code
+                        self._seconds.observe(time.perf_counter() - start, "POST", label, str(status))
+                        if status in RETRY_STATUSES:
+                            slot.overloaded = True
+                        response.raise_for_status()
+                        async for event in iter_sse_events(response.aiter_text()):
+                            try:
+                                yield event.json()
+                            except json.JSONDecodeError:
+                                yield {"type": "textResponseChunk", "textResponse": event.data}
+                finally:
+                    self._in_flight.dec()
+        except (GeneratorExit, asyncio.CancelledError):
+            # the consumer stopped early; the call neither failed nor completed
+            self.breaker.release()
+            raise
+        except Exception as e:
+            self.breaker.record(e, status)
+            if status is None:
+                self._seconds.observe(time.perf_counter() - start, "POST", label, type(e).__name__)
+            raise AnythingLLMError(f"Request failed: {e}", status_code=status, endpoint=endpoint) from e
+        self.breaker.record(None, status)
+
+    # ---------- auth, system, users ----------
+    async def auth(self) -> dict:
+        """Check that the API key is valid."""
+        return await self.request("GET", "/api/v1/auth")
+
+    async def system(self) -> dict:
+        """System settings and version."""
+        return await self.request("GET", "/api/v1/system")
+
+    async def embedding_models(self) -> List[dict]:
+        data = await self.request("GET", "/api/v1/system/embedding-models")
+        return data.get("embeddingModels", [])
+
+    async def llm_models(self) -> List[dict]:
+        data = await self.request("GET", "/api/v1/system/llm-models")
+        return data.get("llmModels", [])
+
+    async def users(self) -> List[dict]:
+        data = await self.request("GET", "/api/v1/users")
+        return data.get("users", [])
+
+    async def admin_users(self) -> List[dict]:
+        data = await self.request("GET", "/api/v1/admin/users")
+        return data.get("users", [])
+
+    async def create_user(self, username: str, password: str, role: str = "default") -> dict:
+        return await self.request("POST", "/api/v1/admin/users/new",
+                                  json={"username": username, "password": password, "role": role})
+
+    async def update_user(self, user_id: int, **settings) -> dict:
+        return await self.request("POST", f"/api/v1/admin/users/{user_id}", json=settings)
+
+    async def delete_user(self, user_id: int) -> dict:
+        return await self.request("DELETE", f"/api/v1/admin/users/{user_id}")
+
+    async def workspace_users(self, workspace_id: int) -> List[dict]:
+        data = await self.request("GET", f"/api/v1/admin/workspaces/{workspace_id}/users")
+        return data.get("users", [])
+
+    async def set_workspace_users(self, workspace_id: int, user_ids: List[int]) -> dict:
+        """Restrict a workspace to the given users (and admins)."""
+        return await self.request("POST", f"/api/v1/admin/workspaces/{workspace_id}/update-users",
+                                  json={"userIds": list(user_ids)})
+
+    # ---------- documents ----------
+    async def upload_file(self, path: Union[str, Path], filename: Optional[str] = None,
+                          mime_type: str = "application/octet-stream") -> UploadResponse:
+        """Upload a local file to the document store (httpx streams it from disk)."""
+        path = Path(path)
+        with open(path, "rb") as f:
+            return await self.request("POST", "/api/v1/document/upload",
+                                      files={"file": (filename or path.name, f, mime_type)})
+
+    async def upload_body(self, body) -> UploadResponse:
+        """Upload a prepared multipart body (anything with ``headers`` that can be iterated repeatedly)."""
+        return await self.request("POST", "/api/v1/document/upload", content=body, headers=body.headers)
+
+    async def documents(self) -> dict:
+        """The document store tree ({"localFiles": ...})."""
+        return await self.request("GET", "/api/v1/documents")
+
+    async def accepted_file_types(self) -> dict:
+        return await self.request("GET", "/api/v1/documents/accepted-file-types")
+
+    async def create_folder(self, name: str) -> dict:
+        return await self.request("POST", "/api/v1/document/create-folder", json={"name": name})
+
+    async def move_files(self, moves: List[Dict[str, str]]) -> dict:
+        """Move documents within the store; ``moves`` is a list of {"from": ..., "to": ...}."""
+        return await self.request("POST", "/api/v1/document/move-files", json={"files": list(moves)})
+
+    async def remove_documents(self, names: List[str]) -> dict:
+        """Permanently delete documents from the system (and from every workspace)."""
+        result = await self.request("DELETE", "/api/v1/system/remove-documents", json={"names": list(names)})
+        self.cache.clear()
+        return result
+
+    # ---------- workspaces ----------
+    async def list_workspaces(self) -> List[Workspace]:
+        data = await self.request("GET", "/api/v1/workspaces")
+        return data["workspaces"]
+
+    async def resolve_workspace(self, name: str) -> str:
+        """Workspace slug for a slug or display name (see WorkspaceCatalog.resolve)."""
+        return await self.catalog.resolve(name)
+
+    async def create_workspace(self, name: str, **settings) -> dict:
+        result = await self.request("POST", "/api/v1/workspace/new", json={"name": name, **settings})
+        self.catalog.invalidate()
+        return result
+
+    async def get_workspace(self, slug: str) -> Optional[Workspace]:
+        data = await self.request("GET", f"/api/v1/workspace/{slug}")
+        return _first(data.get("workspace"))
+
+    async def update_workspace(self, slug: str, **settings) -> dict:
+        result = await self.request("POST", f"/api/v1/workspace/{slug}/update", json=settings)
+        self.catalog.invalidate()
+        return result
+
+    async def delete_workspace(self, slug: str) -> Any:
+        result = await self.request("DELETE", f"/api/v1/workspace/{slug}")
+        self.catalog.invalidate()
+        self.cache.invalidate_workspace(slug)
+        return result
+
+    async def workspace_documents(self, slug: str) -> List[dict]:
+        data = await self.request("GET", f"/api/v1/workspace/{slug}/documents")
+        return data.get("documents", [])
+
+    async def update_embeddings(self, slug: str, adds: Optional[List[str]] = None,
+                                deletes: Optional[List[str]] = None,
+                                batch_size: Optional[int] = None) -> dict:
+        """
+        Add documents to / remove documents from a workspace's embeddings.
+
+        With ``batch_size``, adds are sent in batches of that many documents, one
+        request after another (deletes go with the first batch); the response of the
+        last batch is returned. The query cache of the workspace is invalidated after
+        every successful batch.
+        """
+        adds = list(adds or [])
+        step = batch_size if batch_size and batch_size > 0 else max(1, len(adds))
+        batches = [adds[i:i + step] for i in range(0, len(adds), step)] or [[]]
+        result = None
+        for i, batch in enumerate(batches):
+            payload: Dict[str, List[str]] = {"adds": batch}
+            if deletes and i == 0:
+                payload["deletes"] = list(deletes)
+            result = await self.request("POST", f"/api/v1/workspace/{slug}/update-embeddings", json=payload)
+            self.cache.invalidate_workspace(slug)
+        return result
+
+    async def update_pin(self, slug: str, doc_path: str, pinned: bool = True) -> dict:
+        return await self.request("POST", f"/api/v1/workspace/{slug}/update-pin",
+                                  json={"docPath": doc_path, "pinStatus": pinned})
+
+    # ---------- chat ----------
+    async def chat(self, slug: str, message: str, mode: str = "query", *,
+                   thread: Optional[str] = None) -> ChatResponse:
+        """
+        Ask a workspace (or one of its threads).
+
+        Workspace chats go through the query cache, and identical concurrent chats share
+        one upstream request. Thread chats are stateful and never cached or coalesced.
+        """
+        if thread is not None:
+            return await self.request("POST", f"/api/v1/workspace/{slug}/thread/{thread}/chat",
+                                      json={"message": message, "mode": mode}, coalesce=False)
+        cached = self.cache.get(slug, mode, message)
+        if cached is not None:
+            return cached
+        # An update_embeddings that lands while the request is in flight makes the answer stale
+        generation = self.cache.generation(slug)
+        result = await self.request("POST", f"/api/v1/workspace/{slug}/chat",
+                                    json={"message": message, "mode": mode}, coalesce=True, idempotent=True)
+        self.cache.set(slug, mode, message, result, generation=generation)
+        return result
+
+    def stream_chat(self, slug: str, message: str, mode: str = "query", *,
+                    thread: Optional[str] = None) -> AsyncIterator[StreamChunk]:
+        """Stream a chat answer as decoded SSE events (textResponseChunk ..., finalizeResponseStream)."""
+        endpoint = (f"/api/v1/workspace/{slug}/thread/{thread}/stream-chat" if thread is not None
+                    else f"/api/v1/workspace/{slug}/stream-chat")
+        return self._stream(endpoint, {"message": message, "mode": mode})
+
+    async def new_thread(self, slug: str, name: Optional[str] = None) -> dict:
+        return await self.request("POST", f"/api/v1/workspace/{slug}/thread/new",
+                                  json={"name": name} if name else {})
+
+    async def delete_thread(self, slug: str, thread: str) -> Any:
+        return await self.request("DELETE", f"/api/v1/workspace/{slug}/thread/{thread}")
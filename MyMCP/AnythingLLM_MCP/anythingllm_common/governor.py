@@ -0,0 +1,268 @@
+"""
+Adaptive governor for requests to the AnythingLLM backend.
+
+All upstream calls of a server share one UpstreamGovernor, which combines:
+
+* a token bucket capping the request rate (optional),
+* an AIMD concurrency limit: +1 per window of successful requests, halved
+  when the backend answers 429/502/503/504 or times out, and reduced
+  gently when a request class gets much slower than its own baseline,
+* exponential backoff with full jitter for retries, honoring Retry-After
+  (which also pauses every other caller until it has elapsed).
+
+Bulk ingests can then run with generous client-side concurrency; the
+governor settles at what the backend actually sustains.
+"""
+
+import asyncio
+import email.utils
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class _LatencyStats:
+    """EWMA of recent latency next to a slowly rising baseline (best observed latency)."""
+
+    __slots__ = ("ewma", "baseline", "samples")
+
+    def __init__(self):
+        self.ewma = 0.0
+        self.baseline = 0.0
+        self.samples = 0
+
+    def add(self, seconds: float) -> None:
+        if self.samples == 0:
+            self.ewma = self.baseline = seconds
+        else:
+            self.ewma += 0.2 * (seconds - self.ewma)
+            if seconds < self.baseline:
+                self.baseline = seconds
+            else:
+                # Drift up slowly so a permanently slower backend becomes the new normal
+                self.baseline += 0.01 * (seconds - self.baseline)
+        self.samples += 1
+
+
+class Slot:
+    """Handed out by UpstreamGovernor.slot(); the caller marks overload and Retry-After on it."""
+
+    __slots__ = ("overloaded", "retry_after")
+
+    def __init__(self):
+        self.overloaded = False
+        self.retry_after: Optional[float] = None
+
+
+class UpstreamGovernor:
+    """
+    Rate limit, adaptive concurrency limit and retry backoff for one upstream.
+
+    Args:
+        rate: Requests per second allowed by the token bucket; 0 disables rate limiting
+        burst: Token bucket capacity (defaults to max(1, rate))
+        min_concurrency: Floor of the adaptive concurrency limit
+        max_concurrency: Ceiling of the adaptive concurrency limit
+        initial_concurrency: Starting limit (defaults to max_concurrency / 4)
+        latency_tolerance: A request class whose EWMA latency exceeds this multiple
+            of its baseline is treated as congested; 0 disables latency feedback
+        backoff_base: First retry delay upper bound in seconds
+        backoff_max: Upper bound for any retry delay, including Retry-After
+    """
+
+    def __init__(self, rate: float = 0, burst: Optional[float] = None,
+                 min_concurrency: int = 1, max_concurrency: int = 32,
+                 initial_concurrency: Optional[int] = None, latency_tolerance: float = 3.0,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.rate = max(0.0, rate)
+        self.burst = burst if burst is not None else max(1.0, self.rate)
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        if initial_concurrency is None:
+            initial_concurrency = max(self.min_concurrency, self.max_concurrency // 4)
+        self.limit = float(min(self.max_concurrency, max(self.min_concurrency, initial_concurrency)))
+        self.latency_tolerance = latency_tolerance
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.in_flight = 0
+        self.waiting = 0
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self._rate_lock = asyncio.Lock()
+        self._cond = asyncio.Condition()
+        self._pause_until = 0.0
+        self._last_decrease = 0.0
+        self._latency: Dict[str, _LatencyStats] = {}
+
+        self.requests = 0
+        self.overloads = 0
+        self.decreases = 0
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self.rate_wait_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "UpstreamGovernor":
+        """
+        Build a governor from ANYTHINGLLM_RATE_LIMIT, ANYTHINGLLM_RATE_BURST,
+        ANYTHINGLLM_MIN_CONCURRENCY, ANYTHINGLLM_MAX_CONCURRENCY,
+        ANYTHINGLLM_LATENCY_TOLERANCE, ANYTHINGLLM_BACKOFF_BASE and ANYTHINGLLM_BACKOFF_MAX.
+        """
+        rate = _env_float("ANYTHINGLLM_RATE_LIMIT", 0)
+        burst = os.getenv("ANYTHINGLLM_RATE_BURST")
+        return cls(
+            rate=rate,
+            burst=_env_float("ANYTHINGLLM_RATE_BURST", rate) if burst else None,
+            min_concurrency=int(_env_float("ANYTHINGLLM_MIN_CONCURRENCY", 1)),
+            max_concurrency=int(_env_float("ANYTHINGLLM_MAX_CONCURRENCY", 32)),
+            latency_tolerance=_env_float("ANYTHINGLLM_LATENCY_TOLERANCE", 3.0),
+            backoff_base=_env_float("ANYTHINGLLM_BACKOFF_BASE", 0.5),
+            backoff_max=_env_float("ANYTHINGLLM_BACKOFF_MAX", 30.0),
+        )
+
+    @asynccontextmanager
+    async def slot(self, key: str = "") -> AsyncIterator[Slot]:
+        """
+        Wait for a pause to end, a rate token and a concurrency slot, then run the request.
+
+        ``key`` groups requests with similar latency (e.g. "POST chat"). Leaving the
+        block with an exception counts as overload, like a slot marked ``overloaded``.
+        """
+        self.waiting += 1
+        try:
+            await self._wait_for_pause()
+            await self._take_token()
+            async with self._cond:
+                await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+                self.in_flight += 1
+        finally:
+            self.waiting -= 1
+        self.requests += 1
+
+        slot = Slot()
+        start = time.monotonic()
+        try:
+            yield slot
+        except Exception:
+            slot.overloaded = True
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            self._observe(key, elapsed, slot)
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Delay before retry number ``attempt`` (0-based): Retry-After when the server
+        sent one, otherwise full jitter over base * 2**attempt. Both are capped at backoff_max.
+        """
+        if retry_after is not None:
+            delay = min(self.backoff_max, retry_after)
+        else:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        self.retries += 1
+        self.backoff_seconds += delay
+        return delay
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rate_limit": self.rate or None,
+            "requests": self.requests,
+            "overloads": self.overloads,
+            "limit_decreases": self.decreases,
+            "retries": self.retries,
+            "backoff_seconds": round(self.backoff_seconds, 3),
+            "rate_wait_seconds": round(self.rate_wait_seconds, 3),
+            "paused_for": round(max(0.0, self._pause_until - time.monotonic()), 3),
+            "latency": {
+                key: {"ewma_ms": round(s.ewma * 1000, 1), "baseline_ms": round(s.baseline * 1000, 1)}
+                for key, s in self._latency.items()
+            },
+        }
+
+    async def _wait_for_pause(self) -> None:
+        while True:
+            delay = self._pause_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def _take_token(self) -> None:
+        if not self.rate:
+            return
+        # The lock keeps waiters in FIFO order instead of all waking for the same token
+        async with self._rate_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+                self._refilled = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.rate_wait_seconds += wait
+                await asyncio.sleep(wait)
+
+    def _observe(self, key: str, elapsed: float, slot: Slot) -> None:
+        now = time.monotonic()
+        if slot.retry_after:
+            self._pause_until = max(self._pause_until, now + min(self.backoff_max, slot.retry_after))
+
+        if slot.overloaded:
+            self.overloads += 1
+            self._decrease(now, elapsed, 0.5)
+            return
+
+        stats = self._latency.get(key)
+        if stats is None:
+            stats = self._latency[key] = _LatencyStats()
+        stats.add(elapsed)
+        if (self.latency_tolerance and stats.samples >= 5
+                and stats.ewma > stats.baseline * self.latency_tolerance):
+            self._decrease(now, elapsed, 0.9)
+        elif self.limit < self.max_concurrency:
+            # Additive increase: about +1 once a full window of requests has succeeded
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def _decrease(self, now: float, elapsed: float, factor: float) -> None:
+        # Requests that were already in flight report the same congestion; cut at most once per round trip
+        if now - self._last_decrease < max(elapsed, 0.1):
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_concurrency), self.limit * factor)
+        self.decreases += 1
@@ -0,0 +1,153 @@
+"""
+Non-blocking structured logging for the AnythingLLM MCP servers.
+
+Records from the "anythingllm" logger tree are put on an in-memory queue
+by the calling thread (usually the event loop) and written by a background
+QueueListener thread, so a slow terminal, pipe or disk never stalls a
+request. Output goes to stderr or a file, never stdout, which is the
+protocol channel of the stdio servers.
+
+Each record is one JSON object per line: ts, level, logger, msg, any
+fields passed with ``extra=``, and exc for tracebacks. Loggers listed in
+``sampled`` (per-file messages) only let every N-th record below WARNING
+through; warnings and errors are never dropped.
+
+Configuration (all optional):
+    ANYTHINGLLM_LOG_LEVEL   DEBUG / INFO / WARNING / ERROR (default INFO)
+    ANYTHINGLLM_LOG_FORMAT  json or text (default json)
+    ANYTHINGLLM_LOG_FILE    write to this file instead of stderr
+    ANYTHINGLLM_LOG_SAMPLE  keep 1 in N records of sampled loggers (default 100, 1 keeps all)
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+ROOT_LOGGER = "anythingllm"
+
+# attributes every LogRecord has; anything else on a record came from extra=
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sample_rate"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; extra= fields become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if getattr(record, "sample_rate", 1) > 1:
+            entry["sample_rate"] = record.sample_rate
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Lets 1 in ``rate`` records below WARNING through for the given loggers."""
+
+    def __init__(self, loggers: Iterable[str], rate: int):
+        super().__init__()
+        self.loggers = frozenset(loggers)
+        self.rate = max(1, rate)
+        self._counts = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate == 1 or record.levelno >= logging.WARNING or record.name not in self.loggers:
+            return True
+        count = self._counts.get(record.name, 0)
+        self._counts[record.name] = count + 1
+        if count % self.rate:
+            return False
+        record.sample_rate = self.rate
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Resolves the message and traceback text up front, leaving JSON encoding to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def configure_logging(sampled: Iterable[str] = (), *, level: Optional[str] = None,
+                      fmt: Optional[str] = None, path: Optional[str] = None,
+                      sample: Optional[int] = None) -> logging.Logger:
+    """
+    Route the "anythingllm" logger tree through a queue to stderr or a file.
+
+    Arguments override the ANYTHINGLLM_LOG_* environment variables. Calling
+    this again replaces the previous configuration. Returns the root logger
+    of the tree.
+    """
+    global _listener
+    level = (level or os.getenv("ANYTHINGLLM_LOG_LEVEL") or "INFO").upper()
+    fmt = (fmt or os.getenv("ANYTHINGLLM_LOG_FORMAT") or "json").lower()
+    path = path or os.getenv("ANYTHINGLLM_LOG_FILE") or None
+    sample = sample if sample is not None else _env_int("ANYTHINGLLM_LOG_SAMPLE", 100)
+
+    if path:
+        sink: logging.Handler = logging.handlers.WatchedFileHandler(path, encoding="utf-8")
+    else:
+        sink = logging.StreamHandler(sys.stderr)
+    if fmt == "text":
+        sink.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        sink.setFormatter(JsonFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sampled, sample))
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    shutdown_logging()
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+    logger.addHandler(handler)
+    logger.setLevel(getattr(logging, level, logging.INFO))
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, sink)
+    _listener.start()
+    return logger
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,154 @@
+"""
+Minimal Prometheus-style metrics (text exposition format 0.0.4).
+
+Counters, gauges and histograms keyed by positional label values. Updating
+a metric is a dict lookup plus an addition (histograms add a bisect), so
+instrumentation can stay on in production without pulling in
+prometheus_client.
+
+Metrics created with ``func=`` are read at scrape time instead of being
+updated on the hot path, which suits values other components already
+count (cache hits, circuit state, queue depth). ``func`` returns either a
+number or a dict mapping label-value tuples to numbers.
+"""
+
+import bisect
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[str, ...]
+SampleFunc = Callable[[], Union[float, Dict[Labels, float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), func: Optional[SampleFunc] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.func = func
+        self._values: Dict[Labels, float] = {}
+
+    def _samples(self) -> Dict[Labels, float]:
+        if self.func is None:
+            return self._values
+        value = self.func()
+        return value if isinstance(value, dict) else {(): value}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in sorted(self._samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down per label set."""
+
+    type = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds, plus _sum and _count."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label set -> [per-bucket counts (last = +Inf), sum]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Creates metrics under a common name prefix and renders them for scraping."""
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._metrics: List[_Metric] = []
+
+    def _add(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = (),
+                func: Optional[SampleFunc] = None) -> Counter:
+        return self._add(Counter(self.prefix + name, help, labelnames, func))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = (),
+              func: Optional[SampleFunc] = None) -> Gauge:
+        return self._add(Gauge(self.prefix + name, help, labelnames, func))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self.prefix + name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # a failing scrape-time callback must not break the whole endpoint
+                continue
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,46 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight coroutine and
+all receive its result (or its exception). Once the call finishes the key is
+released, so later callers trigger a fresh request.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Deduplicate concurrent identical calls; ``saved`` counts the calls avoided."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.saved = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            self.saved += 1
+            # shield: one waiter being cancelled must not cancel the shared call
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = asyncio.ensure_future(fn())
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._release(key, f))
+        return await asyncio.shield(future)
+
+    def _release(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # mark the exception as retrieved even if every waiter was cancelled
+            future.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "upstream_calls": self.calls,
+            "coalesced": self.saved,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,123 @@
+"""
+Incremental Server-Sent Events decoder.
+
+Network chunks do not line up with SSE frames: a single chunk may hold half
+an event or several events. SSEDecoder buffers partial lines and emits an
+event only once its terminating blank line has arrived. Work is linear in
+the input size, and memory is bounded by the largest single event.
+"""
+
+import json
+import re
+from typing import Any, AsyncIterable, AsyncIterator, List, NamedTuple
+
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+class SSEError(ValueError):
+    """Raised when the stream violates the decoder's limits."""
+
+
+class SSEEvent(NamedTuple):
+    event: str
+    data: str
+
+    def json(self) -> Any:
+        return json.loads(self.data)
+
+
+class SSEDecoder:
+    """
+    Feed text chunks in arrival order and collect the completed events.
+
+    Args:
+        max_event_size: Upper bound (in characters) for a buffered line or event
+    """
+
+    def __init__(self, max_event_size: int = 1024 * 1024):
+        self.max_event_size = max_event_size
+        self._line_parts: List[str] = []
+        self._line_size = 0
+        self._data: List[str] = []
+        self._data_size = 0
+        self._event = ""
+        # The previous chunk ended in "\r"; a leading "\n" belongs to that line break
+        self._skip_lf = False
+
+    def feed(self, chunk: str) -> List[SSEEvent]:
+        events: List[SSEEvent] = []
+        if not chunk:
+            return events
+        if self._skip_lf and chunk.startswith("\n"):
+            chunk = chunk[1:]
+        self._skip_lf = chunk.endswith("\r")
+
+        pos = 0
+        for match in _LINE_BREAK.finditer(chunk):
+            self._line_parts.append(chunk[pos:match.start()])
+            line = "".join(self._line_parts)
+            self._line_parts = []
+            self._line_size = 0
+            event = self._process_line(line)
+            if event is not None:
+                events.append(event)
+            pos = match.end()
+
+        rest = chunk[pos:]
+        if rest:
+            self._line_size += len(rest)
+            if self._line_size > self.max_event_size:
+                raise SSEError(f"SSE line exceeds {self.max_event_size} characters")
+            self._line_parts.append(rest)
+        return events
+
+    def flush(self) -> List[SSEEvent]:
+        """Call at end of stream to emit a final event that lacks its blank line."""
+        events: List[SSEEvent] = []
+        if self._line_parts:
+            line = "".join(self._line_parts)
+            self._line_parts = []
+            self._line_size = 0
+            self._process_line(line)
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _process_line(self, line: str):
+        if line == "":
+            return self._dispatch()
+        if line.startswith(":"):
+            return None  # comment / keep-alive
+
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data_size += len(value) + 1
+            if self._data_size > self.max_event_size:
+                raise SSEError(f"SSE event exceeds {self.max_event_size} characters")
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        return None
+
+    def _dispatch(self):
+        if not self._data:
+            self._event = ""
+            return None
+        event = SSEEvent(self._event or "message", "\n".join(self._data))
+        self._data = []
+        self._data_size = 0
+        self._event = ""
+        return event
+
+
+async def iter_sse_events(chunks: AsyncIterable[str], max_event_size: int = 1024 * 1024) -> AsyncIterator[SSEEvent]:
+    """Decode an async iterable of text chunks (e.g. ``response.aiter_text()``) into events."""
+    decoder = SSEDecoder(max_event_size)
+    async for chunk in chunks:
+        for event in decoder.feed(chunk):
+            yield event
+    for event in decoder.flush():
+        yield event
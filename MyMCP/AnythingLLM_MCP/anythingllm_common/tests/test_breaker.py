@@ -0,0 +1,155 @@
+"""
+Tests for the CircuitBreaker: which outcomes count as backend failures and
+the closed -> open -> half-open -> closed/open cycle.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from anythingllm_common import breaker as breaker_module
+from anythingllm_common.breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, get_breaker, is_backend_failure,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def status_error(code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "http://backend/api")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(code, request=request))
+
+
+def fail(breaker, times=1):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record(httpx.ConnectError("refused"))
+
+
+def test_backend_failure_classification():
+    assert is_backend_failure(httpx.ConnectError("refused"))
+    assert is_backend_failure(httpx.ReadTimeout("slow"))
+    assert is_backend_failure(status_error(503))
+    assert is_backend_failure(status_code=500)
+    assert not is_backend_failure(status_error(404))
+    assert not is_backend_failure(status_code=429)
+    assert not is_backend_failure(ValueError("bad json"))
+    assert not is_backend_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("http://backend", failure_threshold=3, reset_timeout=10)
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+    fail(breaker)
+    assert breaker.state == OPEN
+    assert breaker.opened == 1
+
+    with pytest.raises(CircuitOpenError, match="next attempt in 10s"):
+        breaker.before_call()
+    assert breaker.rejected == 1
+    assert breaker.stats()["retry_in"] == 10
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("b", failure_threshold=3)
+    fail(breaker, 2)
+    breaker.before_call()
+    breaker.record()
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+
+def test_client_errors_do_not_open(clock):
+    breaker = CircuitBreaker("b", failure_threshold=2)
+    for _ in range(5):
+        breaker.before_call()
+        breaker.record(status_code=400)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_single_probe_then_closes(clock):
+    breaker = CircuitBreaker("b", failure_threshold=1, reset_timeout=10)
+    fail(breaker)
+    clock[0] += 9.9
+    assert breaker.state == OPEN
+    clock[0] += 0.1
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()                   # the probe
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()               # everyone else still fails fast
+    breaker.record(status_code=200)
+    assert breaker.state == CLOSED
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_for_full_timeout(clock):
+    breaker = CircuitBreaker("b", failure_threshold=3, reset_timeout=10)
+    fail(breaker, 3)
+    clock[0] += 10
+    fail(breaker)                           # a single failed probe is enough
+    assert breaker.state == OPEN
+    assert breaker.opened == 2
+    clock[0] += 9
+    assert breaker.state == OPEN
+    clock[0] += 1
+    assert breaker.state == HALF_OPEN
+
+
+def test_released_probe_can_be_retried(clock):
+    breaker = CircuitBreaker("b", failure_threshold=1, reset_timeout=5)
+    fail(breaker)
+    clock[0] += 5
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    breaker.record()
+    assert breaker.state == CLOSED
+
+
+def test_guard_records_outcomes(clock):
+    async def main():
+        breaker = CircuitBreaker("b", failure_threshold=2, reset_timeout=5)
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                async with breaker.guard():
+                    raise httpx.ConnectError("refused")
+        with pytest.raises(CircuitOpenError):
+            async with breaker.guard():
+                pytest.fail("guard must not enter the block while open")
+        clock[0] += 5
+        # a cancelled probe gives the slot back instead of counting as a failure
+        with pytest.raises(asyncio.CancelledError):
+            async with breaker.guard():
+                raise asyncio.CancelledError()
+        assert breaker.state == HALF_OPEN
+        async with breaker.guard():
+            pass
+        return breaker
+
+    breaker = asyncio.run(main())
+    assert breaker.state == CLOSED
+    assert breaker.stats()["consecutive_failures"] == 0
+
+
+def test_zero_threshold_disables_breaker(clock):
+    breaker = CircuitBreaker("b", failure_threshold=0)
+    fail(breaker, 20)
+    assert breaker.state == CLOSED
+
+
+def test_get_breaker_is_shared_per_base_url(monkeypatch):
+    monkeypatch.setattr(breaker_module, "_breakers", {})
+    monkeypatch.setenv("ANYTHINGLLM_BREAKER_THRESHOLD", "7")
+    a = get_breaker("http://backend:3001/")
+    assert a is get_breaker("http://backend:3001")
+    assert a is not get_breaker("http://other:3001")
+    assert a.failure_threshold == 7
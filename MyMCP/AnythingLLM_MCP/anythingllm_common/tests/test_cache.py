@@ -0,0 +1,205 @@
+"""
+Tests for the query response cache: TTL expiry, LRU eviction, invalidation
+generations, the SQLite-backed shared cache, and chat answers that race an
+update_embeddings.
+"""
+
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from anythingllm_common import cache as cache_module
+from anythingllm_common.cache import ResponseCache, SharedResponseCache
+from anythingllm_common.client import AnythingLLMClient
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=["memory", "shared"])
+def make_cache(request, tmp_path):
+    caches = []
+
+    def make(ttl=60, max_entries=256):
+        if request.param == "memory":
+            cache = ResponseCache(ttl=ttl, max_entries=max_entries)
+        else:
+            cache = SharedResponseCache(tmp_path / "cache.sqlite3", ttl=ttl, max_entries=max_entries)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        if isinstance(cache, SharedResponseCache):
+            cache.close()
+
+
+def test_disabled_cache_stores_nothing(make_cache):
+    cache = make_cache(ttl=0)
+    cache.set("ws", "query", "q", {"a": 1})
+    assert cache.get("ws", "query", "q") is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["misses"] == 0
+
+
+def test_prompts_differing_in_whitespace_share_an_entry(make_cache):
+    cache = make_cache()
+    cache.set("ws", "query", "  what is\n  this? ", {"a": 1})
+    assert cache.get("ws", "query", "what is this?") == {"a": 1}
+    assert cache.get("ws", "chat", "what is this?") is None
+    assert cache.get("other", "query", "what is this?") is None
+
+
+def test_entries_expire_after_ttl(make_cache, clock):
+    cache = make_cache(ttl=10)
+    cache.set("ws", "query", "q", {"a": 1})
+    clock[0] += 9.9
+    assert cache.get("ws", "query", "q") == {"a": 1}
+    clock[0] += 0.2
+    assert cache.get("ws", "query", "q") is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_eviction_keeps_recently_used(make_cache, clock):
+    cache = make_cache(max_entries=3)
+    for prompt in ("a", "b", "c"):
+        clock[0] += 1
+        cache.set("ws", "query", prompt, prompt)
+    clock[0] += 1
+    assert cache.get("ws", "query", "a") == "a"     # "b" is now the least recently used
+    clock[0] += 1
+    cache.set("ws", "query", "d", "d")
+    assert cache.get("ws", "query", "b") is None
+    assert [cache.get("ws", "query", p) for p in ("a", "c", "d")] == ["a", "c", "d"]
+    assert cache.stats()["entries"] == 3
+    assert cache.evictions == 1
+
+
+def test_invalidate_workspace_drops_only_that_workspace(make_cache):
+    cache = make_cache()
+    cache.set("ws", "query", "q1", 1)
+    cache.set("ws", "chat", "q2", 2)
+    cache.set("other", "query", "q1", 3)
+    assert cache.invalidate_workspace("ws") == 2
+    assert cache.get("ws", "query", "q1") is None
+    assert cache.get("other", "query", "q1") == 3
+    assert cache.invalidations == 1
+
+
+def test_set_with_stale_generation_is_skipped(make_cache):
+    cache = make_cache()
+    before = cache.generation("ws")
+    other = cache.generation("other")
+    cache.invalidate_workspace("ws")
+    assert cache.generation("ws") != before
+    cache.set("ws", "query", "q", "old answer", generation=before)
+    assert cache.get("ws", "query", "q") is None
+    cache.set("other", "query", "q", "fine", generation=other)
+    assert cache.get("other", "query", "q") == "fine"
+    assert cache.stats()["stale_skips"] == 1
+
+
+def test_clear_invalidates_every_generation(make_cache):
+    cache = make_cache()
+    before = cache.generation("ws")
+    cache.clear()
+    cache.set("ws", "query", "q", "old answer", generation=before)
+    assert cache.get("ws", "query", "q") is None
+    cache.set("ws", "query", "q", "new answer", generation=cache.generation("ws"))
+    assert cache.get("ws", "query", "q") == "new answer"
+
+
+def test_shared_cache_is_seen_by_other_connections(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    a = SharedResponseCache(path, ttl=60)
+    b = SharedResponseCache(path, ttl=60)
+    try:
+        a.set("ws", "query", "q", {"text": "答案"})
+        assert b.get("ws", "query", "q") == {"text": "答案"}
+        generation = a.generation("ws")
+        b.invalidate_workspace("ws")
+        assert a.get("ws", "query", "q") is None
+        # an invalidation by another process also stops the in-flight answer
+        a.set("ws", "query", "q", {"text": "stale"}, generation=generation)
+        assert b.get("ws", "query", "q") is None
+    finally:
+        a.close()
+        b.close()
+
+
+WORKER = """
+import sys
+sys.path.insert(0, {root!r})
+from anythingllm_common.cache import SharedResponseCache
+
+cache = SharedResponseCache({path!r}, ttl=60)
+if sys.argv[1] == "set":
+    cache.set("ws", "query", "q", {{"text": "from worker"}})
+else:
+    cache.invalidate_workspace("ws")
+cache.close()
+"""
+
+
+def test_shared_cache_between_worker_processes(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    script = tmp_path / "worker.py"
+    script.write_text(WORKER.format(root=str(Path(__file__).resolve().parents[2]), path=str(path)))
+
+    def worker(action):
+        subprocess.run([sys.executable, str(script), action], check=True, timeout=60)
+
+    cache = SharedResponseCache(path, ttl=60)
+    try:
+        worker("set")
+        assert cache.get("ws", "query", "q") == {"text": "from worker"}
+        generation = cache.generation("ws")
+        worker("invalidate")
+        assert cache.get("ws", "query", "q") is None
+        cache.set("ws", "query", "q", {"text": "stale"}, generation=generation)
+        assert cache.get("ws", "query", "q") is None
+    finally:
+        cache.close()
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_chat_answer_racing_update_embeddings_is_not_cached(tmp_path, shared):
+    cache = SharedResponseCache(tmp_path / "cache.sqlite3", ttl=60) if shared else ResponseCache(ttl=60)
+    client = AnythingLLMClient("http://backend", cache=cache)
+    calls = []
+
+    async def request(method, path, **kwargs):
+        calls.append(path)
+        if path.endswith("/chat") and len(calls) == 1:
+            await client.update_embeddings("ws", adds=["doc.json"])
+            return {"textResponse": "before the update"}
+        if path.endswith("/chat"):
+            return {"textResponse": "after the update"}
+        return {}
+
+    client.request = request
+
+    async def main():
+        first = await client.chat("ws", "q")
+        second = await client.chat("ws", "q")
+        third = await client.chat("ws", "q")
+        return first, second, third
+
+    try:
+        first, second, third = asyncio.run(main())
+    finally:
+        if shared:
+            cache.close()
+    assert first == {"textResponse": "before the update"}
+    assert second == third == {"textResponse": "after the update"}
+    assert calls == ["/api/v1/workspace/ws/chat", "/api/v1/workspace/ws/update-embeddings",
+                     "/api/v1/workspace/ws/chat"]
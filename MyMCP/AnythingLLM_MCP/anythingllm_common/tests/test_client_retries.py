@@ -0,0 +1,104 @@
+"""
+Tests for the retry policy of AnythingLLMClient: idempotent requests are
+retried on 429/502/503/504, requests that may already have been processed
+(uploads, update-embeddings) only on 429, 503 with Retry-After and
+connection errors.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from anythingllm_common.breaker import CircuitBreaker
+from anythingllm_common.client import AnythingLLMClient, AnythingLLMError
+from anythingllm_common.governor import UpstreamGovernor
+
+
+def run(call, responses):
+    """Run call(client) against a backend answering with ``responses`` in turn; return (result, attempts)"""
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url.path)
+        response = responses[min(len(attempts), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def main():
+        client = AnythingLLMClient(
+            "http://backend", max_retries=3,
+            governor=UpstreamGovernor(backoff_base=0, backoff_max=0),
+            breaker=CircuitBreaker("test", failure_threshold=0),
+        )
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with client:
+            try:
+                return await call(client)
+            except AnythingLLMError as e:
+                return e
+
+    return asyncio.run(main()), len(attempts)
+
+
+OK = httpx.Response(200, json={"workspace": {"slug": "ws"}})
+
+
+def update(client):
+    return client.update_embeddings("ws", adds=["custom-documents/a.json"])
+
+
+@pytest.mark.parametrize("status", [502, 504])
+def test_post_is_not_retried_after_gateway_errors(status):
+    result, attempts = run(update, [httpx.Response(status), OK])
+    assert isinstance(result, AnythingLLMError) and result.status_code == status
+    assert attempts == 1
+
+
+def test_post_is_not_retried_on_503_without_retry_after():
+    result, attempts = run(update, [httpx.Response(503), OK])
+    assert isinstance(result, AnythingLLMError) and result.status_code == 503
+    assert attempts == 1
+
+
+@pytest.mark.parametrize("response", [
+    httpx.Response(429),
+    httpx.Response(503, headers={"Retry-After": "0"}),
+    httpx.ConnectError("refused"),
+])
+def test_post_is_retried_when_rejected_unprocessed(response):
+    result, attempts = run(update, [response, OK])
+    assert result == {"workspace": {"slug": "ws"}}
+    assert attempts == 2
+
+
+def test_upload_is_not_retried_after_502(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("hello")
+    result, attempts = run(lambda client: client.upload_file(path), [httpx.Response(502), OK])
+    assert isinstance(result, AnythingLLMError)
+    assert attempts == 1
+
+
+@pytest.mark.parametrize("status", [502, 503, 504])
+def test_get_is_retried_on_gateway_errors(status):
+    result, attempts = run(lambda client: client.list_workspaces(),
+                           [httpx.Response(status), httpx.Response(200, json={"workspaces": []})])
+    assert result == []
+    assert attempts == 2
+
+
+def test_workspace_chat_opts_in_as_idempotent():
+    answer = httpx.Response(200, json={"textResponse": "answer"})
+    result, attempts = run(lambda client: client.chat("ws", "q"), [httpx.Response(502), answer])
+    assert result == {"textResponse": "answer"}
+    assert attempts == 2
+
+
+def test_explicit_idempotent_post_is_retried():
+    result, attempts = run(
+        lambda client: client.request("POST", "/api/v1/workspace/ws/update", json={}, idempotent=True),
+        [httpx.Response(504), OK])
+    assert result == {"workspace": {"slug": "ws"}}
+    assert attempts == 2
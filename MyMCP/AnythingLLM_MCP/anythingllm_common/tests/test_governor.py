@@ -0,0 +1,180 @@
+"""
+Tests for the shared UpstreamGovernor: AIMD concurrency limit, latency
+feedback, Retry-After pauses, backoff delays and the token bucket.
+"""
+
+import asyncio
+import email.utils
+import time
+
+import pytest
+
+from anythingllm_common import governor as governor_module
+from anythingllm_common.governor import Slot, UpstreamGovernor, parse_retry_after
+
+
+def observe(gov, key="k", elapsed=0.01, overloaded=False, retry_after=None):
+    slot = Slot()
+    slot.overloaded = overloaded
+    slot.retry_after = retry_after
+    gov._observe(key, elapsed, slot)
+
+
+# ---------- Retry-After parsing ----------
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(" 1.5 ") == 1.5
+    assert parse_retry_after("-4") == 0.0
+
+
+def test_parse_retry_after_http_date():
+    value = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 28 <= parse_retry_after(value) <= 30
+    past = email.utils.formatdate(time.time() - 30, usegmt=True)
+    assert parse_retry_after(past) == 0.0
+
+
+@pytest.mark.parametrize("value", [None, "", "soon", "Mon, 99 Foo"])
+def test_parse_retry_after_invalid(value):
+    assert parse_retry_after(value) is None
+
+
+# ---------- AIMD ----------
+def test_initial_limit_is_quarter_of_max():
+    assert UpstreamGovernor(max_concurrency=32).limit == 8
+    assert UpstreamGovernor(min_concurrency=4, max_concurrency=8).limit == 4
+    assert UpstreamGovernor(max_concurrency=8, initial_concurrency=100).limit == 8
+
+
+def test_additive_increase_about_one_per_window():
+    gov = UpstreamGovernor(max_concurrency=32, initial_concurrency=8, latency_tolerance=0)
+    for _ in range(8):
+        observe(gov)
+    assert 8.9 < gov.limit < 9.0
+    for _ in range(1000):
+        observe(gov)
+    assert gov.limit == 32          # capped at max_concurrency
+
+
+def test_overload_halves_limit_once_per_round_trip(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(governor_module.time, "monotonic", lambda: now[0])
+    gov = UpstreamGovernor(min_concurrency=2, max_concurrency=32, initial_concurrency=16)
+
+    observe(gov, overloaded=True, elapsed=0.5)
+    assert gov.limit == 8
+    # Other requests of the same round trip report the same congestion
+    now[0] += 0.2
+    observe(gov, overloaded=True, elapsed=0.5)
+    assert gov.limit == 8
+    now[0] += 0.5
+    observe(gov, overloaded=True, elapsed=0.5)
+    assert gov.limit == 4
+    for _ in range(5):
+        now[0] += 1
+        observe(gov, overloaded=True, elapsed=0.5)
+    assert gov.limit == 2           # floor at min_concurrency
+    assert gov.overloads == 8
+    assert gov.decreases == 7        # a cut at the floor still counts as a decrease
+
+
+def test_latency_growth_reduces_limit_gently(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(governor_module.time, "monotonic", lambda: now[0])
+    gov = UpstreamGovernor(max_concurrency=32, initial_concurrency=10, latency_tolerance=3.0)
+    for _ in range(5):
+        observe(gov, key="POST chat", elapsed=0.1)
+    before = gov.limit
+    for _ in range(30):
+        now[0] += 5
+        observe(gov, key="POST chat", elapsed=2.0)
+    assert gov.limit < before
+    assert gov.overloads == 0
+
+
+def test_exception_in_slot_counts_as_overload():
+    async def main():
+        gov = UpstreamGovernor(max_concurrency=16, initial_concurrency=8)
+        with pytest.raises(RuntimeError):
+            async with gov.slot("k"):
+                raise RuntimeError("boom")
+        return gov
+
+    gov = asyncio.run(main())
+    assert gov.overloads == 1
+    assert gov.limit == 4
+    assert gov.in_flight == 0
+
+
+def test_concurrency_limit_is_enforced():
+    async def main():
+        gov = UpstreamGovernor(min_concurrency=2, max_concurrency=2, latency_tolerance=0)
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            async with gov.slot("k"):
+                peak = max(peak, gov.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request() for _ in range(8)))
+        return gov, peak
+
+    gov, peak = asyncio.run(main())
+    assert peak == 2
+    assert gov.requests == 8
+    assert gov.in_flight == 0
+
+
+# ---------- Retry-After and backoff ----------
+def test_retry_after_pauses_every_caller():
+    async def main():
+        gov = UpstreamGovernor(max_concurrency=8)
+        async with gov.slot("k") as slot:
+            slot.overloaded = True
+            slot.retry_after = 0.2
+        start = time.monotonic()
+        async with gov.slot("other"):
+            pass
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.19
+
+
+def test_retry_after_pause_is_capped_by_backoff_max(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(governor_module.time, "monotonic", lambda: now[0])
+    gov = UpstreamGovernor(backoff_max=5)
+    observe(gov, overloaded=True, retry_after=600)
+    assert gov.stats()["paused_for"] == 5
+
+
+def test_backoff_delay_prefers_retry_after():
+    gov = UpstreamGovernor(backoff_base=0.5, backoff_max=10)
+    assert gov.backoff_delay(0, retry_after=3) == 3
+    assert gov.backoff_delay(0, retry_after=60) == 10
+    assert gov.retries == 2
+    assert gov.backoff_seconds == 13
+
+
+def test_backoff_delay_full_jitter_bounds():
+    gov = UpstreamGovernor(backoff_base=0.5, backoff_max=3)
+    for attempt, bound in [(0, 0.5), (1, 1.0), (2, 2.0), (5, 3.0)]:
+        delays = [gov.backoff_delay(attempt) for _ in range(50)]
+        assert all(0 <= d <= bound for d in delays)
+
+
+# ---------- token bucket ----------
+def test_rate_limit_spaces_requests():
+    async def main():
+        gov = UpstreamGovernor(rate=50, burst=1, max_concurrency=8)
+        start = time.monotonic()
+        for _ in range(6):
+            async with gov.slot("k"):
+                pass
+        return time.monotonic() - start, gov
+
+    elapsed, gov = asyncio.run(main())
+    # the first request uses the burst token, the other five wait ~20 ms each
+    assert elapsed >= 0.09
+    assert gov.rate_wait_seconds > 0
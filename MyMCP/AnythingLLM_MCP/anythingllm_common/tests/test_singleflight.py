@@ -0,0 +1,114 @@
+"""
+Tests for SingleFlight: concurrent identical calls share one upstream call,
+its result or exception reaches every waiter, the key is released afterwards,
+and a cancelled waiter does not cancel the shared call.
+"""
+
+import asyncio
+import gc
+
+import pytest
+
+from anythingllm_common.singleflight import SingleFlight
+
+
+class Upstream:
+    """Counts calls; each call waits for ``release`` and then returns or raises."""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return {"call": self.calls}
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream()
+        waiters = [asyncio.create_task(flight.do("key", upstream)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flight.stats() == {"upstream_calls": 1, "coalesced": 4, "in_flight": 1}
+        upstream.release.set()
+        results = await asyncio.gather(*waiters)
+        return flight, upstream, results
+
+    flight, upstream, results = asyncio.run(main())
+    assert upstream.calls == 1
+    assert results == [{"call": 1}] * 5
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_different_keys_are_not_shared():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream()
+        upstream.release.set()
+        return await asyncio.gather(flight.do("a", upstream), flight.do("b", upstream)), upstream.calls
+
+    results, calls = asyncio.run(main())
+    assert calls == 2
+    assert sorted(r["call"] for r in results) == [1, 2]
+
+
+def test_key_is_released_after_the_call():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream()
+        upstream.release.set()
+        first = await flight.do("key", upstream)
+        second = await flight.do("key", upstream)
+        return first, second
+
+    assert asyncio.run(main()) == ({"call": 1}, {"call": 2})
+
+
+def test_exception_reaches_every_waiter_and_releases_the_key():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream(error=RuntimeError("backend down"))
+        waiters = [asyncio.create_task(flight.do("key", upstream)) for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        upstream.error = None
+        return results, await flight.do("key", upstream)
+
+    results, retry = asyncio.run(main())
+    assert [str(r) for r in results] == ["backend down"] * 3
+    assert retry == {"call": 2}
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream()
+        first = asyncio.create_task(flight.do("key", upstream))
+        second = asyncio.create_task(flight.do("key", upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await second, first.cancelled()
+
+    assert asyncio.run(main()) == ({"call": 1}, True)
+
+
+def test_failure_with_every_waiter_cancelled_is_not_reported_as_unhandled():
+    unhandled = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        flight, upstream = SingleFlight(), Upstream(error=RuntimeError("backend down"))
+        waiter = asyncio.create_task(flight.do("key", upstream))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        upstream.release.set()
+        await asyncio.sleep(0.01)
+        gc.collect()
+
+    asyncio.run(main())
+    assert unhandled == []
@@ -0,0 +1,112 @@
+"""
+Tests for the incremental SSE decoder used by the streaming MCP server.
+
+The fixtures follow the /stream-chat response in anythingllm_api.md §20 and
+are fed to the decoder split at arbitrary positions, as they arrive over the
+network.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from anythingllm_common import SSEDecoder, SSEError, iter_sse_events
+
+CHUNKS = ["分享", "会有", "以下", "用途", "：\n", "1", "."]
+
+
+def make_stream(newline: str = "\n") -> str:
+    """Build a stream-chat response: text chunks, sources, then finalizeResponseStream."""
+    events = [
+        {"uuid": "u1", "sources": [], "type": "textResponseChunk",
+         "textResponse": text, "close": False, "error": False}
+        for text in CHUNKS
+    ]
+    events.append({"uuid": "u1", "sources": [{"id": "doc-1", "title": "分享会细则-共享.pdf"}],
+                   "type": "textResponseChunk", "textResponse": "", "close": False, "error": False})
+    events.append({"uuid": "u1", "type": "finalizeResponseStream", "close": True,
+                   "error": False, "chatId": 7})
+    return "".join(
+        f"data: {json.dumps(event, ensure_ascii=False)}{newline}{newline}" for event in events
+    )
+
+
+def decode(chunks):
+    decoder = SSEDecoder()
+    events = []
+    for chunk in chunks:
+        events.extend(decoder.feed(chunk))
+    events.extend(decoder.flush())
+    return events
+
+
+def assemble(events):
+    payloads = [event.json() for event in events]
+    return "".join(p.get("textResponse", "") for p in payloads), payloads
+
+
+def test_whole_stream_in_one_chunk():
+    text, payloads = assemble(decode([make_stream()]))
+    assert text == "".join(CHUNKS)
+    assert len(payloads) == len(CHUNKS) + 2
+    assert payloads[-1]["close"] is True
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+def test_every_split_position(newline):
+    stream = make_stream(newline)
+    expected = decode([stream])
+    for i in range(len(stream) + 1):
+        assert decode([stream[:i], stream[i:]]) == expected
+
+
+def test_one_character_per_chunk():
+    stream = make_stream("\r\n")
+    text, payloads = assemble(decode(list(stream)))
+    assert text == "".join(CHUNKS)
+    assert payloads[-2]["sources"][0]["id"] == "doc-1"
+
+
+def test_crlf_split_across_chunks_is_a_single_line_break():
+    events = decode(['data: {"textResponse": "a"}\r', "", "\n\r", "\n"])
+    assert [e.json()["textResponse"] for e in events] == ["a"]
+
+
+def test_multiple_events_in_one_chunk_and_partial_tail():
+    decoder = SSEDecoder()
+    events = decoder.feed('data: {"n": 1}\n\ndata: {"n": 2}\n\ndata: {"n"')
+    assert [e.json()["n"] for e in events] == [1, 2]
+    events = decoder.feed(': 3}\n\n')
+    assert [e.json()["n"] for e in events] == [3]
+
+
+def test_comments_event_names_and_multiline_data():
+    events = decode([": keep-alive\n", "event: abort\n", "data: line1\n", "data:line2\n\n"])
+    assert len(events) == 1
+    assert events[0].event == "abort"
+    assert events[0].data == "line1\nline2"
+
+
+def test_flush_emits_event_without_trailing_blank_line():
+    events = decode(['data: {"close": true}'])
+    assert events[0].json() == {"close": True}
+
+
+def test_oversized_event_is_rejected():
+    decoder = SSEDecoder(max_event_size=16)
+    with pytest.raises(SSEError):
+        decoder.feed("data: " + "x" * 32)
+
+
+def test_iter_sse_events():
+    async def chunks():
+        stream = make_stream()
+        for i in range(0, len(stream), 7):
+            yield stream[i:i + 7]
+
+    async def collect():
+        return [event async for event in iter_sse_events(chunks())]
+
+    text, _ = assemble(asyncio.run(collect()))
+    assert text == "".join(CHUNKS)
@@ -0,0 +1,179 @@
+"""
+Tests for WorkspaceCatalog: name -> slug resolution, unknown names and the
+forced refresh on a miss, background refresh of a stale list, and an
+invalidation that lands while a refresh is in flight.
+"""
+
+import asyncio
+
+import pytest
+
+from anythingllm_common import workspaces as workspaces_module
+from anythingllm_common.workspaces import UnknownWorkspaceError, WorkspaceCatalog
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(workspaces_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+class Backend:
+    """The workspace list of a fake AnythingLLM; set ``gate`` to hold fetches until it is set."""
+
+    def __init__(self, *workspaces):
+        self.workspaces = [dict(ws) for ws in workspaces]
+        self.fetches = 0
+        self.gate = None
+        self.error = None
+
+    async def fetch(self):
+        self.fetches += 1
+        snapshot = [dict(ws) for ws in self.workspaces]   # what the backend had when the request arrived
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return snapshot
+
+
+def test_resolves_slugs_names_and_case_folded_names(clock):
+    backend = Backend({"slug": "my", "name": "My Docs"}, {"slug": "docs", "name": "docs-archive"},
+                      {"slug": "docs-archive", "name": "Archive"})
+    catalog = WorkspaceCatalog(backend.fetch)
+
+    async def main():
+        return [await catalog.resolve(name) for name in ("my", "My Docs", "  my docs ", "docs", "docs-archive")]
+
+    # a slug wins over another workspace's name
+    assert asyncio.run(main()) == ["my", "my", "my", "docs", "docs-archive"]
+    assert backend.fetches == 1
+
+
+def test_unknown_name_forces_one_refresh_per_interval(clock):
+    backend = Backend({"slug": "research", "name": "Research"})
+    catalog = WorkspaceCatalog(backend.fetch, ttl=60, miss_refresh_interval=5)
+
+    async def main():
+        await catalog.resolve("research")
+        clock[0] += 6
+        with pytest.raises(UnknownWorkspaceError) as error:
+            await catalog.resolve("reserch")
+        assert error.value.suggestions == ["research", "Research"]
+        assert backend.fetches == 2
+        # repeated typos within the interval do not refetch
+        with pytest.raises(UnknownWorkspaceError):
+            await catalog.resolve("reserch")
+        assert backend.fetches == 2
+
+        # a workspace created elsewhere is found by the forced refresh
+        backend.workspaces.append({"slug": "new", "name": "New"})
+        clock[0] += 6
+        return await catalog.resolve("New")
+
+    assert asyncio.run(main()) == "new"
+    assert catalog.stats()["unknown"] == 2
+
+
+def test_stale_list_answers_while_one_background_refresh_runs(clock):
+    backend = Backend({"slug": "my", "name": "My"})
+    catalog = WorkspaceCatalog(backend.fetch, ttl=10)
+
+    async def main():
+        await catalog.resolve("my")
+        backend.gate = asyncio.Event()
+        clock[0] += 11
+        # every caller gets the stale answer at once and they share one refresh
+        results = await asyncio.gather(*(catalog.resolve("my") for _ in range(5)))
+        assert backend.fetches == 2
+        backend.gate.set()
+        await asyncio.sleep(0)
+        return results
+
+    assert asyncio.run(main()) == ["my"] * 5
+    assert catalog.stats()["refreshes"] == 2
+
+
+def test_failed_background_refresh_keeps_the_stale_list(clock):
+    backend = Backend({"slug": "my", "name": "My"})
+    catalog = WorkspaceCatalog(backend.fetch, ttl=10)
+
+    async def main():
+        await catalog.resolve("my")
+        backend.error = RuntimeError("backend down")
+        clock[0] += 11
+        first = await catalog.resolve("my")
+        await asyncio.sleep(0)
+        return first, await catalog.resolve("My")
+
+    assert asyncio.run(main()) == ("my", "my")
+
+
+def test_concurrent_first_lookups_share_one_fetch(clock):
+    backend = Backend({"slug": "my", "name": "My"})
+    catalog = WorkspaceCatalog(backend.fetch)
+
+    async def main():
+        backend.gate = asyncio.Event()
+        lookups = [asyncio.create_task(catalog.resolve("my")) for _ in range(5)]
+        while backend.fetches == 0:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        backend.gate.set()
+        return await asyncio.gather(*lookups)
+
+    assert asyncio.run(main()) == ["my"] * 5
+    assert backend.fetches == 1
+
+
+def test_invalidation_during_refresh_refetches(clock):
+    backend = Backend({"slug": "my", "name": "My"})
+    catalog = WorkspaceCatalog(backend.fetch)
+
+    async def main():
+        backend.gate = asyncio.Event()
+        lookup = asyncio.create_task(catalog.resolve("my"))
+        while backend.fetches == 0:
+            await asyncio.sleep(0)
+        # in flight, holding the list without "new"
+
+        # create_workspace lands meanwhile and invalidates the catalog
+        backend.workspaces.append({"slug": "new", "name": "New"})
+        catalog.invalidate()
+        new_lookup = asyncio.create_task(catalog.resolve("New"))
+        await asyncio.sleep(0)
+        backend.gate.set()
+        return await lookup, await new_lookup
+
+    # the in-flight result predates the invalidation and is fetched again, not cached
+    assert asyncio.run(main()) == ("my", "new")
+    assert backend.fetches == 2
+    assert catalog.stats()["workspaces"] == 2
+
+
+def test_invalidate_drops_the_list(clock):
+    backend = Backend({"slug": "my", "name": "My"})
+    catalog = WorkspaceCatalog(backend.fetch, ttl=60)
+
+    async def main():
+        await catalog.workspaces()
+        catalog.invalidate()
+        assert catalog.stats()["workspaces"] is None
+        backend.workspaces.append({"slug": "new", "name": "New"})
+        return await catalog.workspaces()
+
+    assert [ws["slug"] for ws in asyncio.run(main())] == ["my", "new"]
+    assert backend.fetches == 2
+
+
+def test_zero_ttl_fetches_on_every_use(clock):
+    backend = Backend({"slug": "my", "name": "My"})
+    catalog = WorkspaceCatalog(backend.fetch, ttl=0)
+
+    async def main():
+        for _ in range(3):
+            await catalog.resolve("my")
+
+    asyncio.run(main())
+    assert backend.fetches == 3
@@ -0,0 +1,159 @@
+"""
+In-process catalog of AnythingLLM workspaces.
+
+The AnythingLLM API addresses workspaces by slug, while callers usually pass
+a display name. The catalog keeps the result of GET /api/v1/workspaces with
+dict indexes on slug, name and case-folded name, so resolving a workspace
+is a local O(1) lookup and unknown workspaces fail before any request is
+sent.
+
+The list is refreshed after ``ttl`` seconds. A stale list keeps answering
+while a single background refresh runs. A lookup that misses forces one
+refresh, at most every ``miss_refresh_interval`` seconds, so workspaces
+created outside this process are found without a refresh storm from
+repeated typos. Call invalidate() after creating or deleting a workspace.
+"""
+
+import asyncio
+import difflib
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+FetchFunc = Callable[[], Awaitable[List[dict]]]
+
+
+class UnknownWorkspaceError(Exception):
+    """Raised when a name matches no workspace slug or name."""
+
+    def __init__(self, name: str, suggestions: Optional[List[str]] = None):
+        self.name = name
+        self.suggestions = suggestions or []
+        message = f"Unknown workspace: {name!r}"
+        if self.suggestions:
+            message += f" (did you mean: {', '.join(self.suggestions)}?)"
+        super().__init__(message)
+
+
+class WorkspaceCatalog:
+    """
+    Cached workspace list with name -> slug resolution.
+
+    Args:
+        fetch: Coroutine function returning the "workspaces" list of GET /api/v1/workspaces
+        ttl: Seconds before the list is refreshed in the background; 0 refetches on every use
+        miss_refresh_interval: Minimum seconds between refreshes forced by unknown names
+    """
+
+    def __init__(self, fetch: FetchFunc, ttl: float = 60.0, miss_refresh_interval: float = 5.0):
+        self._fetch = fetch
+        self.ttl = max(0.0, ttl)
+        self.miss_refresh_interval = miss_refresh_interval
+        self._workspaces: Optional[List[dict]] = None
+        self._by_key: Dict[str, str] = {}
+        self._fetched_at = 0.0
+        self._refresh: Optional[asyncio.Task] = None
+        self._generation = 0
+        self.refreshes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls, fetch: FetchFunc) -> "WorkspaceCatalog":
+        """Build a catalog using ANYTHINGLLM_WORKSPACE_TTL (seconds, default 60)."""
+        try:
+            ttl = float(os.getenv("ANYTHINGLLM_WORKSPACE_TTL", 60))
+        except ValueError:
+            ttl = 60.0
+        return cls(fetch, ttl=ttl)
+
+    # ---------- refresh ----------
+    def _age(self) -> float:
+        return time.monotonic() - self._fetched_at
+
+    def _start_refresh(self) -> asyncio.Task:
+        """Start a refresh unless one is already running; concurrent callers share it."""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.ensure_future(self._do_refresh())
+            # mark a failed background refresh as retrieved; the stale list stays in use
+            self._refresh.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return self._refresh
+
+    async def _do_refresh(self) -> None:
+        generation = self._generation
+        workspaces = list(await self._fetch())
+        if generation != self._generation:
+            # invalidated while the request was in flight: the result may predate the change
+            return await self._do_refresh()
+        by_key: Dict[str, str] = {}
+        # slugs win over names, exact names over case-folded ones
+        for ws in workspaces:
+            name = ws.get("name")
+            if name:
+                by_key.setdefault(f"folded:{name.casefold()}", ws["slug"])
+        for ws in workspaces:
+            if ws.get("name"):
+                by_key[f"name:{ws['name']}"] = ws["slug"]
+        for ws in workspaces:
+            by_key[f"slug:{ws['slug']}"] = ws["slug"]
+        self._workspaces, self._by_key = workspaces, by_key
+        self._fetched_at = time.monotonic()
+        self.refreshes += 1
+
+    async def _ensure(self) -> None:
+        if self._workspaces is None or self.ttl == 0:
+            await asyncio.shield(self._start_refresh())
+        elif self._age() >= self.ttl:
+            self._start_refresh()
+
+    def invalidate(self) -> None:
+        """Drop the cached list; the next use fetches it again."""
+        self._workspaces = None
+        self._by_key = {}
+        self._generation += 1
+        self.invalidations += 1
+
+    # ---------- lookups ----------
+    async def workspaces(self) -> List[dict]:
+        await self._ensure()
+        return list(self._workspaces or [])
+
+    def _lookup(self, name: str) -> Optional[str]:
+        for key in (f"slug:{name}", f"name:{name}", f"folded:{name.casefold()}"):
+            slug = self._by_key.get(key)
+            if slug is not None:
+                return slug
+        return None
+
+    async def resolve(self, name: str) -> str:
+        """
+        Return the slug for a workspace slug or name.
+
+        Raises:
+            UnknownWorkspaceError: if nothing matches, even after a fresh fetch
+        """
+        name = (name or "").strip()
+        await self._ensure()
+        slug = self._lookup(name)
+        if slug is None and self._age() >= self.miss_refresh_interval:
+            await asyncio.shield(self._start_refresh())
+            slug = self._lookup(name)
+        if slug is None:
+            self.misses += 1
+            candidates = [ws["slug"] for ws in self._workspaces or []]
+            candidates += [ws["name"] for ws in self._workspaces or [] if ws.get("name")]
+            raise UnknownWorkspaceError(name, difflib.get_close_matches(name, candidates, n=3))
+        self.hits += 1
+        return slug
+
+    def stats(self) -> dict:
+        return {
+            "workspaces": len(self._workspaces) if self._workspaces is not None else None,
+            "age_seconds": round(self._age(), 1) if self._workspaces is not None else None,
+            "ttl": self.ttl,
+            "refreshes": self.refreshes,
+            "resolved": self.hits,
+            "unknown": self.misses,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,308 @@
+"""
+Benchmark harness for the AnythingLLM MCP tools
+
+Drives the tools through fastmcp.Client against the local stub server
+(stub_server.py, started automatically) or a real instance (--base-url), and
+reports p50/p95/p99 latency, throughput and peak RSS per scenario.
+
+Scenarios:
+    ingest        server_v2 upload_folder on a generated folder, plus concurrent upload_file calls
+    query         server_v2 query
+    stdio-query   stdio/anythingllm_mcp.py query_knowledge_base (subprocess)
+    stream        stdio/anythingllm_streaming_mcp.py query_knowledge_base_stream (subprocess)
+
+server_v2 runs in-process, so its RSS includes the harness; the stdio servers
+run as subprocesses and report their own peak RSS.
+
+Usage:
+    python benchmark.py --scenarios ingest,query --files 500 --queries 200 --concurrency 16
+    python benchmark.py --stub-arg=--latency --stub-arg=chat=0.5 --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from fastmcp import Client
+from fastmcp.client.transports import PythonStdioTransport
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DIR = Path(__file__).resolve().parent
+MCP_DIR = BENCH_DIR.parent
+SCENARIOS = ("ingest", "query", "stdio-query", "stream")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+
+class Result:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.wall = 0.0
+        self.units = 0          # items processed (calls, or files for ingest)
+        self.unit_name = "calls"
+        self.rss_mb: Optional[float] = None
+        self.notes: Dict[str, object] = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "scenario": self.name,
+            "calls": len(self.latencies),
+            "errors": self.errors,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 2),
+            "mean_ms": round(sum(self.latencies) / len(self.latencies) * 1000, 2) if self.latencies else 0.0,
+            "wall_s": round(self.wall, 3),
+            "throughput": round(self.units / self.wall, 2) if self.wall else 0.0,
+            "throughput_unit": f"{self.unit_name}/s",
+            "peak_rss_mb": self.rss_mb,
+            **self.notes,
+        }
+
+
+async def run_calls(result: Result, count: int, concurrency: int,
+                    call: Callable[[int], Awaitable[bool]]) -> None:
+    """Run ``call(i)`` ``count`` times with at most ``concurrency`` in flight."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            result.latencies.append(time.perf_counter() - start)
+            if not ok:
+                result.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    result.wall += time.perf_counter() - start
+    result.units += count
+
+
+def make_folder(root: Path, files: int, size: int) -> Path:
+    """Generate ``files`` text files of ``size`` bytes spread over a few directories."""
+    line = "The quick brown fox jumps over the lazy dog.\n"
+    body = (line * (size // len(line) + 1))[:size]
+    for i in range(files):
+        path = root / f"dir{i % 10}" / f"file{i}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"# file {i}\n{body}", encoding="utf-8")
+    return root
+
+
+async def scenario_ingest(args, server_v2) -> List[Result]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="anythingllm-bench-") as tmp:
+        folder = make_folder(Path(tmp) / "corpus", args.files, args.file_size)
+
+        folder_result = Result("ingest:upload_folder")
+        folder_result.unit_name = "files"
+        async with Client(server_v2.mcp) as client:
+            async def upload_folder(_):
+                r = await client.call_tool("upload_folder", {"workspace": args.workspace,
+                                                             "folder_path": str(folder),
+                                                             "bundle": args.bundle},
+                                           raise_on_error=False)
+                data = r.structured_content or {}
+                folder_result.notes["status"] = data.get("status")
+                folder_result.notes["uploaded"] = data.get("successful")
+                return not r.is_error and data.get("status") == "indexed"
+
+            await run_calls(folder_result, 1, 1, upload_folder)
+            folder_result.units = args.files
+
+            file_result = Result("ingest:upload_file")
+            files = sorted(folder.rglob("*.md"))[: args.queries]
+
+            async def upload_file(i):
+                r = await client.call_tool("upload_file", {"workspace": args.workspace,
+                                                           "file_path": str(files[i])},
+                                           raise_on_error=False)
+                return not r.is_error and (r.structured_content or {}).get("status") == "indexed"
+
+            await run_calls(file_result, len(files), args.concurrency, upload_file)
+
+        folder_result.rss_mb = file_result.rss_mb = peak_rss_mb()
+        results += [folder_result, file_result]
+    return results
+
+
+async def scenario_query(args, server_v2) -> List[Result]:
+    result = Result("query")
+    async with Client(server_v2.mcp) as client:
+        async def query(i):
+            prompt = f"benchmark question {i % args.distinct_prompts}"
+            r = await client.call_tool("query", {"workspace": args.workspace, "prompt": prompt},
+                                       raise_on_error=False)
+            return not r.is_error
+
+        await run_calls(result, args.queries, args.concurrency, query)
+    result.rss_mb = peak_rss_mb()
+    return [result]
+
+
+async def scenario_stdio(args, env: Dict[str, str], script: str, tool: str, name: str) -> List[Result]:
+    result = Result(name)
+    transport = PythonStdioTransport(MCP_DIR / "stdio" / script, env=env, cwd=str(MCP_DIR / "stdio"))
+    async with Client(transport) as client:
+        async def call(i):
+            prompt = f"benchmark question {i % args.distinct_prompts}"
+            r = await client.call_tool(tool, {"prompt": prompt}, raise_on_error=False)
+            return not r.is_error
+
+        await run_calls(result, args.queries, args.concurrency, call)
+    # The subprocess has exited by now, so it is included in the children's usage
+    result.rss_mb = peak_rss_mb(children=True)
+    return [result]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(stub_args: List[str]):
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR / "stub_server.py"), "--port", str(port), *stub_args],
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{base_url}/stub/stats", timeout=1)
+            return proc, base_url
+        except httpx.HTTPError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("stub server did not start")
+
+
+def print_table(rows: List[dict]) -> None:
+    header = f"{'scenario':<22}{'calls':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'throughput':>18}{'RSS MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        throughput = f"{row['throughput']} {row['throughput_unit']}"
+        rss = row["peak_rss_mb"] if row["peak_rss_mb"] is not None else "-"
+        print(f"{row['scenario']:<22}{row['calls']:>7}{row['errors']:>5}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{throughput:>18}{rss:>9}")
+        if row.get("error"):
+            print(f"  {row['error']}")
+
+
+async def main_async(args) -> List[dict]:
+    stub = None
+    base_url = args.base_url
+    if not base_url:
+        stub, base_url = start_stub(args.stub_arg or [])
+
+    state_dir = tempfile.mkdtemp(prefix="anythingllm-bench-state-")
+    env = {
+        **os.environ,
+        "ANYTHINGLLM_BASE_URL": base_url,
+        "ANYTHINGLLM_API_KEY": args.api_key,
+        "ANYTHINGLLM_STATE_DIR": state_dir,
+        "WORKSPACE_NAME": args.workspace,
+    }
+    os.environ.update(env)
+
+    rows = []
+    try:
+        scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+        server_v2 = None
+        if {"ingest", "query"} & set(scenarios):
+            sys.path.insert(0, str(MCP_DIR / "sse"))
+            import server_v2
+
+        for scenario in scenarios:
+            if scenario not in SCENARIOS:
+                raise SystemExit(f"unknown scenario: {scenario} (choose from {', '.join(SCENARIOS)})")
+            try:
+                if scenario == "ingest":
+                    results = await scenario_ingest(args, server_v2)
+                elif scenario == "query":
+                    results = await scenario_query(args, server_v2)
+                elif scenario == "stdio-query":
+                    results = await scenario_stdio(args, env, "anythingllm_mcp.py",
+                                                   "query_knowledge_base", "stdio-query")
+                else:
+                    results = await scenario_stdio(args, env, "anythingllm_streaming_mcp.py",
+                                                   "query_knowledge_base_stream", "stream")
+            except Exception as e:
+                # e.g. the server failed to start; keep going with the other scenarios
+                failed = Result(scenario)
+                failed.notes["error"] = f"{type(e).__name__}: {e}"
+                results = [failed]
+            rows += [r.to_dict() for r in results]
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AnythingLLM MCP tools")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--base-url", help="Use this AnythingLLM instead of starting the stub")
+    parser.add_argument("--api-key", default="benchmark")
+    parser.add_argument("--workspace", default="my")
+    parser.add_argument("--files", type=int, default=200, help="Files in the generated ingest folder")
+    parser.add_argument("--file-size", type=int, default=4096, help="Bytes per generated file")
+    parser.add_argument("--bundle", action="store_true", help="Pack small files into bundles in upload_folder")
+    parser.add_argument("--queries", type=int, default=100, help="Calls per query/stream/upload_file scenario")
+    parser.add_argument("--distinct-prompts", type=int, default=10**9,
+                        help="Number of distinct prompts to cycle through (small values exercise caching)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stub-arg", action="append",
+                        help="Extra argument for stub_server.py, may be repeated (--stub-arg=--error-rate --stub-arg=0.05)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    rows = asyncio.run(main_async(args))
+    print_table(rows)
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
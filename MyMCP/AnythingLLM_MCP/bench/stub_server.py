@@ -0,0 +1,304 @@
+"""
+Local stand-in for the AnythingLLM developer API
+
+Implements the endpoints the MCP servers use (see anythingllm_api.md) with
+in-memory state, configurable latency and error injection, so tool latency
+can be measured without a live AnythingLLM instance.
+
+Usage:
+    python stub_server.py --port 3001 --latency chat=0.5 --latency upload=0.05 \
+        --jitter 0.2 --error-rate 0.01 --error-status 503
+
+Latency groups: auth, system, workspaces, workspace, upload, embed, documents,
+chat, stream (delay before the first chunk), stream_chunk (delay between chunks)
+and default.
+
+GET /stub/stats returns per-endpoint request counts, POST /stub/reset clears
+state and counters.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+DEFAULT_LATENCY = {
+    "default": 0.005,
+    "upload": 0.05,
+    "embed": 0.1,
+    "chat": 0.3,
+    "stream": 0.1,
+    "stream_chunk": 0.01,
+}
+
+
+class StubConfig:
+    def __init__(self, latency: Optional[Dict[str, float]] = None, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500, stream_chunks: int = 20,
+                 api_key: Optional[str] = None, seed: Optional[int] = None):
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stream_chunks = stream_chunks
+        self.api_key = api_key
+        self.random = random.Random(seed)
+
+
+class StubState:
+    def __init__(self):
+        self.workspaces: Dict[str, dict] = {}
+        self.documents: Dict[str, dict] = {}
+        self.requests: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.started = time.time()
+        self.add_workspace("my")
+
+    def add_workspace(self, name: str) -> dict:
+        slug = name.strip().lower().replace(" ", "-")
+        workspace = self.workspaces.get(slug)
+        if workspace is None:
+            workspace = {
+                "id": len(self.workspaces) + 1,
+                "name": name,
+                "slug": slug,
+                "chatMode": "chat",
+                "topN": 4,
+                "documents": {},
+                "threads": [],
+            }
+            self.workspaces[slug] = workspace
+        return workspace
+
+
+def _public_workspace(workspace: dict, with_documents: bool = False) -> dict:
+    result = {k: v for k, v in workspace.items() if k != "documents"}
+    if with_documents:
+        result["documents"] = list(workspace["documents"].values())
+    return result
+
+
+def create_app(config: StubConfig) -> Starlette:
+    state = StubState()
+
+    async def simulate(request: Request, group: str) -> Optional[Response]:
+        """Count the request, apply latency and optionally inject an error."""
+        state.requests[group] += 1
+        if config.api_key and request.headers.get("authorization") != f"Bearer {config.api_key}":
+            return JSONResponse({"message": "Invalid API Key"}, status_code=403)
+        delay = config.latency.get(group, config.latency["default"])
+        if config.jitter:
+            delay *= 1 + config.random.uniform(-config.jitter, config.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if config.error_rate and config.random.random() < config.error_rate:
+            state.errors[group] += 1
+            headers = {"Retry-After": "1"} if config.error_status in (429, 503) else None
+            return PlainTextResponse("Injected error", status_code=config.error_status, headers=headers)
+        return None
+
+    def workspace_or_404(slug: str):
+        workspace = state.workspaces.get(slug)
+        if workspace is None:
+            return None, JSONResponse({"message": f"Workspace {slug} not found"}, status_code=400)
+        return workspace, None
+
+    async def auth(request):
+        return await simulate(request, "auth") or JSONResponse({"authenticated": True})
+
+    async def system(request):
+        return await simulate(request, "system") or JSONResponse(
+            {"settings": {"VectorDB": "lancedb"}, "version": "stub"})
+
+    async def list_workspaces(request):
+        return await simulate(request, "workspaces") or JSONResponse(
+            {"workspaces": [_public_workspace(w) for w in state.workspaces.values()]})
+
+    async def new_workspace(request):
+        error = await simulate(request, "workspace")
+        if error:
+            return error
+        body = await request.json()
+        workspace = state.add_workspace(body.get("name") or "workspace")
+        return JSONResponse({"workspace": _public_workspace(workspace), "message": None})
+
+    async def get_workspace(request):
+        error = await simulate(request, "workspace")
+        if error:
+            return error
+        workspace, missing = workspace_or_404(request.path_params["slug"])
+        return missing or JSONResponse({"workspace": [_public_workspace(workspace, True)]})
+
+    async def upload(request):
+        form = await request.form()
+        upload_file = form.get("file")
+        size = 0
+        if upload_file is not None and hasattr(upload_file, "read"):
+            while True:
+                chunk = await upload_file.read(1024 * 1024)
+                if not chunk:
+                    break
+                size += len(chunk)
+        error = await simulate(request, "upload")
+        if error:
+            return error
+        if upload_file is None:
+            return JSONResponse({"success": False, "error": "No file", "documents": []}, status_code=400)
+        doc_id = str(uuid.uuid4())
+        title = upload_file.filename
+        location = f"custom-documents/{title.replace('/', '_')}-{doc_id}.json"
+        document = {
+            "id": doc_id,
+            "url": f"file://{title}",
+            "title": title,
+            "docSource": "stub",
+            "wordCount": size // 6,
+            "token_count_estimate": size // 4,
+            "location": location,
+        }
+        state.documents[location] = document
+        return JSONResponse({"success": True, "error": None, "documents": [document]})
+
+    async def update_embeddings(request):
+        error = await simulate(request, "embed")
+        if error:
+            return error
+        workspace, missing = workspace_or_404(request.path_params["slug"])
+        if missing:
+            return missing
+        body = await request.json()
+        for location in body.get("adds") or []:
+            document = state.documents.get(location, {"id": str(uuid.uuid4()), "title": location})
+            workspace["documents"][location] = {"docId": document["id"], "docpath": location,
+                                                "filename": location.rsplit("/", 1)[-1]}
+        for location in body.get("deletes") or []:
+            workspace["documents"].pop(location, None)
+        return JSONResponse({"workspace": _public_workspace(workspace, True)})
+
+    async def workspace_documents(request):
+        error = await simulate(request, "documents")
+        if error:
+            return error
+        workspace, missing = workspace_or_404(request.path_params["slug"])
+        return missing or JSONResponse({"documents": list(workspace["documents"].values())})
+
+    def _sources(workspace: dict):
+        return [
+            {"id": doc["docId"], "title": doc.get("filename"), "text": "stub passage", "score": 0.5}
+            for doc in list(workspace["documents"].values())[:4]
+        ]
+
+    async def chat(request):
+        error = await simulate(request, "chat")
+        if error:
+            return error
+        workspace, missing = workspace_or_404(request.path_params["slug"])
+        if missing:
+            return missing
+        body = await request.json()
+        return JSONResponse({
+            "id": str(uuid.uuid4()),
+            "type": "textResponse",
+            "textResponse": f"Stub answer to: {body.get('message', '')}",
+            "sources": _sources(workspace),
+            "close": True,
+            "error": None,
+        })
+
+    async def stream_chat(request):
+        error = await simulate(request, "stream")
+        if error:
+            return error
+        workspace, missing = workspace_or_404(request.path_params["slug"])
+        if missing:
+            return missing
+        body = await request.json()
+        reply_id = str(uuid.uuid4())
+        words = f"Stub streamed answer to: {body.get('message', '')}".split()
+        count = max(1, config.stream_chunks)
+
+        async def events():
+            for i in range(count):
+                text = words[i % len(words)] + " "
+                yield "data: " + json.dumps({"uuid": reply_id, "sources": [], "type": "textResponseChunk",
+                                             "textResponse": text, "close": False, "error": False}) + "\n\n"
+                await asyncio.sleep(config.latency["stream_chunk"])
+            yield "data: " + json.dumps({"uuid": reply_id, "sources": _sources(workspace), "type": "textResponseChunk",
+                                         "textResponse": "", "close": False, "error": False}) + "\n\n"
+            yield "data: " + json.dumps({"uuid": reply_id, "type": "finalizeResponseStream",
+                                         "close": True, "error": False}) + "\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def stats(request):
+        return JSONResponse({
+            "uptime": round(time.time() - state.started, 3),
+            "requests": dict(state.requests),
+            "errors": dict(state.errors),
+            "workspaces": len(state.workspaces),
+            "documents": len(state.documents),
+        })
+
+    async def reset(request):
+        state.__init__()
+        return JSONResponse({"reset": True})
+
+    return Starlette(routes=[
+        Route("/api/v1/auth", auth),
+        Route("/api/v1/system", system),
+        Route("/api/v1/workspaces", list_workspaces),
+        Route("/api/v1/workspace/new", new_workspace, methods=["POST"]),
+        Route("/api/v1/workspace/{slug}", get_workspace),
+        Route("/api/v1/workspace/{slug}/update-embeddings", update_embeddings, methods=["POST"]),
+        Route("/api/v1/workspace/{slug}/documents", workspace_documents),
+        Route("/api/v1/workspace/{slug}/chat", chat, methods=["POST"]),
+        Route("/api/v1/workspace/{slug}/stream-chat", stream_chat, methods=["POST"]),
+        Route("/api/v1/document/upload", upload, methods=["POST"]),
+        Route("/stub/stats", stats),
+        Route("/stub/reset", reset, methods=["POST"]),
+    ])
+
+
+def _parse_latency(values) -> Dict[str, float]:
+    latency = {}
+    for item in values or []:
+        group, _, seconds = item.partition("=")
+        latency[group.strip()] = float(seconds)
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local AnythingLLM stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--latency", action="append", metavar="GROUP=SECONDS",
+                        help="Per-endpoint latency, may be repeated (e.g. chat=0.5)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Relative latency jitter, e.g. 0.2 = ±20%%")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected errors")
+    parser.add_argument("--stream-chunks", type=int, default=20, help="Text chunks per stream-chat response")
+    parser.add_argument("--api-key", default=None, help="Require this bearer token (default: accept any)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=_parse_latency(args.latency), jitter=args.jitter, error_rate=args.error_rate,
+        error_status=args.error_status, stream_chunks=args.stream_chunks,
+        api_key=args.api_key, seed=args.seed,
+    )
+    print(f"AnythingLLM stub listening on http://{args.host}:{args.port}")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
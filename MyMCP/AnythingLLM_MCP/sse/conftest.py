@@ -0,0 +1,78 @@
+"""
+Shared fixtures for tests that drive the server_v2 tools directly: a fake
+AnythingLLM backend that records uploads and update-embeddings calls, and
+server state (manifests, content index, reports) kept under tmp_path.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeCatalog:
+    async def resolve(self, workspace):
+        return workspace
+
+    def invalidate(self):
+        pass
+
+
+class FakeBackend:
+    """Stands in for AnythingLLMClient; each upload gets a new location"""
+
+    def __init__(self):
+        self.catalog = FakeCatalog()
+        self.uploads = []           # uploaded file names
+        self.embeddings = []        # (workspace, adds, deletes) per successful call
+        self.fail_uploads = set()   # file names whose upload raises
+        self.fail_embeddings = False
+        self.embed_delay = 0.0      # seconds each update-embeddings call takes
+
+    async def upload_body(self, body):
+        if body.path.name in self.fail_uploads:
+            raise RuntimeError(f"upload of {body.path.name} failed")
+        self.uploads.append(body.path.name)
+        return {"documents": [{"location": f"custom-documents/{body.path.name}-{len(self.uploads)}.json"}]}
+
+    async def update_embeddings(self, workspace, adds=None, deletes=None):
+        if self.embed_delay:
+            await asyncio.sleep(self.embed_delay)
+        if self.fail_embeddings:
+            raise RuntimeError("update-embeddings failed")
+        self.embeddings.append((workspace, list(adds or []), list(deletes or [])))
+        return {"workspace": {"slug": workspace}}
+
+    def embedded(self):
+        return [location for _, adds, _ in self.embeddings for location in adds]
+
+    def deleted(self):
+        return [location for _, _, deletes in self.embeddings for location in deletes]
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch, backend):
+    """server_v2 with the fake backend as its client and its state under tmp_path"""
+    import server_v2
+
+    state = tmp_path / "state"
+    monkeypatch.setattr(server_v2, "_client", backend)
+    monkeypatch.setattr(server_v2, "_cpu", None)
+    monkeypatch.setattr(server_v2, "_content_index", None)
+    monkeypatch.setattr(server_v2, "_sync_locks", {})
+    monkeypatch.setattr(server_v2, "DEDUP_ENABLED", True)
+    monkeypatch.setattr(server_v2, "STATE_DIR", state)
+    monkeypatch.setattr(server_v2, "REPORT_DIR", state / "reports")
+    try:
+        yield server_v2
+    finally:
+        if server_v2._content_index is not None:
+            server_v2._content_index.close()
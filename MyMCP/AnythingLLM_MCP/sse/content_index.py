@@ -0,0 +1,165 @@
+"""
+按内容去重的本地文档索引（SQLite）
+
+记录 sha256 → 已上传文档的 location。上传前先计算文件哈希，内容相同的文件已经上传过时
+直接把原有 location 提交给 update-embeddings，不再上传，目标是其他 workspace 时也一样；
+AnythingLLM 不需要重新解析该文件，并会复用该文档已缓存的向量。
+
+同一个 location 可能被多个文件夹或 workspace 共用，因此还记录每个 location 在各个
+workspace 中的引用者（sync_folder 的清单或普通上传）；sync_folder 删除文档前检查
+是否还有其他引用者，避免把其他上传仍在使用的文档从 workspace 中移除。
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sqlite_utils import Transaction
+
+# 普通上传（upload_file、upload_folder、导入任务）使用的引用者名称，这类引用不会被释放
+UPLOAD_OWNER = "upload"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    sha256 TEXT PRIMARY KEY,
+    location TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_location ON documents (location);
+CREATE TABLE IF NOT EXISTS refs (
+    location TEXT NOT NULL,
+    workspace TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    PRIMARY KEY (location, workspace, owner)
+);
+"""
+
+
+class DedupStats:
+    """一次调用（或整个进程）的去重命中统计"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def hit(self, size: int) -> None:
+        self.hits += 1
+        self.bytes_saved += size
+
+    def miss(self) -> None:
+        self.misses += 1
+
+    def merge(self, other: "DedupStats") -> None:
+        self.hits += other.hits
+        self.misses += other.misses
+        self.bytes_saved += other.bytes_saved
+
+    def to_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "uploads_avoided": self.hits,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+class ContentIndex:
+    """
+    内容哈希索引和 location 引用计数
+
+    所有方法都是同步的短事务（WAL 模式），可以直接在事件循环中调用。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # 本进程启动以来的命中统计
+        self.session = DedupStats()
+
+    def close(self) -> None:
+        self._db.close()
+
+    # ---------- 内容哈希 ----------
+    def lookup(self, sha256: str, size: int, stats: Optional[DedupStats] = None) -> Optional[str]:
+        """返回相同内容已上传文档的 location 并记录命中，没有时记录未命中并返回 None"""
+        row = self._db.execute("SELECT location FROM documents WHERE sha256 = ?", (sha256,)).fetchone()
+        for s in (self.session, stats):
+            if s is None:
+                continue
+            if row is None:
+                s.miss()
+            else:
+                s.hit(size)
+        if row is None:
+            return None
+        self._db.execute(
+            "UPDATE documents SET hits = hits + 1, last_used = ? WHERE sha256 = ?", (time.time(), sha256)
+        )
+        return row["location"]
+
+    def record(self, sha256: str, location: str, size: int) -> None:
+        now = time.time()
+        self._db.execute(
+            "INSERT INTO documents (sha256, location, size, created, last_used) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (sha256) DO UPDATE SET location = excluded.location, size = excluded.size,"
+            " last_used = excluded.last_used",
+            (sha256, location, size, now, now),
+        )
+
+    def forget(self, locations: Iterable[str]) -> int:
+        """删除指向这些 location 的条目（例如文档已不存在、无法嵌入），之后相同内容会重新上传"""
+        with Transaction(self._db):
+            cur = self._db.executemany(
+                "DELETE FROM documents WHERE location = ?", [(location,) for location in locations]
+            )
+        return cur.rowcount
+
+    # ---------- 引用 ----------
+    def add_refs(self, locations: Iterable[str], workspace: str, owner: str) -> None:
+        with Transaction(self._db):
+            self._db.executemany(
+                "INSERT OR IGNORE INTO refs (location, workspace, owner) VALUES (?, ?, ?)",
+                [(location, workspace, owner) for location in locations],
+            )
+
+    def has_ref(self, location: str, workspace: str) -> bool:
+        """location 是否已被提交到 workspace（任一引用者）"""
+        row = self._db.execute(
+            "SELECT 1 FROM refs WHERE location = ? AND workspace = ? LIMIT 1", (location, workspace)
+        ).fetchone()
+        return row is not None
+
+    def release_ref(self, location: str, workspace: str, owner: str) -> bool:
+        """释放 owner 对 location 的引用，返回 workspace 中是否还有其他引用者"""
+        self._db.execute(
+            "DELETE FROM refs WHERE location = ? AND workspace = ? AND owner = ?", (location, workspace, owner)
+        )
+        row = self._db.execute(
+            "SELECT 1 FROM refs WHERE location = ? AND workspace = ? LIMIT 1", (location, workspace)
+        ).fetchone()
+        return row is not None
+
+    def stats(self) -> dict:
+        row = self._db.execute(
+            "SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes,"
+            " COALESCE(SUM(hits), 0) AS hits, COALESCE(SUM(hits * size), 0) AS saved FROM documents"
+        ).fetchone()
+        return {
+            "entries": row["entries"],
+            "indexed_bytes": row["bytes"],
+            "session": self.session.to_dict(),
+            "total_hits": row["hits"],
+            "total_bytes_saved": row["saved"],
+        }
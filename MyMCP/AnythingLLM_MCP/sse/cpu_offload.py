@@ -0,0 +1,186 @@
+"""
+CPU 密集型工作（文件哈希、合并文档的文本预处理）的进程池
+
+上传工具在事件循环中处理请求，哈希和文本解码如果在同一进程内执行，会与其他客户端的
+请求争抢 GIL 和 CPU。CpuOffload 把这些工作交给独立的进程池：
+
+- 有界队列：同时交给进程池的任务最多 workers + queue_size 个，其余调用方在 run() 中
+  等待（背压），上传 worker 因此不会无限制地领先于进程池，也不会堆积大量待处理的结果；
+- 进程池只由 start() 创建（服务器的 lifespan 中调用），POSIX 上使用 forkserver（不继承
+  事件循环和后台线程的状态），其他平台使用 spawn；子进程忽略 SIGINT，由主进程统一关闭；
+- start() 之前、shutdown() 之后以及 workers 为 0 时，任务在默认线程池中运行（即原来的
+  asyncio.to_thread），因此直接调用工具函数的脚本不会启动子进程；
+- start() 创建进程池失败时记录一次警告，之后全部任务在线程池中运行，调用方不会因此失败；
+- 进程池中的进程异常退出时重建进程池并重试一次，重建失败按上一条处理。
+
+交给 run() 的函数和参数必须可以 pickle：使用模块级函数，参数使用 str、Path 等简单类型。
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+_log = logging.getLogger("anythingllm.cpu")
+
+
+def _ignore_sigint() -> None:
+    """进程池子进程的初始化函数：Ctrl+C 只由主进程处理"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class CpuOffload:
+    """
+    带有界等待队列的进程池，start() 之前在线程池中运行
+
+    Args:
+        workers: 进程数，0 表示在线程池中运行
+        queue_size: 进程全部忙碌时最多再排队的任务数，超过后调用方等待
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = max(0, workers)
+        self.queue_size = max(0, queue_size)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._rebuild_lock: Optional[asyncio.Lock] = None
+        # 进程池无法创建时的错误；不为 None 时全部任务在线程池中运行
+        self.fallback_error: Optional[str] = None
+        # waiting：等待队列空位的调用数；in_pool：已交给进程池（执行中或在池内排队）的任务数
+        self.waiting = 0
+        self.in_pool = 0
+        self.completed = 0
+        self.failed = 0
+        self.pool_restarts = 0
+        self.wait_seconds = 0.0
+        self.task_seconds = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return max(1, self.workers) + self.queue_size
+
+    @property
+    def mode(self) -> str:
+        return "process" if self._pool is not None else "thread"
+
+    async def start(self) -> None:
+        """
+        创建进程池并等待第一个子进程启动；workers 为 0、已经启动或已经回退到线程池时什么也不做
+
+        创建失败（无法创建进程、子进程启动时出错等）时记录一次警告，之后全部任务在线程池中运行。
+        """
+        if self.workers == 0 or self._pool is not None or self.fallback_error is not None:
+            return
+        try:
+            self._pool = await self._create_pool()
+        except Exception as e:
+            self._fall_back(e)
+
+    async def _create_pool(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context(), initializer=_ignore_sigint)
+        try:
+            # 先执行一个空任务：子进程无法启动时在这里报错，而不是在第一个真实任务中
+            await asyncio.wrap_future(pool.submit(os.getpid))
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        return pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """在进程池（未启动时在线程池）中执行 fn(*args) 并返回结果；队列已满时先等待空位"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.capacity)
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        self.wait_seconds += started - start
+        self.in_pool += 1
+        try:
+            pool = self._pool
+            if pool is None:
+                result = await asyncio.to_thread(fn, *args)
+            else:
+                result = await self._run_in_pool(pool, fn, *args)
+        except BaseException:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+            return result
+        finally:
+            self.in_pool -= 1
+            self.task_seconds += time.perf_counter() - started
+            self._slots.release()
+
+    async def _run_in_pool(self, pool: ProcessPoolExecutor, fn: Callable[..., Any], *args: Any) -> Any:
+        # fn 在子进程中抛出的异常原样传给调用方；只有 BrokenProcessPool 说明进程池本身不可用
+        try:
+            return await asyncio.wrap_future(pool.submit(fn, *args))
+        except BrokenProcessPool:
+            pass
+        # 子进程被杀死（例如内存不足）后整个进程池不可用，重建后重试一次
+        pool = await self._rebuild(pool)
+        if pool is None:
+            return await asyncio.to_thread(fn, *args)
+        return await asyncio.wrap_future(pool.submit(fn, *args))
+
+    async def _rebuild(self, broken: ProcessPoolExecutor) -> Optional[ProcessPoolExecutor]:
+        """替换已损坏的进程池（同时遇到损坏的调用方只重建一次）；重建失败时返回 None"""
+        if self._rebuild_lock is None:
+            self._rebuild_lock = asyncio.Lock()
+        async with self._rebuild_lock:
+            if self._pool is broken:
+                self._discard_pool()
+                self.pool_restarts += 1
+                try:
+                    self._pool = await self._create_pool()
+                except Exception as e:
+                    self._fall_back(e)
+            return self._pool
+
+    def _fall_back(self, error: BaseException) -> None:
+        self._discard_pool()
+        if self.fallback_error is None:
+            message = " ".join(str(error).split())
+            self.fallback_error = f"{type(error).__name__}: {message}" if message else type(error).__name__
+            _log.warning("无法使用 CPU 进程池，改为在线程池中运行", extra={
+                "workers": self.workers, "error": self.fallback_error})
+
+    def _discard_pool(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        """取消尚未开始的任务并关闭进程池（不等待运行中的任务）；之后的任务在线程池中运行，直到再次 start()"""
+        self._discard_pool()
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "mode": self.mode,
+            "fallback_error": self.fallback_error,
+            "queue_size": self.queue_size,
+            "waiting": self.waiting,
+            "in_pool": self.in_pool,
+            "completed": self.completed,
+            "failed": self.failed,
+            "pool_restarts": self.pool_restarts,
+            "avg_wait_ms": round(self.wait_seconds / finished * 1000, 3) if finished else 0.0,
+            "avg_task_ms": round(self.task_seconds / finished * 1000, 3) if finished else 0.0,
+        }
@@ -0,0 +1,137 @@
+"""
+分批提交 update-embeddings
+
+上传过程中每凑满一批 location 就立即提交，与仍在进行的上传并行；
+全部上传结束后只重试失败的批次，并记录每个批次的耗时。
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional, Set
+
+# commit(adds, deletes) -> 任意响应；失败时抛出异常
+CommitFunc = Callable[[List[str], List[str]], Awaitable[object]]
+
+
+class _Batch:
+    def __init__(self, index: int, adds: List[str], deletes: List[str]):
+        self.index = index
+        self.adds = adds
+        self.deletes = deletes
+        self.status = "pending"
+        self.attempts = 0
+        self.seconds = 0.0
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        result = {
+            "batch": self.index,
+            "adds": len(self.adds),
+            "deletes": len(self.deletes),
+            "status": self.status,
+            "attempts": self.attempts,
+            "seconds": round(self.seconds, 3),
+        }
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+class EmbeddingCommitter:
+    """
+    收集上传得到的 location，按 batch_size 分批调用 commit
+
+    用法:
+        committer = EmbeddingCommitter(commit, batch_size=100)
+        committer.add(location)        # 上传成功后调用，批满时立即在后台提交
+        summary = await committer.finish(deletes=[...])
+        # 调用方被取消时：await committer.cancel()，不再提交后台批次
+    """
+
+    def __init__(self, commit: CommitFunc, *, batch_size: int = 100,
+                 concurrency: int = 1, max_retries: int = 2, retry_delay: float = 1.0):
+        self._commit = commit
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max(0, max_retries)
+        self.retry_delay = retry_delay
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._buffer: List[str] = []
+        self._added: Set[str] = set()
+        self._batches: List[_Batch] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, location: str) -> None:
+        # 内容去重后多个文件可能共用一个 location，只提交一次
+        if location in self._added:
+            return
+        self._added.add(location)
+        self._buffer.append(location)
+        if len(self._buffer) >= self.batch_size:
+            self._submit(self._buffer, [])
+            self._buffer = []
+
+    def _submit(self, adds: List[str], deletes: List[str]) -> None:
+        batch = _Batch(len(self._batches), adds, deletes)
+        self._batches.append(batch)
+        self._tasks.append(asyncio.create_task(self._run(batch)))
+
+    async def _run(self, batch: _Batch) -> None:
+        async with self._semaphore:
+            start = time.perf_counter()
+            batch.attempts += 1
+            try:
+                await self._commit(batch.adds, batch.deletes)
+                batch.status = "ok"
+                batch.error = None
+            except Exception as e:
+                batch.status = "failed"
+                batch.error = str(e)
+            finally:
+                batch.seconds += time.perf_counter() - start
+
+    async def cancel(self) -> None:
+        """取消仍在后台提交的批次并等待其结束（finish 之后调用不做任何事）"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def finish(self, deletes: Optional[List[str]] = None) -> dict:
+        """
+        提交剩余的 location（deletes 随最后一批一起提交），等待全部批次完成并重试失败批次
+
+        Returns:
+            dict: embedded / failed 为成功、失败的 location 列表，deletes_committed 表示
+                  deletes 是否已提交成功，batches 为每个批次的统计
+        """
+        deletes = list(deletes or [])
+        if self._buffer or deletes:
+            self._submit(self._buffer, deletes)
+            self._buffer = []
+
+        await asyncio.gather(*self._tasks)
+        self._tasks = []
+
+        for _ in range(self.max_retries):
+            failed = [b for b in self._batches if b.status == "failed"]
+            if not failed:
+                break
+            await asyncio.sleep(self.retry_delay)
+            await asyncio.gather(*(self._run(b) for b in failed))
+
+        embedded, failed_locations = [], []
+        deletes_committed = True
+        for batch in self._batches:
+            if batch.status == "ok":
+                embedded.extend(batch.adds)
+            else:
+                failed_locations.extend(batch.adds)
+                if batch.deletes:
+                    deletes_committed = False
+
+        return {
+            "embedded": embedded,
+            "failed": failed_locations,
+            "deletes_committed": deletes_committed,
+            "batches": [b.to_dict() for b in self._batches],
+        }
@@ -0,0 +1,205 @@
+"""
+把大量小文本文件打包成合并文档上传
+
+代码仓库中大部分文件只有几 KB，逐个上传时每个文件都是一次 multipart 请求和一个
+文档。打包模式把扫描到的小文本文件按扫描顺序（同一目录的文件相邻）依次写入临时的
+合并文本文件，每个文件前加一行文件头标明相对路径；合并文件达到 max_bytes 后作为
+一个文档上传。AnythingLLM 的采集器不会解压 zip 等压缩包，因此使用纯文本合并而不是
+归档格式。
+
+超过 file_max_bytes、不是文本类型或不是 UTF-8 编码的文件不参与打包，照常单独上传。
+每个被打包的文件仍然单独记录结果，location 为所在合并文档的 location。
+
+pack() 只根据文件大小和类型分组（事件循环中执行，不读取内容）；读取、解码和规范化
+（去掉 UTF-8 BOM、换行统一为 \n）以及写入合并文件由 write_bundle() 完成，可以交给
+CPU 进程池（FileBundler.write）。
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+# 文件头格式，检索结果中可以据此看出片段来自哪个文件
+HEADER = "===== FILE: {path} ====="
+
+# 除 text/* 外也按文本处理的 MIME 类型
+TEXT_MIME_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "application/sql",
+    "application/x-yaml",
+    "application/toml",
+}
+
+
+def is_text_mime(mime_type: str) -> bool:
+    return mime_type.startswith("text/") or mime_type in TEXT_MIME_TYPES
+
+
+def normalize_text(data: bytes) -> Optional[str]:
+    """按 UTF-8 解码（去掉 BOM），换行统一为 \n；不是 UTF-8 时返回 None"""
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return None
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _chunk(rel_path: str, text: str) -> bytes:
+    chunk = f"{HEADER.format(path=rel_path)}\n{text}"
+    if not chunk.endswith("\n"):
+        chunk += "\n"
+    return (chunk + "\n").encode("utf-8")
+
+
+def write_bundle(path: str, entries: List[Tuple[str, str]]) -> Tuple[List[str], List[str]]:
+    """
+    依次读取 entries 中的 (文件路径, 相对路径)，规范化后带文件头写入合并文件 path
+
+    只使用可以 pickle 的参数和返回值，可以在 CPU 进程池中运行。
+
+    Returns:
+        (已写入的文件路径, 无法读取或不是 UTF-8、需要单独上传的文件路径)
+    """
+    written, rejected = [], []
+    with open(path, "wb") as out:
+        for file_path, rel_path in entries:
+            try:
+                text = normalize_text(Path(file_path).read_bytes())
+            except OSError:
+                text = None
+            if text is None:
+                rejected.append(file_path)
+                continue
+            out.write(_chunk(rel_path, text))
+            written.append(file_path)
+    return written, rejected
+
+
+class FileBundle:
+    """
+    一个合并文档及其包含的文件（按写入顺序）
+
+    pack() 产出时尚未写入：members 是候选文件，FileBundler.write() 写入后只保留成功写入的文件，
+    其余文件移到 rejected。
+    """
+
+    def __init__(self, path: Path, name: str, entries: List[Tuple[Path, str]]):
+        self.path = path
+        self.name = name
+        self.entries = entries
+        self.members = [file_path for file_path, _ in entries]
+        self.rejected: List[Path] = []
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    def discard(self) -> None:
+        """上传完成后删除临时文件"""
+        self.path.unlink(missing_ok=True)
+
+
+class FileBundler:
+    """
+    把文件流拆分为合并文档和需要单独上传的文件
+
+    用法:
+        with FileBundler(max_bytes=1 << 20, file_max_bytes=32 << 10, mime_type=get_mime_type) as bundler:
+            for item in bundler.pack(files, root):
+                if isinstance(item, FileBundle):
+                    await bundler.write(item, cpu.run)   # 之后上传 item.path，item.rejected 单独上传
+                ...  # 否则 item 为需要单独上传的 Path
+
+    Args:
+        max_bytes: 单个合并文档的大小上限（字节，单个文件本身超过时不打包）
+        file_max_bytes: 参与打包的单个文件大小上限（字节）
+        mime_type: 根据路径返回 MIME 类型的函数，只有文本类型参与打包
+    """
+
+    def __init__(self, max_bytes: int, file_max_bytes: int, mime_type: Callable[[Path], str]):
+        self.max_bytes = max(1, max_bytes)
+        self.file_max_bytes = min(max(0, file_max_bytes), self.max_bytes)
+        self.mime_type = mime_type
+        self.bundles = 0
+        self.bundled_files = 0
+        self._seq = 0
+        self._tmp: Optional[tempfile.TemporaryDirectory] = None
+
+    def __enter__(self) -> "FileBundler":
+        self._tmp = tempfile.TemporaryDirectory(prefix="anythingllm-bundles-")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
+        return False
+
+    def _size_if_bundleable(self, file_path: Path) -> Optional[int]:
+        """可打包文件的大小，不满足打包条件（过大、非文本类型）时返回 None"""
+        try:
+            size = file_path.stat().st_size
+        except OSError:
+            return None
+        if size > self.file_max_bytes or not is_text_mime(self.mime_type(file_path)):
+            return None
+        return size
+
+    def pack(self, files: Iterable[Path], root: Path) -> Iterator[Union[FileBundle, Path]]:
+        """
+        按需从 files 取文件：可打包的加入当前合并文档，按文件大小估计将满时产出；其余文件原样产出
+
+        只读取文件大小，不读取内容。规范化只会让内容变短，写入后的合并文档不超过 max_bytes。
+
+        Yields:
+            尚未写入的 FileBundle 或需要单独上传的 Path；最后一个未满的合并文档在 files 耗尽后产出
+        """
+        if self._tmp is None:
+            raise RuntimeError("FileBundler 需要在 with 语句中使用")
+        entries: List[Tuple[Path, str]] = []
+        total = 0
+        for file_path in files:
+            size = self._size_if_bundleable(file_path)
+            if size is None:
+                yield file_path
+                continue
+            rel_path = file_path.relative_to(root).as_posix()
+            # 文件头、末尾换行和空行
+            size += len(HEADER.format(path=rel_path).encode("utf-8")) + 3
+            if entries and total + size > self.max_bytes:
+                yield self._new_bundle(entries)
+                entries, total = [], 0
+            entries.append((file_path, rel_path))
+            total += size
+        if entries:
+            yield self._new_bundle(entries)
+
+    def _new_bundle(self, entries: List[Tuple[Path, str]]) -> FileBundle:
+        self._seq += 1
+        path = Path(self._tmp.name) / f"bundle-{self._seq:05d}.txt"
+        return FileBundle(path, path.name, entries)
+
+    async def write(self, bundle: FileBundle, run: Callable[..., Awaitable[Any]]) -> FileBundle:
+        """
+        通过 run(write_bundle, ...)（如 CpuOffload.run）写入合并文档，更新 members、rejected 和统计
+
+        没有任何文件写入成功时 members 为空，调用方不应上传该合并文档。
+        """
+        written, rejected = await run(
+            write_bundle, str(bundle.path), [(str(file_path), rel_path) for file_path, rel_path in bundle.entries]
+        )
+        written_set, rejected_set = set(written), set(rejected)
+        bundle.members = [file_path for file_path, _ in bundle.entries if str(file_path) in written_set]
+        bundle.rejected = [file_path for file_path, _ in bundle.entries if str(file_path) in rejected_set]
+        if bundle.members:
+            self.bundles += 1
+            self.bundled_files += len(bundle.members)
+        return bundle
+
+    def stats(self) -> dict:
+        return {"bundles": self.bundles, "bundled_files": self.bundled_files}
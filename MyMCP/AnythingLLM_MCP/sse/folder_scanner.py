@@ -0,0 +1,128 @@
+"""
+基于 os.scandir 的单遍目录扫描
+
+- 边扫描边产出文件，不预先收集整棵目录树
+- 在进入子目录之前判断是否忽略，被忽略的目录整体跳过
+- 支持任意层级的 .gitignore（深层规则优先，同一文件内后出现的规则优先）
+- 始终排除的模式（如 .git、node_modules）与 .gitignore 语法相同
+- 所有模式在读取时预编译为正则表达式
+- 无法读取的目录或条目通过 on_error 报告给调用方，由调用方判断扫描结果是否完整
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from gitignore_parser import rule_from_pattern
+
+# 默认始终排除的目录（gitignore 语法）
+DEFAULT_EXCLUDES = (
+    ".git/",
+    ".hg/",
+    ".svn/",
+    "node_modules/",
+    "__pycache__/",
+    ".venv/",
+    "venv/",
+    ".tox/",
+    ".mypy_cache/",
+    ".pytest_cache/",
+    ".ruff_cache/",
+)
+
+# (预编译正则, 是否取反, 是否只匹配目录)
+_Rule = Tuple["re.Pattern[str]", bool, bool]
+# (规则所在目录相对根目录的前缀长度, 规则列表)
+_Frame = Tuple[int, List[_Rule]]
+
+
+def compile_patterns(lines: Iterable[str]) -> List[_Rule]:
+    """把 gitignore 语法的模式编译为规则列表，忽略空行和注释"""
+    rules = []
+    for line in lines:
+        rule = rule_from_pattern(line.rstrip("\r\n"))
+        if rule:
+            rules.append((re.compile(rule.regex), rule.negation, rule.directory_only))
+    return rules
+
+
+def _load_gitignore(path: str) -> List[_Rule]:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return compile_patterns(f)
+    except OSError:
+        return []
+
+
+def _is_ignored(rel_path: str, is_dir: bool, frames: List[_Frame]) -> bool:
+    """从最深层的规则开始匹配，第一个命中的规则决定结果"""
+    for prefix_len, rules in reversed(frames):
+        sub_path = rel_path[prefix_len:]
+        for regex, negation, directory_only in reversed(rules):
+            if directory_only and not is_dir:
+                continue
+            if regex.search(sub_path):
+                return not negation
+    return False
+
+
+def scan_files(root: Path, excludes: Optional[Iterable[str]] = None,
+               use_gitignore: bool = True,
+               on_error: Optional[Callable[[str, OSError], None]] = None) -> Iterator[Path]:
+    """
+    扫描 root 下所有未被忽略的文件，按目录名排序依次产出
+
+    Args:
+        root: 扫描的根目录
+        excludes: 始终排除的模式（gitignore 语法），默认 DEFAULT_EXCLUDES
+        use_gitignore: 是否读取各层目录中的 .gitignore
+        on_error: 目录无法列出（包括 root 本身）或条目无法 stat 时以 (路径, 异常) 调用；
+            这些目录或条目被跳过，调用方应把本次扫描视为不完整
+
+    Yields:
+        文件的绝对路径
+    """
+    root = Path(root)
+    base_rules = compile_patterns(DEFAULT_EXCLUDES if excludes is None else excludes)
+    # 栈元素: (目录绝对路径, 目录相对根目录的路径前缀, 该目录生效的规则栈)
+    stack = [(str(root), "", [(0, base_rules)] if base_rules else [])]
+
+    while stack:
+        dir_path, rel_prefix, frames = stack.pop()
+
+        if use_gitignore:
+            gitignore = os.path.join(dir_path, ".gitignore")
+            if os.path.isfile(gitignore):
+                rules = _load_gitignore(gitignore)
+                if rules:
+                    frames = frames + [(len(rel_prefix), rules)]
+
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            if on_error is not None:
+                on_error(dir_path, e)
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel_path = rel_prefix + entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and not entry.is_file():
+                    continue
+            except OSError as e:
+                if on_error is not None:
+                    on_error(entry.path, e)
+                continue
+            if _is_ignored(rel_path, is_dir, frames):
+                continue
+            if is_dir:
+                subdirs.append((entry.path, rel_path + "/", frames))
+            else:
+                yield Path(entry.path)
+
+        # 逆序入栈，保证子目录按名称顺序处理
+        stack.extend(reversed(subdirs))
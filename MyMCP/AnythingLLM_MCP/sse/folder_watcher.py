@@ -0,0 +1,251 @@
+"""
+文件夹监视：文件变化后自动增量同步到 workspace
+
+每个被监视的 (文件夹, workspace) 对应一个 FolderWatch 后台任务。变化来源优先使用
+watchfiles（Linux 上基于 inotify）；未安装 watchfiles 或系统监视失败（例如 inotify
+数量达到上限、网络文件系统）时回退为定时扫描比较 size 和 mtime。
+
+一批连续变化在安静 debounce 秒后（最长不超过 max_delay 秒）触发一次同步；同步进行中
+出现的变化在本次同步结束后再触发一次。同步本身由调用方提供（sync_folder 的清单逻辑：
+只上传变化的文件，删除的文件通过 update-embeddings 的 deletes 移除）。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from folder_scanner import scan_files
+
+try:
+    import watchfiles
+except ImportError:  # 可选依赖，缺失时使用轮询
+    watchfiles = None
+
+_log = logging.getLogger("anythingllm.watch")
+
+# 监视状态
+IDLE = "idle"
+PENDING = "pending"
+SYNCING = "syncing"
+
+SyncFunc = Callable[[], Awaitable[dict]]
+
+
+def _snapshot(root: Path, excludes: Optional[Iterable[str]]) -> Optional[Dict[str, Tuple[int, int]]]:
+    """
+    轮询模式下的文件夹快照：相对路径 → (size, mtime_ns)
+
+    文件夹不存在、或扫描中有目录或文件无法读取时返回 None（快照不完整，不能用来判断文件被删除）
+    """
+    if not root.is_dir():
+        return None
+    errors = []
+    snapshot = {}
+    for file_path in scan_files(root, excludes, on_error=lambda path, e: errors.append(path)):
+        try:
+            st = file_path.stat()
+        except OSError:
+            return None
+        snapshot[file_path.relative_to(root).as_posix()] = (st.st_size, st.st_mtime_ns)
+    return None if errors else snapshot
+
+
+class FolderWatch:
+    """
+    监视一个文件夹并在变化后调用 sync
+
+    Args:
+        watch_id: 监视标识
+        workspace: 目标 workspace
+        root: 被监视的文件夹
+        sync: 执行一次增量同步的协程函数，返回同步结果
+        debounce: 最后一次变化后等待的安静时间（秒）
+        max_delay: 从第一次变化到开始同步的最长等待时间（秒），持续变化时也会按此间隔同步
+        poll_interval: 轮询模式下两次扫描的间隔（秒）
+        use_polling: 为 True 时不使用 watchfiles，始终轮询
+        excludes: 轮询扫描时始终排除的模式（gitignore 语法）
+    """
+
+    def __init__(self, watch_id: str, workspace: str, root: Path, sync: SyncFunc, *,
+                 debounce: float = 2.0, max_delay: float = 30.0, poll_interval: float = 5.0,
+                 use_polling: bool = False, excludes: Optional[Iterable[str]] = None):
+        self.watch_id = watch_id
+        self.workspace = workspace
+        self.root = Path(root)
+        self._sync_func = sync
+        self.debounce = max(0.0, debounce)
+        self.max_delay = max(self.debounce, max_delay)
+        self.poll_interval = max(0.1, poll_interval)
+        self.use_polling = use_polling or watchfiles is None
+        self.excludes = list(excludes) if excludes is not None else None
+        self.state = IDLE
+        self.events = 0
+        self.syncs = 0
+        self.last_sync: Optional[float] = None
+        self.last_result: Optional[dict] = None
+        self.last_error: Optional[str] = None
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._scan_failing = False
+
+    @property
+    def backend(self) -> str:
+        return "polling" if self.use_polling else "watchfiles"
+
+    # ---------- 生命周期 ----------
+    def start(self, initial_sync: bool = True) -> None:
+        """启动后台任务；initial_sync 为 True 时先同步一次，补上未监视期间的变化"""
+        if self._task is None or self._task.done():
+            if initial_sync:
+                self._changed.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def trigger(self) -> None:
+        """不等待文件变化，立即安排一次同步（仍经过 debounce）"""
+        self._changed.set()
+
+    # ---------- 主循环 ----------
+    async def _run(self) -> None:
+        source = asyncio.create_task(self._watch())
+        try:
+            while True:
+                await self._changed.wait()
+                self.state = PENDING
+                await self._debounce()
+                self.state = SYNCING
+                await self._sync()
+                self.state = IDLE
+        finally:
+            source.cancel()
+            await asyncio.gather(source, return_exceptions=True)
+
+    async def _debounce(self) -> None:
+        """等到 debounce 秒内没有新变化，或距第一次变化已过 max_delay 秒"""
+        deadline = time.monotonic() + self.max_delay
+        while True:
+            self._changed.clear()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=min(self.debounce, remaining))
+            except asyncio.TimeoutError:
+                return
+
+    async def _sync(self) -> None:
+        try:
+            result = await self._sync_func()
+            self.last_error = result.get("message") if result.get("status") == "error" else None
+            self.last_result = {k: v for k, v in result.items() if k not in ("failed_files", "embedding_batches")}
+        except Exception as e:
+            self.last_error = str(e)
+            self.last_result = None
+            _log.warning("文件夹监视同步失败", extra={
+                "watch_id": self.watch_id, "folder": str(self.root), "workspace": self.workspace, "error": str(e)})
+        self.syncs += 1
+        self.last_sync = time.time()
+
+    # ---------- 变化来源 ----------
+    async def _watch(self) -> None:
+        if not self.use_polling:
+            try:
+                async for changes in watchfiles.awatch(self.root, debounce=100, step=50):
+                    self.events += len(changes)
+                    self._changed.set()
+                # awatch 正常结束（例如被监视的文件夹被删除）后不再产生变化，同样改为轮询，
+                # 文件夹恢复后由轮询检测到并同步
+                error = "watchfiles 监视已结束"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = str(e)
+            _log.warning("无法使用 watchfiles，改为轮询", extra={
+                "watch_id": self.watch_id, "error": error, "poll_interval": self.poll_interval})
+            self.use_polling = True
+        await self._poll()
+
+    async def _take_snapshot(self) -> Optional[Dict[str, Tuple[int, int]]]:
+        """扫描文件夹；不完整时记录一次警告并返回 None（视为没有变化）"""
+        try:
+            snapshot = await asyncio.to_thread(_snapshot, self.root, self.excludes)
+        except OSError:
+            snapshot = None
+        scan_error = f"文件夹不存在或无法完整读取，暂停检测变化: {self.root}"
+        if snapshot is None and not self._scan_failing:
+            _log.warning("文件夹不存在或无法完整读取，暂停检测变化", extra={
+                "watch_id": self.watch_id, "folder": str(self.root), "workspace": self.workspace})
+            # 在 list_watches 中可见，文件夹恢复可读后清除
+            self.last_error = scan_error
+        elif snapshot is not None and self.last_error == scan_error:
+            self.last_error = None
+        self._scan_failing = snapshot is None
+        return snapshot
+
+    async def _poll(self) -> None:
+        # 扫描失败时保留上一次的完整快照：卸载或改名后的文件夹不能被当成空文件夹，
+        # 否则随后的同步会从 workspace 中删除全部文档
+        previous = await self._take_snapshot()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = await self._take_snapshot()
+            if current is None:
+                continue
+            if previous is None:
+                # 文件夹恢复可读：期间的变化未知，同步一次
+                self._changed.set()
+                previous = current
+                continue
+            if current != previous:
+                changed = sum(1 for k in current.keys() | previous.keys() if current.get(k) != previous.get(k))
+                self.events += changed
+                self._changed.set()
+                previous = current
+
+    def to_dict(self) -> dict:
+        return {
+            "watch_id": self.watch_id,
+            "workspace": self.workspace,
+            "folder": str(self.root),
+            "backend": self.backend,
+            "state": self.state,
+            "debounce": self.debounce,
+            "events": self.events,
+            "syncs": self.syncs,
+            "last_sync": self.last_sync,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+
+def new_watch_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def load_watch_specs(path: Path) -> List[dict]:
+    """读取已注册的监视（{"watch_id", "workspace", "folder", "debounce"}），不存在或损坏时返回空列表"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return list(json.load(f).get("watches", []))
+    except (OSError, ValueError, AttributeError):
+        return []
+
+
+def save_watch_specs(path: Path, specs: List[dict]) -> None:
+    """先写临时文件再替换，保证中途退出时旧注册表仍然完整"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"watches": specs}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
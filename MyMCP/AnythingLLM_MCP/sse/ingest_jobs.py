@@ -0,0 +1,197 @@
+"""
+持久化的文件夹导入任务队列（SQLite）
+
+每个任务记录目标 workspace、本地文件夹和上传时使用的 folder_name，
+每个文件记录一行状态：pending → uploaded（已得到 location）→ embedded，
+或 failed（attempts 记录已尝试次数）。进程中断后按这些状态继续，
+已上传的文件不会重复上传，也不会生成新的带时间戳的副本。
+"""
+
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlite_utils import Transaction
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+PARTIAL = "partial"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# 文件状态
+FILE_PENDING = "pending"
+FILE_UPLOADED = "uploaded"
+FILE_EMBEDDED = "embedded"
+FILE_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    workspace TEXT NOT NULL,
+    root TEXT NOT NULL,
+    folder_name TEXT NOT NULL,
+    concurrency INTEGER,
+    status TEXT NOT NULL,
+    scanned INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL,
+    rel_path TEXT NOT NULL,
+    state TEXT NOT NULL,
+    location TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (job_id, rel_path)
+);
+CREATE INDEX IF NOT EXISTS job_files_state ON job_files (job_id, state);
+CREATE INDEX IF NOT EXISTS job_files_location ON job_files (job_id, location);
+"""
+
+
+class IngestJobStore:
+    """
+    任务和文件状态的 SQLite 存储
+
+    所有方法都是同步的短事务（WAL 模式），可以直接在事件循环中调用。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    # ---------- 任务 ----------
+    def create_job(self, workspace: str, root: Path, folder_name: str, concurrency: Optional[int] = None) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        self._db.execute(
+            "INSERT INTO jobs (id, workspace, root, folder_name, concurrency, status, created, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, workspace, str(root), folder_name, concurrency, QUEUED, now, now),
+        )
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(self, limit: int = 20, states: Optional[Iterable[str]] = None) -> List[dict]:
+        if states:
+            states = list(states)
+            marks = ",".join("?" * len(states))
+            rows = self._db.execute(
+                f"SELECT * FROM jobs WHERE status IN ({marks}) ORDER BY created DESC LIMIT ?",
+                (*states, limit),
+            )
+        else:
+            rows = self._db.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,))
+        return [dict(row) for row in rows]
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        now = time.time()
+        finished = None if status in ACTIVE_STATES else now
+        self._db.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated = ?, finished = ? WHERE id = ?",
+            (status, error, now, finished, job_id),
+        )
+
+    # ---------- 文件 ----------
+    def add_files(self, job_id: str, rel_paths: Iterable[str], batch_size: int = 1000) -> int:
+        """登记扫描到的文件（已存在的行保持原状态），全部写入后标记任务已扫描"""
+        count = 0
+        batch: List[Tuple[str, str, str]] = []
+        for rel_path in rel_paths:
+            batch.append((job_id, rel_path, FILE_PENDING))
+            if len(batch) >= batch_size:
+                count += self._insert_files(batch)
+                batch = []
+        if batch:
+            count += self._insert_files(batch)
+        self._db.execute("UPDATE jobs SET scanned = 1, updated = ? WHERE id = ?", (time.time(), job_id))
+        return count
+
+    def _insert_files(self, rows: List[Tuple[str, str, str]]) -> int:
+        with self._transaction():
+            self._db.executemany(
+                "INSERT OR IGNORE INTO job_files (job_id, rel_path, state) VALUES (?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def files(self, job_id: str, states: Iterable[str], max_attempts: Optional[int] = None,
+              limit: Optional[int] = None) -> List[dict]:
+        states = list(states)
+        marks = ",".join("?" * len(states))
+        sql = f"SELECT * FROM job_files WHERE job_id = ? AND state IN ({marks})"
+        params: list = [job_id, *states]
+        if max_attempts is not None:
+            sql += " AND attempts < ?"
+            params.append(max_attempts)
+        sql += " ORDER BY rel_path"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._db.execute(sql, params)]
+
+    def mark_uploaded(self, job_id: str, rel_path: str, location: str) -> None:
+        self._db.execute(
+            "UPDATE job_files SET state = ?, location = ?, attempts = attempts + 1, error = NULL"
+            " WHERE job_id = ? AND rel_path = ?",
+            (FILE_UPLOADED, location, job_id, rel_path),
+        )
+
+    def mark_failed(self, job_id: str, rel_path: str, error: str) -> None:
+        self._db.execute(
+            "UPDATE job_files SET state = ?, attempts = attempts + 1, error = ? WHERE job_id = ? AND rel_path = ?",
+            (FILE_FAILED, error, job_id, rel_path),
+        )
+
+    def reset_failed(self, job_id: str) -> int:
+        """把失败文件的尝试次数清零，使其在任务继续时重新上传"""
+        cur = self._db.execute(
+            "UPDATE job_files SET attempts = 0 WHERE job_id = ? AND state = ?", (job_id, FILE_FAILED)
+        )
+        return cur.rowcount
+
+    def mark_embedded(self, job_id: str, locations: List[str]) -> None:
+        with self._transaction():
+            self._db.executemany(
+                "UPDATE job_files SET state = ?, error = NULL WHERE job_id = ? AND location = ?",
+                [(FILE_EMBEDDED, job_id, location) for location in locations],
+            )
+
+    def mark_embed_failed(self, job_id: str, locations: List[str], error: str) -> None:
+        """嵌入失败的文件保持 uploaded 状态（下次继续时只重新提交嵌入），只记录错误"""
+        with self._transaction():
+            self._db.executemany(
+                "UPDATE job_files SET error = ? WHERE job_id = ? AND location = ?",
+                [(error, job_id, location) for location in locations],
+            )
+
+    def counts(self, job_id: str) -> Dict[str, int]:
+        counts = {FILE_PENDING: 0, FILE_UPLOADED: 0, FILE_EMBEDDED: 0, FILE_FAILED: 0}
+        for row in self._db.execute(
+            "SELECT state, COUNT(*) AS n FROM job_files WHERE job_id = ? GROUP BY state", (job_id,)
+        ):
+            counts[row["state"]] = row["n"]
+        counts["total"] = sum(counts.values())
+        return counts
+
+    def _transaction(self):
+        return Transaction(self._db)
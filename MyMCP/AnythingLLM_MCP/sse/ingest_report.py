@@ -0,0 +1,197 @@
+"""
+文件夹上传的逐文件报告
+
+上传过程中每个文件的结果立即追加写入 STATE_DIR/reports/<report_id>.jsonl
+（每行一个短字段名的 JSON 记录），内存中只保留计数、耗时直方图和有限数量的
+失败样本。完整报告通过 report_id 分页读取；每 PAGE_SIZE 条记录在 .idx 文件中
+保存一次字节偏移，读取任意一页只需从最近的偏移开始顺序读取。
+"""
+
+import json
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+PAGE_SIZE = 1000
+# 耗时直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_REPORT_ID = re.compile(r"^[0-9a-f]{12}$")
+
+
+class LatencyHistogram:
+    """固定桶的耗时直方图"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        for i, bound in enumerate(self.bounds):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> dict:
+        buckets = {f"<={bound:g}s": n for bound, n in zip(self.bounds, self.counts) if n}
+        if self.counts[-1]:
+            buckets[f">{self.bounds[-1]:g}s"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 1),
+            "buckets": buckets,
+        }
+
+
+class IngestReport:
+    """
+    逐文件报告的写入端
+
+    记录格式: {"f": 文件, "s": 状态, "l": location, "t": 耗时秒数, "e": 错误}
+    """
+
+    def __init__(self, directory: Path, failure_sample: int = 20):
+        self.report_id = uuid.uuid4().hex[:12]
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"{self.report_id}.jsonl"
+        self.failure_sample = failure_sample
+        self.records = 0
+        self.counts: Dict[str, int] = {}
+        self.upload_seconds = LatencyHistogram()
+        self.failures: List[dict] = []
+        self.created = time.time()
+        self._offsets: List[int] = []
+        self._file = open(self.path, "w", encoding="utf-8")
+
+    @classmethod
+    def create(cls, directory: Path, keep: int = 50, failure_sample: int = 20) -> "IngestReport":
+        """创建新报告，并删除 directory 中除最近 keep 个以外的旧报告"""
+        directory = Path(directory)
+        if directory.exists() and keep > 0:
+            reports = sorted(directory.glob("*.jsonl"), key=lambda p: p.stat().st_mtime, reverse=True)
+            for old in reports[keep - 1:]:
+                old.unlink(missing_ok=True)
+                old.with_suffix(".idx").unlink(missing_ok=True)
+        return cls(directory, failure_sample)
+
+    def add(self, file: Optional[str], status: str, location: Optional[str] = None,
+            seconds: Optional[float] = None, error: Optional[str] = None) -> None:
+        if self.records % PAGE_SIZE == 0:
+            self._offsets.append(self._file.tell())
+        record = {"f": file, "s": status}
+        if location:
+            record["l"] = location
+        if seconds is not None:
+            record["t"] = round(seconds, 3)
+            self.upload_seconds.add(seconds)
+        if error:
+            record["e"] = error
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.records += 1
+        self.counts[status] = self.counts.get(status, 0) + 1
+        if error and len(self.failures) < self.failure_sample:
+            self.failures.append({"file": file, "status": status, "error": error})
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.close()
+        index = {"records": self.records, "page_size": PAGE_SIZE, "offsets": self._offsets}
+        with open(self.path.with_suffix(".idx"), "w", encoding="utf-8") as f:
+            json.dump(index, f)
+
+    def iter_records(self, status: Optional[str] = None) -> Iterator[dict]:
+        """按写入顺序读取记录（报告需已 close）"""
+        for record in _iter_file(self.path, 0):
+            if status is None or record["status"] == status:
+                yield record
+
+    def summary(self) -> dict:
+        return {
+            "report_id": self.report_id,
+            "records": self.records,
+            "counts": dict(self.counts),
+            "upload_seconds": self.upload_seconds.to_dict(),
+            "failures_sample": list(self.failures),
+        }
+
+
+def _expand(record: dict) -> dict:
+    return {
+        "file": record.get("f"),
+        "status": record.get("s"),
+        "location": record.get("l"),
+        "seconds": record.get("t"),
+        "error": record.get("e"),
+    }
+
+
+def _iter_file(path: Path, offset: int) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        f.seek(offset)
+        for line in f:
+            if line.strip():
+                yield _expand(json.loads(line))
+
+
+def read_report_page(directory: Path, report_id: str, offset: int = 0, limit: int = 100,
+                     status: Optional[str] = None) -> Optional[dict]:
+    """
+    分页读取报告；status 不为空时只返回该状态的记录（offset 按过滤后的记录计算）
+
+    Returns:
+        {"report_id", "total", "offset", "records", "next_offset"}，报告不存在时返回 None
+    """
+    if not _REPORT_ID.match(report_id or ""):
+        return None
+    path = Path(directory) / f"{report_id}.jsonl"
+    if not path.exists():
+        return None
+    offset, limit = max(0, offset), max(1, limit)
+
+    index = None
+    try:
+        with open(path.with_suffix(".idx"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    start, skip = 0, offset
+    if status is None and index and index["offsets"]:
+        page = min(offset // index["page_size"], len(index["offsets"]) - 1)
+        start = index["offsets"][page]
+        skip = offset - page * index["page_size"]
+
+    records, matched, has_more = [], 0, False
+    for record in _iter_file(path, start):
+        if status is not None and record["status"] != status:
+            continue
+        if matched < skip:
+            matched += 1
+            continue
+        if len(records) >= limit:
+            has_more = True
+            break
+        records.append(record)
+
+    result = {
+        "report_id": report_id,
+        "offset": offset,
+        "records": records,
+        "next_offset": offset + len(records) if has_more else None,
+    }
+    if index and status is None:
+        result["total"] = index["records"]
+    return result
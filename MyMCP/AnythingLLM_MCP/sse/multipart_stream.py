@@ -0,0 +1,88 @@
+"""
+分块流式的 multipart/form-data 上传请求体
+
+文件按固定大小的块异步读取并发送，单个上传同一时间只在内存中保留一块数据；
+所有并发上传共享一个 ByteBudget，限制整个进程中已读取但尚未发送的字节总数。
+"""
+
+import asyncio
+import os
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict
+
+import aiofiles
+
+
+class ByteBudget:
+    """进程级的缓冲字节预算，超出上限时读取方等待其他上传释放"""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_use = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, n: int) -> None:
+        n = min(n, self.limit)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_use + n <= self.limit)
+            self.in_use += n
+
+    async def release(self, n: int) -> None:
+        n = min(n, self.limit)
+        async with self._cond:
+            self.in_use -= n
+            self._cond.notify_all()
+
+
+def _quote_filename(name: str) -> str:
+    """按 HTML5 表单规则转义文件名中的引号、反斜杠和换行（与 httpx 一致）"""
+    return (
+        name.replace("\\", "\\\\")
+        .replace('"', "%22")
+        .replace("\r", "%0D")
+        .replace("\n", "%0A")
+    )
+
+
+class MultipartFileStream:
+    """
+    单文件 multipart 请求体，可作为 httpx 的 content 参数
+
+    每次迭代都会重新打开文件，因此请求失败重试时可以再次发送。
+    """
+
+    def __init__(self, path: Path, filename: str, content_type: str, *,
+                 budget: ByteBudget, chunk_size: int = 256 * 1024, field: str = "file"):
+        self.path = Path(path)
+        self.chunk_size = max(1, chunk_size)
+        self.budget = budget
+        self.boundary = uuid.uuid4().hex
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{_quote_filename(filename)}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("ascii")
+        self.file_size = os.path.getsize(self.path)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(len(self._head) + self.file_size + len(self._tail)),
+        }
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self._head
+        async with aiofiles.open(self.path, "rb") as f:
+            while True:
+                await self.budget.acquire(self.chunk_size)
+                try:
+                    chunk = await f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+                finally:
+                    await self.budget.release(self.chunk_size)
+        yield self._tail
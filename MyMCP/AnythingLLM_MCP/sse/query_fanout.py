@@ -0,0 +1,101 @@
+"""
+向多个 workspace 并发提问并合并结果
+
+每个 workspace 的查询作为独立任务运行（同时进行中的查询数受 concurrency 限制），
+整个调用受同一个截止时间约束：到期仍未完成的查询被取消并记为超时，不影响已返回的
+结果。每个查询完成时立即回调 on_result，调用方可以在全部完成前把结果发送给客户端。
+
+不同 workspace 的 sources 按文档片段去重：id 相同，或来自同一文档且文本相同（同一文档
+嵌入到多个 workspace 时片段 id 不同）的只保留得分最高的一条，并记录出现在哪些 workspace。
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+QueryFunc = Callable[[str], Awaitable[dict]]
+ResultCallback = Callable[[str, dict], Awaitable[None]]
+
+
+async def fan_out(workspaces: Iterable[str], query: QueryFunc, *, concurrency: int = 8,
+                  timeout: Optional[float] = None,
+                  on_result: Optional[ResultCallback] = None) -> Dict[str, dict]:
+    """
+    并发执行 query(workspace)
+
+    Returns:
+        workspace → {"status": "ok" | "error" | "timeout", "seconds", "response" 或 "error"}，
+        按完成顺序排列（超时的排在最后）
+    """
+    workspaces = list(dict.fromkeys(workspaces))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    started = time.perf_counter()
+    results: Dict[str, dict] = {}
+
+    async def run(workspace: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await query(workspace)
+                result = {"status": "ok", "response": response}
+            except Exception as e:
+                result = {"status": "error", "error": str(e)}
+            result["seconds"] = round(time.perf_counter() - start, 3)
+        results[workspace] = result
+        if on_result is not None:
+            await on_result(workspace, result)
+
+    tasks = [asyncio.create_task(run(workspace)) for workspace in workspaces]
+    if not tasks:
+        return results
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    elapsed = round(time.perf_counter() - started, 3)
+    for workspace in workspaces:
+        if workspace not in results:
+            results[workspace] = {"status": "timeout", "error": f"{timeout:g} 秒内未完成", "seconds": elapsed}
+            if on_result is not None:
+                await on_result(workspace, results[workspace])
+    return results
+
+
+def _source_keys(source: dict) -> List[tuple]:
+    keys = []
+    if source.get("id"):
+        keys.append(("id", source["id"]))
+    document = source.get("chunkSource") or source.get("url") or source.get("title")
+    if document and source.get("text") is not None:
+        keys.append(("text", document, source["text"]))
+    return keys
+
+
+def merge_sources(sources_by_workspace: Dict[str, List[dict]]) -> List[dict]:
+    """
+    合并各 workspace 的 sources 并去重，按 score 从高到低排列
+
+    每条结果增加 "workspaces" 字段，列出包含该片段的 workspace。
+    """
+    merged: List[dict] = []
+    index: Dict[tuple, int] = {}
+    for workspace, sources in sources_by_workspace.items():
+        for source in sources or []:
+            keys = _source_keys(source)
+            position = next((index[k] for k in keys if k in index), None)
+            if position is None:
+                position = len(merged)
+                merged.append({**source, "workspaces": [workspace]})
+            else:
+                existing = merged[position]
+                if workspace not in existing["workspaces"]:
+                    existing["workspaces"].append(workspace)
+                if (source.get("score") or 0) > (existing.get("score") or 0):
+                    merged[position] = {**source, "workspaces": existing["workspaces"]}
+            for key in keys:
+                index.setdefault(key, position)
+    merged.sort(key=lambda s: s.get("score") or 0, reverse=True)
+    return merged
@@ -2,42 +2,57 @@
 FastMCP server for AnythingLLM integration.
 """
 
+import logging
 import os
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
 from fastmcp import FastMCP
-import httpx
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from anythingllm_common import AnythingLLMClient, configure_logging
+
 # Load environment variables
 load_dotenv()
 
-API_KEY = os.getenv("ANYTHINGLLM_API_KEY")
-BASE_URL = os.getenv("ANYTHINGLLM_BASE_URL", "http://localhost:3001")
 WORKSPACE = os.getenv("WORKSPACE_NAME", "my")
 
-HEADERS = {
-    "Authorization": f"Bearer {API_KEY}",
-    "Content-Type": "application/json",
-}
+@asynccontextmanager
+async def _lifespan(server: FastMCP):
+    """Close the shared client's connection pool when the server stops."""
+    async with client:
+        yield {}
+
+
+mcp = FastMCP("AnythingLLM Server", lifespan=_lifespan)
 
-mcp = FastMCP("AnythingLLM Server")
+# Shared AnythingLLM client: pooled connections, retries, circuit breaker (fail fast
+# while AnythingLLM is unreachable) and the opt-in query cache
+# (ANYTHINGLLM_QUERY_CACHE_TTL seconds, 0 = disabled)
+client = AnythingLLMClient.from_env()
 
 
 @mcp.tool
 async def query_anythingllm(prompt: str) -> dict:
     """Query AnythingLLM with a prompt."""
-    url = f"{BASE_URL}/api/v1/workspace/{WORKSPACE}/chat"
-    payload = {"message": prompt, "mode": "query"}
+    return await client.chat(WORKSPACE, prompt, "query")
+
+
+@mcp.resource(uri="anythingllm://cache")
+async def get_cache_stats() -> dict:
+    """Return hit/miss statistics of the query cache."""
+    return client.cache.stats()
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.post(url, headers=HEADERS, json=payload)
-        response.raise_for_status()
-        return response.json()
 
-        # return {"name": "query_anythingllm", "arguments": response.json()}
+@mcp.resource(uri="anythingllm://status")
+async def get_status() -> dict:
+    """Return the circuit breaker state for the AnythingLLM connection."""
+    return {"base_url": client.base_url, "circuit_breaker": client.breaker.stats()}
 
 
 if __name__ == "__main__":
-    print("Starting server on port 8003 with SSE transport...")
-    print(f"API_KEY: {API_KEY}")
-    print(f"BASE_URL: {BASE_URL}")
-    mcp.run(transport="sse", port=8003)
\ No newline at end of file
+    configure_logging()
+    logging.getLogger("anythingllm.server").info(
+        "Starting server on port 8003 with SSE transport", extra={"base_url": client.base_url})
+    mcp.run(transport="sse", port=8003)
@@ -3,81 +3,260 @@ FastMCP server for AnythingLLM – full-featured
 """
 
 import os
+import sys
 import asyncio
-import zipfile
-import tempfile
-import fnmatch
+import logging
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Optional, Set
-import gitignore_parser
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 import datetime
 
-import httpx
-from fastmcp import FastMCP
+import fastmcp
+from fastmcp import Context, FastMCP
+from fastmcp.server.middleware import Middleware
 from dotenv import load_dotenv
-import aiofiles
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+
+# 共享模块位于上一级目录（AnythingLLM_MCP/anythingllm_common）
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from anythingllm_common import (
+    AnythingLLMClient, MetricsRegistry, UnknownWorkspaceError, configure_logging,
+)
+
+from content_index import UPLOAD_OWNER, ContentIndex, DedupStats
+from cpu_offload import CpuOffload
+from embedding_batches import EmbeddingCommitter
+from file_bundles import FileBundle, FileBundler
+from ingest_report import IngestReport, LatencyHistogram, read_report_page
+from folder_scanner import DEFAULT_EXCLUDES, scan_files
+from folder_watcher import FolderWatch, load_watch_specs, new_watch_id, save_watch_specs
+from ingest_jobs import (
+    ACTIVE_STATES, CANCELLED, COMPLETED, FAILED, FILE_EMBEDDED, FILE_FAILED, FILE_PENDING,
+    FILE_UPLOADED, PARTIAL, QUEUED, RUNNING, IngestJobStore,
+)
+from multipart_stream import ByteBudget, MultipartFileStream
+from query_fanout import fan_out, merge_sources
+from sync_manifest import FolderManifest, hash_file
+from upload_progress import UploadProgress
+from worker_lock import FileLock
 
 load_dotenv()
 
-API_KEY = os.getenv("ANYTHINGLLM_API_KEY")
-BASE_URL = os.getenv("ANYTHINGLLM_BASE_URL", "http://localhost:3001")
-print(API_KEY)
-print(BASE_URL)
-HEADERS = {
-    "Authorization": f"Bearer {API_KEY}",
-}
+# 日志经队列由后台线程写到 stderr 或 ANYTHINGLLM_LOG_FILE（每行一个 JSON），不阻塞事件循环，
+# 也不写 stdout；逐文件的成功消息按 ANYTHINGLLM_LOG_SAMPLE 采样，警告和错误全部保留
+FILE_LOGGER = "anythingllm.upload.file"
+configure_logging(sampled=[FILE_LOGGER])
+_log = logging.getLogger("anythingllm.server")
+_file_log = logging.getLogger(FILE_LOGGER)
+
+
+def _env_int(name: str, default: int) -> int:
+    """读取整数环境变量，未设置或非法时使用默认值"""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """读取浮点环境变量，未设置或非法时使用默认值"""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    """读取布尔环境变量（1/true/yes/on 视为真）"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# 流式上传：单个上传每次读取的块大小，以及所有并发上传共享的缓冲字节上限
+UPLOAD_CHUNK_SIZE = _env_int("ANYTHINGLLM_UPLOAD_CHUNK_SIZE", 256 * 1024)
+UPLOAD_BUFFER_BYTES = _env_int("ANYTHINGLLM_UPLOAD_BUFFER_BYTES", 64 * 1024 * 1024)
+_upload_budget = ByteBudget(UPLOAD_BUFFER_BYTES)
+
+# 扫描文件夹时始终排除的模式（gitignore 语法，逗号分隔），未设置时使用 DEFAULT_EXCLUDES
+_scan_excludes_env = os.getenv("ANYTHINGLLM_SCAN_EXCLUDES")
+SCAN_EXCLUDES = (
+    [p.strip() for p in _scan_excludes_env.split(",") if p.strip()]
+    if _scan_excludes_env is not None else list(DEFAULT_EXCLUDES)
+)
+
+# update-embeddings 分批提交：每批 location 数、同时提交的批次数、失败批次的重试次数
+EMBED_BATCH_SIZE = _env_int("ANYTHINGLLM_EMBED_BATCH_SIZE", 100)
+EMBED_CONCURRENCY = _env_int("ANYTHINGLLM_EMBED_CONCURRENCY", 1)
+EMBED_MAX_RETRIES = _env_int("ANYTHINGLLM_EMBED_RETRIES", 2)
+
+# CPU 密集型工作（去重和同步清单的 sha256、合并文档的读取与规范化）交给进程池，不与事件循环争抢 CPU；
+# CPU_WORKERS 为进程数（0 表示改用线程池），CPU_QUEUE 为进程全部忙碌时最多排队的任务数，队列满时上传 worker 等待。
+# 进程池在服务器启动时（lifespan）创建，未经 lifespan 直接调用工具函数时在线程池中计算
+CPU_WORKERS = _env_int("ANYTHINGLLM_CPU_WORKERS", min(4, os.cpu_count() or 1))
+CPU_QUEUE = _env_int("ANYTHINGLLM_CPU_QUEUE", 32)
+_cpu: Optional[CpuOffload] = None
+
+# Prometheus 文本格式的运行指标，通过 SSE 服务同一端口的 GET /metrics 提供；
+# 热路径上只做字典查找和加法，其他组件已有的统计在抓取时读取
+METRICS_ENABLED = _env_bool("ANYTHINGLLM_METRICS", True)
+_metrics = MetricsRegistry(prefix="anythingllm_mcp_")
+_tool_seconds = _metrics.histogram(
+    "tool_duration_seconds", "MCP tool call duration", ("tool", "status"))
+_tools_in_flight = _metrics.gauge("tools_in_flight", "MCP tool calls in progress", ("tool",))
+
+# 本地状态目录（同步清单、任务数据库、去重索引、监视注册等）；多 worker 部署时所有 worker 共用
+STATE_DIR = Path(os.getenv("ANYTHINGLLM_STATE_DIR", Path.home() / ".anythingllm_mcp")).expanduser()
+
+# 多 worker 部署：WORKERS > 1 时由 uvicorn 启动多个进程共用 8203 端口（无状态 Streamable HTTP）。
+# 可共享的状态都放在 STATE_DIR：query 缓存、任务数据库、去重索引、同步清单和监视注册；
+# 后台导入任务和文件夹监视只在持有 leader 锁的 worker 中运行，它每隔 WORKER_SYNC_INTERVAL 秒
+# 按共享状态启动或停止它们，退出后由其他 worker 接管
+WORKERS = max(1, _env_int("ANYTHINGLLM_WORKERS", 1))
+WORKER_SYNC_INTERVAL = _env_float("ANYTHINGLLM_WORKER_SYNC_INTERVAL", 2.0)
+_leader_lock = FileLock(STATE_DIR / "leader.lock")
+
+# 共享的 AnythingLLM 客户端（anythingllm_common.client）：连接池、熔断器、限流器（令牌桶 + AIMD
+# 自适应并发 + 指数退避）、重试、相同请求合并和 query 结果缓存都在其中，上游请求指标也记录到 _metrics；
+# 多 worker 时 query 缓存保存在 STATE_DIR/query_cache.sqlite3。客户端本身还带有 workspace 目录（catalog）：
+# 缓存 workspace 列表，本地把名称解析为 slug（create_workspace 后失效）。
+# 客户端和 CPU 进程池由 _get_client() / _get_cpu() 在首次使用时（通常是 lifespan）创建：多 worker 时
+# uvicorn 的每个 worker 会以 __mp_main__ 和 server_v2 两个名字各导入一次本模块，模块顶层只做定义
+_client: Optional[AnythingLLMClient] = None
+
+_metrics.counter("dedup_hits_total", "Uploads avoided by the content index",
+                 func=lambda: _content_index.session.hits if _content_index else 0)
+_metrics.counter("dedup_bytes_saved_total", "Upload bytes avoided by the content index",
+                 func=lambda: _content_index.session.bytes_saved if _content_index else 0)
+_metrics.gauge("ingest_jobs_running", "Ingest jobs currently running",
+               func=lambda: sum(1 for task in _job_tasks.values() if not task.done()))
+_metrics.gauge("watched_folders", "Folders being watched", func=lambda: len(_watches))
+_metrics.gauge("cpu_offload_waiting", "Calls waiting for a slot in the CPU offload queue",
+               func=lambda: _cpu.waiting if _cpu else 0)
+_metrics.gauge("cpu_offload_in_pool", "Tasks handed to the CPU offload pool",
+               func=lambda: _cpu.in_pool if _cpu else 0)
+_metrics.counter("cpu_offload_tasks_total", "Tasks completed successfully by the CPU offload pool",
+                 func=lambda: _cpu.completed if _cpu else 0)
+_metrics.counter("cpu_offload_failed_total", "CPU offload tasks that raised",
+                 func=lambda: _cpu.failed if _cpu else 0)
+_metrics.gauge("cpu_offload_fallback", "1 if the process pool could not be created and tasks run in threads",
+               func=lambda: int(_cpu is not None and _cpu.fallback_error is not None))
+_metrics.gauge("background_leader", "1 if this process runs ingest jobs and folder watches",
+               func=lambda: int(_owns_background()))
+
+
+# 按内容去重：相同内容已上传过时复用原有 location，不再上传
+DEDUP_ENABLED = _env_bool("ANYTHINGLLM_DEDUP", True)
+_content_index: Optional[ContentIndex] = None
+
+@asynccontextmanager
+async def _lifespan(server: FastMCP):
+    """服务器启动时创建共享连接池和 CPU 进程池并恢复未完成的导入任务和文件夹监视，停止时暂停它们并关闭两个池"""
+    cpu = _get_cpu()
+    await cpu.start()
+    async with _get_client():
+        coordinator = None
+        if WORKERS > 1:
+            coordinator = asyncio.create_task(_coordinate_background())
+        else:
+            # 继续上次进程退出时尚未完成的导入任务和已注册的文件夹监视
+            _resume_ingest_jobs()
+            await _reconcile_watches()
+        try:
+            yield {}
+        finally:
+            if coordinator is not None:
+                coordinator.cancel()
+                await asyncio.gather(coordinator, return_exceptions=True)
+            await _stop_watches()
+            await _stop_ingest_jobs()
+            _leader_lock.release()
+            cpu.shutdown()
+
+
+mcp = FastMCP("AnythingLLM Full Server", lifespan=_lifespan)
+
+
+class _ToolMetricsMiddleware(Middleware):
+    """记录每次工具调用的耗时和结果（抛出异常或返回 status 为 error 的结果记为 error）"""
 
-mcp = FastMCP("AnythingLLM Full Server")
+    async def on_call_tool(self, context, call_next):
+        tool = context.message.name
+        _tools_in_flight.inc(tool)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = await call_next(context)
+            content = getattr(result, "structured_content", None)
+            if not (isinstance(content, dict) and content.get("status") == "error"):
+                status = "ok"
+            return result
+        finally:
+            _tool_seconds.observe(time.perf_counter() - start, tool, status)
+            _tools_in_flight.dec(tool)
+
+
+if METRICS_ENABLED:
+    mcp.add_middleware(_ToolMetricsMiddleware())
+
+    @mcp.custom_route("/metrics", methods=["GET"])
+    async def metrics_endpoint(request: Request) -> Response:
+        """Prometheus 抓取端点"""
+        return PlainTextResponse(_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # ------------------------------------------------------------------
 # 内部辅助
 # ------------------------------------------------------------------
-async def _anything_request(
-    method: str, endpoint: str, *, json=None, data=None, files=None, max_retries: int = 3
-):
+def _owns_background() -> bool:
+    """本进程是否运行后台导入任务和文件夹监视：单进程部署时总是，多 worker 时只有 leader"""
+    return WORKERS == 1 or _leader_lock.held
+
+
+async def _resolve_workspace(workspace: str) -> str:
     """
-    向 AnythingLLM 服务器发送请求，并处理可能的连接错误
-    
-    Args:
-        method: HTTP 方法
-        endpoint: API 端点
-        json: JSON 数据
-        data: 表单数据
-        files: 文件数据
-        max_retries: 最大重试次数
-    
-    Returns:
-        服务器响应的 JSON 数据
-    
+    把 workspace 名称（或 slug）解析为 API 使用的 slug
+
     Raises:
-        Exception: 如果请求失败
+        UnknownWorkspaceError: workspace 不存在（不发送后续请求）；workspace 列表暂时无法获取时
+            原样返回，由后续请求报告错误
     """
-    url = f"{BASE_URL.rstrip('/')}/{endpoint.lstrip('/')}"
-    retries = 0
-    last_exception = None
-    
-    while retries <= max_retries:
-        try:
-            async with httpx.AsyncClient(timeout=120) as client:
-                r = await client.request(
-                    method, url, headers=HEADERS, json=json, data=data, files=files
-                )
-                r.raise_for_status()
-                return r.json()
-        except httpx.ConnectError as e:
-            last_exception = e
-            retries += 1
-            if retries <= max_retries:
-                print(f"连接失败，正在重试 ({retries}/{max_retries})...")
-                await asyncio.sleep(1)  # 等待 1 秒后重试
-        except Exception as e:
-            last_exception = e
-            break
-    
-    # 如果所有重试都失败，抛出异常
-    error_msg = f"请求失败: {str(last_exception)}"
-    print(error_msg)
-    raise Exception(error_msg)
+    try:
+        return await _get_client().catalog.resolve(workspace)
+    except UnknownWorkspaceError:
+        raise
+    except Exception as e:
+        _log.warning("无法获取 workspace 列表，按原样使用 %s", workspace, extra={"error": str(e)})
+        return workspace
+
+
+def _get_client() -> AnythingLLMClient:
+    """共享的 AnythingLLM 客户端，每个进程首次使用时按环境变量创建一次（lifespan 只打开、关闭其连接池）"""
+    global _client
+    if _client is None:
+        _client = AnythingLLMClient.from_env(metrics=_metrics, shared_dir=STATE_DIR if WORKERS > 1 else None)
+    return _client
+
+
+def _get_cpu() -> CpuOffload:
+    """CPU 卸载器，首次使用时创建；进程池由 lifespan 调用 start() 创建，此前在线程池中运行"""
+    global _cpu
+    if _cpu is None:
+        _cpu = CpuOffload(CPU_WORKERS, CPU_QUEUE)
+    return _cpu
+
+
+def _get_content_index() -> Optional[ContentIndex]:
+    """内容索引位于 STATE_DIR/content_index.sqlite3，首次使用时打开；关闭去重时返回 None"""
+    global _content_index
+    if not DEDUP_ENABLED:
+        return None
+    if _content_index is None:
+        _content_index = ContentIndex(STATE_DIR / "content_index.sqlite3")
+    return _content_index
+
 
 # 通用MIME类型映射，支持任意文件类型
 MIME_TYPES = {
@@ -167,8 +346,7 @@ async def list_workspaces() -> List[str]:
     Example:
         workspaces = await list_workspaces()
     """
-    data = await _anything_request("GET", "/api/v1/workspaces")
-    return [ws["name"] for ws in data["workspaces"]]
+    return [ws["name"] for ws in await _get_client().catalog.workspaces()]
 
 
 @mcp.tool
@@ -185,9 +363,17 @@ async def create_workspace(name: str) -> dict:
     Example:
         result = await create_workspace("my_new_workspace")
     """
-    return await _anything_request("POST", "/api/v1/workspace/new", json={"name": name})
+    return await _get_client().create_workspace(name)
 
 # ---------- upload_file ----------
+def _file_upload_body(path: Path, filename: str, mime_type: str) -> MultipartFileStream:
+    """构造分块流式的 multipart 上传请求体"""
+    return MultipartFileStream(
+        path, filename, mime_type,
+        budget=_upload_budget, chunk_size=UPLOAD_CHUNK_SIZE,
+    )
+
+
 @mcp.tool
 async def upload_file(workspace: str, file_path: str) -> dict:
     """
@@ -206,24 +392,44 @@ async def upload_file(workspace: str, file_path: str) -> dict:
         # 检查文件是否存在
         if not p.exists() or not p.is_file():
             return {"status": "error", "message": f"文件不存在: {file_path}"}
+
+        # workspace 不存在时在上传之前失败
+        try:
+            workspace = await _resolve_workspace(workspace)
+        except UnknownWorkspaceError as e:
+            return {"status": "error", "message": str(e)}
         
+        # 相同内容已上传过时直接复用原有文档
+        index = _get_content_index()
+        sha256 = size = None
+        if index is not None:
+            size = p.stat().st_size
+            sha256 = await _get_cpu().run(hash_file, p)
+            location = index.lookup(sha256, size)
+            if location and index.has_ref(location, workspace):
+                # 该文档已在此 workspace 中嵌入，再次提交会产生重复的向量；只记录本次上传的引用
+                index.add_refs([location], workspace, UPLOAD_OWNER)
+                return {"status": "indexed", "location": location, "file_name": p.name,
+                        "deduplicated": True, "already_embedded": True}
+            if location:
+                try:
+                    await _get_client().update_embeddings(workspace, adds=[location])
+                    index.add_refs([location], workspace, UPLOAD_OWNER)
+                    return {"status": "indexed", "location": location, "file_name": p.name, "deduplicated": True}
+                except Exception as e:
+                    # 原文档可能已被删除，改为重新上传
+                    _log.warning("复用已上传文档失败，重新上传", extra={"location": location, "error": str(e)})
+                    index.forget([location])
+
         # 获取正确的MIME类型
         mime_type = get_mime_type(p)
         
-        # 异步读取文件并上传
-        async with aiofiles.open(p, "rb") as f:
-            file_content = await f.read()
-            
-            # 准备文件上传数据
-            files = {"file": (p.name, file_content, mime_type)}
-            
-            try:
-                doc = await _anything_request(
-                    "POST", "/api/v1/document/upload",
-                    files=files
-                )
-            except Exception as e:
-                return {"status": "error", "message": f"上传文件失败: {str(e)}"}
+        # 分块流式上传，不把整个文件读入内存
+        body = _file_upload_body(p, p.name, mime_type)
+        try:
+            doc = await _get_client().upload_body(body)
+        except Exception as e:
+            return {"status": "error", "message": f"上传文件失败: {str(e)}"}
         
         # 验证响应结构
         if not doc or not isinstance(doc, dict) or "documents" not in doc:
@@ -237,13 +443,14 @@ async def upload_file(workspace: str, file_path: str) -> dict:
             
         # 获取文档位置
         location = doc["documents"][0]["location"]        # e.g. custom-documents/xxx-hash.json
+        if index is not None:
+            index.record(sha256, location, size)
         
         # 更新嵌入
         try:
-            await _anything_request(
-                "POST", f"/api/v1/workspace/{workspace}/update-embeddings",
-                json={"adds": [location]}
-            )
+            await _get_client().update_embeddings(workspace, adds=[location])
+            if index is not None:
+                index.add_refs([location], workspace, UPLOAD_OWNER)
         except Exception as e:
             return {"status": "partial", "message": f"上传成功但更新嵌入失败: {str(e)}", "location": location}
         
@@ -254,14 +461,251 @@ async def upload_file(workspace: str, file_path: str) -> dict:
 
 
 # ---------- upload_folder ----------
+# 文件夹上传时同时进行中的上传请求数上限
+UPLOAD_CONCURRENCY = _env_int("ANYTHINGLLM_UPLOAD_CONCURRENCY", 8)
+
+# 逐文件上传报告：保存目录、保留的报告数、auto 模式下返回完整列表的最大文件数，以及 result_mode 的可选值
+REPORT_DIR = STATE_DIR / "reports"
+REPORT_KEEP = _env_int("ANYTHINGLLM_REPORT_KEEP", 50)
+REPORT_FAILURE_SAMPLE = 20
+FULL_RESULT_MAX_FILES = _env_int("ANYTHINGLLM_FULL_RESULT_MAX_FILES", 1000)
+RESULT_MODES = ("auto", "full", "compact")
+
+# 打包上传：默认是否启用、单个合并文档的大小上限、参与打包的单个文件大小上限
+BUNDLE_SMALL_FILES = _env_bool("ANYTHINGLLM_BUNDLE_SMALL_FILES", False)
+BUNDLE_MAX_BYTES = _env_int("ANYTHINGLLM_BUNDLE_MAX_BYTES", 1024 * 1024)
+BUNDLE_FILE_MAX_BYTES = _env_int("ANYTHINGLLM_BUNDLE_FILE_MAX_BYTES", 32 * 1024)
+
+
+def _collect_files(root: Path, on_error: Optional[Callable[[str, OSError], None]] = None) -> Iterable[Path]:
+    """边扫描边产出文件夹下的文件，跳过 SCAN_EXCLUDES 和各层 .gitignore 忽略的内容；无法读取的目录报告给 on_error"""
+    return scan_files(root, SCAN_EXCLUDES, on_error=on_error)
+
+
+async def _upload_folder_file(
+    file_path: Path, root: Path, folder_name: str, workspace: str,
+    sha256: Optional[str] = None, dedup: Optional[DedupStats] = None, owner: str = UPLOAD_OWNER
+) -> Tuple[Optional[str], Optional[str], bool]:
+    """
+    上传文件夹中的单个文件；启用去重且相同内容已上传过时直接返回原有 location
+
+    Args:
+        workspace: 目标 workspace，用于判断去重命中的文档是否已在其中嵌入
+        sha256: 已计算好的文件哈希（如 sync_folder 的清单），为 None 时在 CPU 进程池中计算
+        dedup: 记录本次调用的去重命中统计
+        owner: 去重命中已嵌入的文档时，在内容索引中记录的引用者
+
+    Returns:
+        (location, error, already_embedded)：上传成功时 location 为文档 location，失败时为 None 且
+        error 为错误信息；already_embedded 为 True 时该文档已在 workspace 中嵌入，不能再次提交
+    """
+    try:
+        index = _get_content_index()
+        if index is not None:
+            size = file_path.stat().st_size
+            if sha256 is None:
+                sha256 = await _get_cpu().run(hash_file, file_path)
+            location = index.lookup(sha256, size, dedup)
+            if location and index.has_ref(location, workspace):
+                # 再次提交会产生重复的向量；只记录引用，避免其他引用者删除文档时把它一起删掉
+                index.add_refs([location], workspace, owner)
+                return location, None, True
+            if location:
+                return location, None, False
+
+        # 获取正确的MIME类型
+        mime_type = get_mime_type(file_path)
+
+        # 计算相对路径，保持目录结构
+        rel_path = file_path.relative_to(root)
+        # 创建新的文件名：文件夹名/相对路径
+        new_file_name = f"{folder_name}/{rel_path}"
+
+        # 分块流式上传
+        body = _file_upload_body(file_path, new_file_name, mime_type)
+
+        try:
+            doc = await _get_client().upload_body(body)
+        except Exception as e:
+            _file_log.warning("上传文件失败", extra={"file": str(file_path), "error": str(e)})
+            return None, str(e), False
+
+        # 验证响应结构
+        if doc and isinstance(doc, dict) and doc.get("documents"):
+            if "location" in doc["documents"][0]:
+                _file_log.info("成功上传文件", extra={"file": str(file_path)})
+                location = doc["documents"][0]["location"]
+                if index is not None:
+                    index.record(sha256, location, size)
+                return location, None, False
+
+        _file_log.warning("文件上传成功但响应无效", extra={"file": str(file_path)})
+        return None, "上传响应中没有 location", False
+
+    except Exception as e:
+        _file_log.warning("处理文件时发生错误", extra={"file": str(file_path), "error": str(e)})
+        return None, str(e), False
+
+
+async def _upload_bundle(bundle: FileBundle, folder_name: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    上传一个合并文档，上传完成后删除临时文件
+
+    Returns:
+        (location, error)，含义与 _upload_folder_file 返回值的前两项相同
+    """
+    try:
+        body = _file_upload_body(bundle.path, f"{folder_name}/{bundle.name}", "text/plain")
+        doc = await _get_client().upload_body(body)
+        if doc and isinstance(doc, dict) and doc.get("documents"):
+            if "location" in doc["documents"][0]:
+                _file_log.info("成功上传合并文档", extra={"file": bundle.name, "members": len(bundle.members)})
+                return doc["documents"][0]["location"], None
+        return None, "上传响应中没有 location"
+    except Exception as e:
+        _file_log.warning("上传合并文档失败", extra={"file": bundle.name, "error": str(e)})
+        return None, str(e)
+    finally:
+        bundle.discard()
+
+
+async def _upload_files_concurrently(
+    files: Iterable[Path], root: Path, folder_name: str, workspace: str, concurrency: Optional[int] = None,
+    on_uploaded: Optional[Callable[[str], None]] = None,
+    on_embedded: Optional[Callable[[str], None]] = None,
+    on_result: Optional[Callable[[Path, Optional[str], float, Optional[str]], None]] = None,
+    collect: bool = True, bundler: Optional[FileBundler] = None,
+    hashes: Optional[Dict[Path, str]] = None, dedup: Optional[DedupStats] = None,
+    owner: str = UPLOAD_OWNER
+) -> List[tuple]:
+    """
+    使用固定数量的 worker 并发上传文件
+
+    Args:
+        files: 待上传的文件（可以是边扫描边产出的迭代器）
+        root: 文件夹根目录，用于计算相对路径
+        folder_name: 上传目标文件夹名称
+        workspace: 目标 workspace（去重命中的文档已在其中嵌入时不再提交）
+        concurrency: 同时进行中的上传数上限，默认 UPLOAD_CONCURRENCY
+        on_uploaded: 每个文档上传成功后以其 location 调用（用于流水线提交嵌入）
+        on_embedded: 去重命中且已在 workspace 中嵌入的文档以其 location 调用（代替 on_uploaded）
+        on_result: 每个文件处理完成后以 (file_path, location 或 None, 耗时秒数, 错误信息) 调用
+            （用于进度通知和逐文件报告）
+        collect: 为 False 时不在内存中收集结果（结果只通过回调处理），返回空列表
+        bundler: 不为 None 时小文本文件打包成合并文档上传，包内每个文件的 location
+            为合并文档的 location（合并文档不参与内容去重）
+        hashes: 已计算好的文件哈希，避免重复计算
+        dedup: 记录本次调用的去重命中统计
+        owner: 内容索引中的引用者，见 _upload_folder_file
+
+    Returns:
+        (file_path, location 或 None) 列表；不打包时与 files 顺序一致，打包时按合并文档的顺序
+    """
+    limit = max(1, concurrency or UPLOAD_CONCURRENCY)
+    results = {}
+    # 所有 worker 共享同一个迭代器，按需从扫描器（或打包器）取下一项
+    pending = enumerate(bundler.pack(files, root) if bundler is not None else files)
+
+    async def worker():
+        for index, item in pending:
+            if isinstance(item, FileBundle):
+                # 读取、规范化并写入合并文档在 CPU 进程池中进行；无法打包的文件随后单独上传
+                try:
+                    await bundler.write(item, _get_cpu().run)
+                except Exception as e:
+                    # 与单个文件上传失败相同：包内文件都记为失败，其他 worker 继续
+                    _file_log.warning("写入合并文档失败", extra={"file": item.name, "error": str(e)})
+                    item.discard()
+                    failed = [file_path for file_path, _ in item.entries]
+                    if collect:
+                        results[index] = [(file_path, None) for file_path in failed]
+                    if on_result:
+                        for file_path in failed:
+                            on_result(file_path, None, 0.0, str(e))
+                    continue
+                units = [(item, item.members)] if item.members else []
+                units += [(file_path, [file_path]) for file_path in item.rejected]
+                if not item.members:
+                    item.discard()
+            else:
+                units = [(item, [item])]
+            entries = []
+            for unit, members in units:
+                start = time.perf_counter()
+                if isinstance(unit, FileBundle):
+                    location, error = await _upload_bundle(unit, folder_name)
+                    embedded = False
+                else:
+                    sha256 = hashes.get(unit) if hashes else None
+                    location, error, embedded = await _upload_folder_file(
+                        unit, root, folder_name, workspace, sha256, dedup, owner)
+                seconds = time.perf_counter() - start
+                if collect:
+                    entries.extend((file_path, location) for file_path in members)
+                if location and embedded:
+                    if on_embedded:
+                        on_embedded(location)
+                elif location and on_uploaded:
+                    on_uploaded(location)
+                if on_result:
+                    for file_path in members:
+                        on_result(file_path, location, seconds, error)
+            if collect:
+                results[index] = entries
+
+    await asyncio.gather(*(worker() for _ in range(limit)))
+    return [entry for index in range(len(results)) for entry in results[index]]
+
+
+def _embedding_committer(
+    workspace: str, on_committed: Optional[Callable[[List[str]], None]] = None,
+    owner: str = UPLOAD_OWNER
+) -> EmbeddingCommitter:
+    """
+    创建向 workspace 分批提交 update-embeddings 的提交器，每批成功后以其 adds 调用 on_committed
+
+    owner 为内容索引中这些 location 的引用者（sync_folder 删除文档前据此判断是否仍被其他上传使用）
+    """
+    async def commit(adds: List[str], deletes: List[str]):
+        result = await _get_client().update_embeddings(workspace, adds=adds, deletes=deletes)
+        index = _get_content_index()
+        if index is not None:
+            index.add_refs(adds, workspace, owner)
+        if on_committed:
+            on_committed(adds)
+        return result
+
+    return EmbeddingCommitter(
+        commit, batch_size=EMBED_BATCH_SIZE,
+        concurrency=EMBED_CONCURRENCY, max_retries=EMBED_MAX_RETRIES,
+    )
+
+
 @mcp.tool
-async def upload_folder(workspace: str, folder_path: str) -> dict:
+async def upload_folder(
+    workspace: str, folder_path: str, concurrency: Optional[int] = None,
+    stream_results: bool = False, result_mode: str = "auto", bundle: Optional[bool] = None,
+    ctx: Optional[Context] = None
+) -> dict:
     """
     上传整个文件夹到指定的 workspace（支持任意文件类型）
+
+    上传过程中发送 MCP 进度通知（已扫描/已上传/已嵌入文件数、字节数、速率和预计剩余时间）。
+    每个文件的结果写入磁盘上的报告，可用 get_ingest_report 按 report_id 分页读取。
+    大型文件夹建议使用 submit_ingest_job 在后台导入。
     
     Args:
         workspace (str): 目标 workspace 的名称
         folder_path (str): 要上传的本地文件夹路径
+        concurrency (int, optional): 同时上传的文件数上限，默认取环境变量 ANYTHINGLLM_UPLOAD_CONCURRENCY（8）
+        stream_results (bool): 为 True 时每个文件的结果和每个嵌入批次通过日志通知逐条发送，
+            最终结果只包含统计，不再包含完整的文件列表
+        result_mode (str): "full" 返回完整的文件和 location 列表；"compact" 只返回计数、耗时直方图、
+            部分失败样本和 report_id；"auto"（默认）在文件数不超过 ANYTHINGLLM_FULL_RESULT_MAX_FILES 时
+            使用 full，否则使用 compact
+        bundle (bool, optional): 为 True 时把小文本文件（不超过 ANYTHINGLLM_BUNDLE_FILE_MAX_BYTES）
+            合并为带文件头的文本文档上传（每个不超过 ANYTHINGLLM_BUNDLE_MAX_BYTES），大幅减少请求数；
+            每个文件仍单独记录结果，location 为所在合并文档。默认取环境变量 ANYTHINGLLM_BUNDLE_SMALL_FILES
         
     Returns:
         dict: 包含上传状态、处理文件数量以及详细日志的结果字典
@@ -274,136 +718,825 @@ async def upload_folder(workspace: str, folder_path: str) -> dict:
         # 检查文件夹是否存在
         if not root.exists() or not root.is_dir():
             return {"status": "error", "message": f"文件夹不存在: {folder_path}"}
-        
-        # 收集所有文件（支持任意类型），自动忽略.gitignore中的内容
-        all_files = [f for f in root.rglob("*") if f.is_file()]
-        
-        # 检查是否存在.gitignore文件并过滤文件
-        gitignore_path = root / ".gitignore"
-        if gitignore_path.exists() and gitignore_path.is_file():
-            try:
-                # 使用gitignore_parser创建匹配函数，指定base_dir为根目录
-                ignore_match = gitignore_parser.parse_gitignore(gitignore_path, base_dir=root)
-                # 过滤掉被.gitignore忽略的文件
-                files = [f for f in all_files if not ignore_match(f)]
-            except Exception:
-                # 如果解析失败，使用所有文件
-                files = all_files
-        else:
-            files = all_files
-        
-        if not files:
-            return {"status": "no files", "message": "未找到符合条件的文件"}
 
+        if result_mode not in RESULT_MODES:
+            return {"status": "error", "message": f"无效的 result_mode: {result_mode}（可选 {'、'.join(RESULT_MODES)}）"}
+
+        try:
+            workspace = await _resolve_workspace(workspace)
+        except UnknownWorkspaceError as e:
+            return {"status": "error", "message": str(e)}
+        
         # 生成带时间戳的文件夹名称
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         folder_name = f"{root.name}_{timestamp}"
-        print(f"创建上传目标文件夹: {folder_name}")
 
-        # 逐个上传文件
-        uploaded_locations = []
-        successful_uploads = 0
-        failed_uploads = 0
+        # 逐文件结果直接写入磁盘报告，内存中只保留计数和直方图
+        report = IngestReport.create(REPORT_DIR, keep=REPORT_KEEP, failure_sample=REPORT_FAILURE_SAMPLE)
+
+        # 边扫描边并发上传（支持任意类型，自动忽略 .gitignore 中的内容）；
+        # 每凑满一批 location 就在后台提交 update-embeddings
+        if bundle is None:
+            bundle = BUNDLE_SMALL_FILES
+        bundler = FileBundler(BUNDLE_MAX_BYTES, BUNDLE_FILE_MAX_BYTES, get_mime_type) if bundle else None
+        dedup = DedupStats()
+        try:
+            async with UploadProgress(ctx, stream_results=stream_results) as progress:
+                def on_result(file_path: Path, location: Optional[str], seconds: float, error: Optional[str]):
+                    report.add(str(file_path), "uploaded" if location else "failed", location, seconds, error)
+                    progress.file_result(file_path, location, seconds, error)
+
+                committer = _embedding_committer(workspace, on_committed=progress.embedded)
+                files = progress.track_scan(_collect_files(root))
+                on_embedded = lambda location: progress.embedded([location])
+                if bundler is not None:
+                    with bundler:
+                        await _upload_files_concurrently(
+                            files, root, folder_name, workspace, concurrency,
+                            on_uploaded=committer.add, on_embedded=on_embedded, on_result=on_result,
+                            collect=False, bundler=bundler, dedup=dedup
+                        )
+                else:
+                    await _upload_files_concurrently(
+                        files, root, folder_name, workspace, concurrency,
+                        on_uploaded=committer.add, on_embedded=on_embedded, on_result=on_result,
+                        collect=False, dedup=dedup
+                    )
+                embedding = await committer.finish()
+
+            # 嵌入失败的文档记录在报告末尾，并从内容索引中移除（下次重新上传）
+            for location in embedding["failed"]:
+                report.add(None, "unembedded", location)
+            index = _get_content_index()
+            if index is not None and embedding["failed"]:
+                index.forget(embedding["failed"])
+        finally:
+            report.close()
+
+        successful_uploads = report.counts.get("uploaded", 0)
+        failed_uploads = report.counts.get("failed", 0)
+        total_files = successful_uploads + failed_uploads
+        if not total_files:
+            return {"status": "no files", "message": "未找到符合条件的文件"}
+        # 上传摘要（失败样本只记录前 5 个，完整列表见报告）
+        _log.info("文件夹上传完成", extra={
+            "workspace": workspace, "folder_name": folder_name, "total": total_files,
+            "uploaded": successful_uploads, "failed": failed_uploads,
+            "failures": report.failures[:5], "report": str(report.path),
+        })
         
-        # 用于记录成功和失败的文件列表
-        successful_files = []
-        failed_files = []
+        if not successful_uploads:
+            result = {"status": "error", "message": "所有文件上传失败", "successful": successful_uploads, "failed": failed_uploads}
+        
+        # 分批更新嵌入的结果（失败批次已重试）
+        elif embedding["failed"]:
+            failed_batches = [b for b in embedding["batches"] if b["status"] != "ok"]
+            _log.warning("更新嵌入失败", extra={
+                "workspace": workspace, "batches": len(failed_batches), "documents": len(embedding["failed"])})
+            result = {"status": "partial", "message": f"文件上传成功但 {len(failed_batches)} 个批次更新嵌入失败: {failed_batches[0].get('error')}",
+                      "successful": successful_uploads, "failed": failed_uploads, "total_files": total_files,
+                      "folder_name": folder_name}
+        
+        else:
+            result = {"status": "indexed", "successful": successful_uploads, "failed": failed_uploads, "total_files": total_files,
+                      "folder_name": folder_name}
+
+        result["report"] = report.summary()
+        result["progress"] = progress.snapshot()
+        if bundler is not None:
+            result["bundles"] = bundler.stats()
+        if _get_content_index() is not None:
+            result["dedup"] = dedup.to_dict()
+
+        if result_mode == "auto":
+            result_mode = "full" if total_files <= FULL_RESULT_MAX_FILES else "compact"
+        # 逐文件结果已通过通知发送时同样只返回统计
+        if result_mode == "full" and not stream_results:
+            # 完整列表从磁盘报告中读回
+            # 打包上传时多个文件共用一个 location，只列出一次
+            result["locations"] = list(dict.fromkeys(r["location"] for r in report.iter_records("uploaded")))
+            result["successful_files"] = [r["file"] for r in report.iter_records("uploaded")]
+            result["failed_files"] = [r["file"] for r in report.iter_records("failed")]
+            if embedding["failed"]:
+                result["unembedded_locations"] = embedding["failed"]
+            result["embedding_batches"] = embedding["batches"]
+        else:
+            commit_seconds = LatencyHistogram()
+            for batch in embedding["batches"]:
+                commit_seconds.add(batch["seconds"])
+            result["embedding"] = {
+                "batches": len(embedding["batches"]),
+                "unembedded": len(embedding["failed"]),
+                "failed_batches": [b for b in embedding["batches"] if b["status"] != "ok"][:REPORT_FAILURE_SAMPLE],
+                "commit_seconds": commit_seconds.to_dict(),
+            }
+        return result
         
+    except Exception as e:
+        error_msg = f"处理上传文件夹时发生错误: {str(e)}"
+        _log.exception(error_msg)
+        return {"status": "error", "message": error_msg}
+
+
+
+
+@mcp.tool
+async def get_ingest_report(report_id: str, offset: int = 0, limit: int = 100,
+                            status: Optional[str] = None) -> dict:
+    """
+    分页读取 upload_folder 的逐文件报告
+
+    Args:
+        report_id (str): upload_folder 结果中 report.report_id
+        offset (int): 起始记录序号
+        limit (int): 每页记录数，默认 100，最大 1000
+        status (str, optional): 只返回该状态的记录：uploaded、failed 或 unembedded
+
+    Returns:
+        dict: 本页记录（file、status、location、seconds、error）和下一页的 next_offset（没有更多时为 None）
+    """
+    page = read_report_page(REPORT_DIR, report_id, offset, min(max(1, limit), 1000), status)
+    if page is None:
+        return {"status": "error", "message": f"报告不存在: {report_id}"}
+    return page
+
+
+# ---------- sync_folder ----------
+# 同一 (workspace, 文件夹) 的同步（手动调用和文件夹监视）串行执行，避免同时改写清单；
+# 清单旁的锁文件让多个 worker 进程之间也串行
+_sync_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+
+async def _sync_folder(workspace: str, root: Path, concurrency: Optional[int],
+                       progress: UploadProgress, allow_remove_all: bool = False) -> dict:
+    """
+    按本地清单把文件夹增量同步到 workspace（sync_folder 工具和文件夹监视共用）
+
+    清单中有、扫描中没有的文件视为已删除。为避免文件夹被卸载、改名或暂时不可读时清空
+    workspace：文件夹不存在时直接返回错误；扫描报告了错误（有目录无法读取）时不删除任何
+    文档；一次同步会删除清单中的全部文件时，只有 allow_remove_all 为 True 才执行。
+
+    Returns:
+        dict: 同步状态以及新增、未变化、删除、失败文件数量（不含进度统计）
+    """
+    if not root.is_dir():
+        return {"status": "error", "message": f"文件夹不存在: {root}"}
+
+    lock = _sync_locks.setdefault((workspace, str(root)), asyncio.Lock())
+    file_lock = FileLock(FolderManifest.path_for(STATE_DIR, workspace, root).with_suffix(".lock"), poll_interval=0.2)
+    async with lock, file_lock:
+        scan_errors: List[str] = []
+        files = _collect_files(root, on_error=lambda path, e: scan_errors.append(f"{path}: {e}"))
+        manifest = FolderManifest.for_folder(STATE_DIR, workspace, root)
+
+        to_upload = []          # (file_path, rel_path, size, mtime, sha256, 旧 location)
+        # 内容索引中以清单为引用者，删除文档前检查是否还有其他上传在使用
+        owner = f"sync:{manifest.path.stem}"
+        committer = _embedding_committer(workspace, on_committed=progress.embedded, owner=owner)   # 需要加入 workspace 的 location
+        deletes = list(manifest.pending_deletes)
+        unchanged = 0
+        seen = set()
+
         for file_path in files:
+            rel_path = file_path.relative_to(root).as_posix()
+            seen.add(rel_path)
+            progress.file_scanned()
             try:
-                # 获取正确的MIME类型
-                mime_type = get_mime_type(file_path)
-                
-                # 异步读取文件并上传
-                async with aiofiles.open(file_path, "rb") as f:
-                    file_content = await f.read()
-                    
-                    # 计算相对路径，保持目录结构
-                    rel_path = file_path.relative_to(root)
-                    # 创建新的文件名：文件夹名/相对路径
-                    new_file_name = f"{folder_name}/{rel_path}"
-                    
-                    # 准备文件上传数据
-                    files_upload = {"file": (new_file_name, file_content, mime_type)}
-                    
-                    try:
-                        doc = await _anything_request(
-                            "POST", "/api/v1/document/upload",
-                            files=files_upload
-                        )
-                        
-                        # 验证响应结构
-                        if doc and isinstance(doc, dict) and "documents" in doc:
-                            if doc["documents"] and len(doc["documents"]) > 0:
-                                if "location" in doc["documents"][0]:
-                                    location = doc["documents"][0]["location"]
-                                    uploaded_locations.append(location)
-                                    successful_uploads += 1
-                                    successful_files.append(str(file_path))
-                                    print(f"成功上传文件: {file_path}")
-                                    continue
-                        
-                        failed_uploads += 1
-                        failed_files.append(str(file_path))
-                        print(f"文件上传成功但响应无效: {file_path}")
-                        
-                    except Exception as e:
-                        failed_uploads += 1
-                        failed_files.append(str(file_path))
-                        print(f"上传文件失败: {file_path}, 错误: {str(e)}")
-                        
-            except Exception as e:
-                failed_uploads += 1
+                st = file_path.stat()
+            except OSError:
+                continue
+            entry = manifest.get(rel_path)
+
+            # size 和 mtime 都未变化时跳过哈希计算
+            if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+                sha256 = entry["sha256"]
+            else:
+                sha256 = await _get_cpu().run(hash_file, file_path)
+
+            if entry and entry["sha256"] == sha256:
+                unchanged += 1
+                progress.file_skipped()
+                entry["size"], entry["mtime"] = st.st_size, st.st_mtime
+                if not entry["embedded"]:
+                    committer.add(entry["location"])
+                continue
+
+            stale_location = entry["location"] if entry and entry["embedded"] else None
+            to_upload.append((file_path, rel_path, st.st_size, st.st_mtime, sha256, stale_location))
+
+        progress.scan_finished()
+
+        # 本地已删除的文件；扫描不完整或会删除全部文件时保留清单条目，不删除文档
+        removed = 0
+        tracked = list(manifest.items())
+        missing = [(rel_path, entry) for rel_path, entry in tracked if rel_path not in seen]
+        skip_reason = None
+        if missing and scan_errors:
+            skip_reason = f"扫描时有 {len(scan_errors)} 个目录或文件无法读取，本次不删除文档"
+        elif missing and len(missing) == len(tracked) and not allow_remove_all:
+            skip_reason = (f"本次同步会删除清单中的全部 {len(missing)} 个文件，未执行删除"
+                           "（确认要全部删除时传入 allow_remove_all）")
+        if skip_reason:
+            _log.warning("同步跳过删除", extra={
+                "workspace": workspace, "folder": str(root), "missing": len(missing),
+                "scan_errors": scan_errors[:10], "reason": skip_reason})
+        else:
+            for rel_path, entry in missing:
+                manifest.remove(rel_path)
+                removed += 1
+                if entry["embedded"]:
+                    deletes.append(entry["location"])
+
+        # 上传新增或修改的文件
+        failed_files = []
+        uploaded = 0
+        dedup = DedupStats()
+        already_embedded = set()
+        results = await _upload_files_concurrently(
+            [item[0] for item in to_upload], root, root.name, workspace, concurrency,
+            on_uploaded=committer.add, on_embedded=already_embedded.add, on_result=progress.file_result,
+            hashes={item[0]: item[4] for item in to_upload}, dedup=dedup, owner=owner
+        )
+        for (file_path, rel_path, size, mtime, sha256, stale_location), (_, location) in zip(to_upload, results):
+            if location:
+                manifest.set(rel_path, size=size, mtime=mtime, sha256=sha256,
+                             location=location, embedded=location in already_embedded)
+                if stale_location:
+                    deletes.append(stale_location)
+                uploaded += 1
+            else:
+                # 上传失败时保留旧条目（及 workspace 中的旧版本），下次同步重试
                 failed_files.append(str(file_path))
-                print(f"处理文件时发生错误: {file_path}, 错误: {str(e)}")
-        
-        # 打印详细的上传摘要
-        print(f"\n===== 文件夹上传摘要 =====")
-        print(f"总文件数: {len(files)}")
-        print(f"成功上传: {successful_uploads}")
-        print(f"上传失败: {failed_uploads}")
-        
-        if successful_files:
-            print(f"\n成功上传的文件:")
-            for file in successful_files[:5]:  # 只打印前5个文件，避免输出过多
-                print(f"  - {file}")
-            if len(successful_files) > 5:
-                print(f"  ... 还有 {len(successful_files) - 5} 个文件")
-        
+
+        summary = {"uploaded": uploaded, "unchanged": unchanged, "removed": removed,
+                   "failed": len(failed_files), "failed_files": failed_files,
+                   "manifest": str(manifest.path)}
+        if scan_errors:
+            summary["scan_errors"] = scan_errors
+        if skip_reason:
+            summary["removal_skipped"] = len(missing)
+            summary["warning"] = skip_reason
+
+        # 去重后 location 可能被多个文件共用：清单中仍在使用、或其他上传仍引用的不删除
+        index = _get_content_index()
+        if index is not None:
+            summary["dedup"] = dedup.to_dict()
+            live = {entry["location"] for _, entry in manifest.items()}
+            deletes = [
+                location for location in dict.fromkeys(deletes)
+                if location not in live and not index.release_ref(location, workspace, owner)
+            ]
+
+        # 提交剩余的新增 location，删除随最后一批一起提交
+        embedding = await committer.finish(deletes=deletes)
+        embedded = set(embedding["embedded"])
+        for _, entry in manifest.items():
+            if entry["location"] in embedded:
+                entry["embedded"] = True
+        manifest.pending_deletes = [] if embedding["deletes_committed"] else deletes
+        manifest.save()
+
+    if not embedding["batches"]:
         if failed_files:
-            print(f"\n上传失败的文件:")
-            for file in failed_files[:5]:  # 只打印前5个文件，避免输出过多
-                print(f"  - {file}")
-            if len(failed_files) > 5:
-                print(f"  ... 还有 {len(failed_files) - 5} 个文件")
-        print("=========================")
-        
-        if not uploaded_locations:
-            return {"status": "error", "message": "所有文件上传失败", "successful": successful_uploads, "failed": failed_uploads,
-                    "successful_files": successful_files, "failed_files": failed_files}
-        
-        # 批量更新嵌入
+            return {"status": "error", **summary}
+        return {"status": "partial" if skip_reason else "up to date", **summary}
+
+    summary["embedding_batches"] = embedding["batches"]
+    if embedding["failed"] or not embedding["deletes_committed"]:
+        return {"status": "partial", "message": "部分批次更新嵌入失败，下次同步时重试",
+                "unembedded": len(embedding["failed"]), **summary}
+
+    _log.info("同步完成", extra={
+        "workspace": workspace, "folder": str(root), "uploaded": uploaded, "unchanged": unchanged,
+        "deleted": len(deletes), "failed": len(failed_files)})
+    status = "partial" if failed_files or skip_reason else "indexed"
+    return {"status": status, "deleted": len(deletes), **summary}
+
+
+@mcp.tool
+async def sync_folder(
+    workspace: str, folder_path: str, concurrency: Optional[int] = None,
+    stream_results: bool = False, allow_remove_all: bool = False, ctx: Optional[Context] = None
+) -> dict:
+    """
+    增量同步文件夹到指定的 workspace
+
+    通过本地清单（记录每个文件的 size、mtime、sha256 和 location）比较文件夹当前状态，
+    只上传新增或内容变化的文件，并通过 update-embeddings 提交新增的 location 和需要删除的
+    旧 location（文件被修改或删除）。新增的 location 按批提交，删除随最后一批一起提交。
+    同步过程中发送 MCP 进度通知。需要持续同步时可使用 watch_folder。
+
+    Args:
+        workspace (str): 目标 workspace 的名称
+        folder_path (str): 要同步的本地文件夹路径
+        concurrency (int, optional): 同时上传的文件数上限，默认取环境变量 ANYTHINGLLM_UPLOAD_CONCURRENCY（8）
+        stream_results (bool): 为 True 时每个上传文件的结果和每个嵌入批次通过日志通知逐条发送，
+            最终结果不再包含失败文件列表
+        allow_remove_all (bool): 文件夹中已同步的文件全部消失时，默认不删除任何文档并返回 partial；
+            确认需要从 workspace 中删除全部文件时设为 True。扫描出错时无论如何都不删除
+
+    Returns:
+        dict: 包含同步状态以及新增、未变化、删除、失败文件数量的结果字典
+    """
+    try:
+        root = Path(folder_path).expanduser().resolve()
+
         try:
-            await _anything_request(
-                 "POST", f"/api/v1/workspace/{workspace}/update-embeddings",
-                 json={"adds": uploaded_locations}
-             )
-        except Exception as e:
-            print(f"更新嵌入失败: {str(e)}")
-            return {"status": "partial", "message": f"文件上传成功但更新嵌入失败: {str(e)}", "successful": successful_uploads, "failed": failed_uploads, 
-                    "locations": uploaded_locations, "successful_files": successful_files, "failed_files": failed_files}
-        
-        print(f"所有文件上传完成，已成功索引 {successful_uploads} 个文件")
-        return {"status": "indexed", "successful": successful_uploads, "failed": failed_uploads, "total_files": len(files), 
-                "locations": uploaded_locations, "successful_files": successful_files, "failed_files": failed_files,
-                "folder_name": folder_name}
-        
+            workspace = await _resolve_workspace(workspace)
+        except UnknownWorkspaceError as e:
+            return {"status": "error", "message": str(e)}
+
+        async with UploadProgress(ctx, stream_results=stream_results) as progress:
+            result = await _sync_folder(workspace, root, concurrency, progress, allow_remove_all)
+
+        result["progress"] = progress.snapshot()
+        if stream_results:
+            result.pop("failed_files", None)
+        return result
+
     except Exception as e:
-        error_msg = f"处理上传文件夹时发生错误: {str(e)}"
-        print(error_msg)
+        error_msg = f"同步文件夹时发生错误: {str(e)}"
+        _log.exception(error_msg)
         return {"status": "error", "message": error_msg}
 
 
+# ---------- 导入任务（持久化、可恢复） ----------
+# 同时运行的任务数，以及每个文件的最大上传尝试次数
+JOB_WORKERS = _env_int("ANYTHINGLLM_JOB_WORKERS", 1)
+JOB_MAX_ATTEMPTS = _env_int("ANYTHINGLLM_JOB_ATTEMPTS", 3)
+
+_job_store: Optional[IngestJobStore] = None
+_job_tasks: Dict[str, asyncio.Task] = {}
+_job_slots: Optional[asyncio.Semaphore] = None
+
+
+def _get_job_store() -> IngestJobStore:
+    """任务数据库位于 STATE_DIR/ingest_jobs.sqlite3，首次使用时打开"""
+    global _job_store
+    if _job_store is None:
+        _job_store = IngestJobStore(STATE_DIR / "ingest_jobs.sqlite3")
+    return _job_store
+
+
+def _start_ingest_job(job_id: str) -> None:
+    """在后台运行任务（同一任务不会重复启动）；多 worker 时非 leader 只留在数据库中，由 leader 调度"""
+    if not _owns_background():
+        return
+    task = _job_tasks.get(job_id)
+    if task is not None and not task.done():
+        return
+    task = asyncio.create_task(_run_ingest_job(job_id))
+    _job_tasks[job_id] = task
+    task.add_done_callback(lambda t: _job_tasks.pop(job_id, None) if _job_tasks.get(job_id) is t else None)
+
+
+def _resume_ingest_jobs() -> None:
+    """
+    启动时重新调度 queued/running 状态的任务
+
+    多 worker 时 leader 每轮调用一次：启动其他 worker 提交或继续的任务，
+    取消在其他 worker 上被 cancel_ingest_job 取消的任务
+    """
+    try:
+        jobs = _get_job_store().list_jobs(limit=1000, states=ACTIVE_STATES)
+    except Exception as e:
+        _log.error("无法打开导入任务数据库", extra={"error": str(e)})
+        return
+    active = {job["id"] for job in jobs}
+    for job_id, task in list(_job_tasks.items()):
+        if job_id not in active:
+            task.cancel()
+    for job in jobs:
+        if job["id"] in _job_tasks:
+            continue
+        _log.info("继续导入任务", extra={"job_id": job["id"], "folder": job["root"], "workspace": job["workspace"]})
+        _start_ingest_job(job["id"])
+
+
+async def _stop_ingest_jobs() -> None:
+    """关闭服务器时取消运行中的任务，数据库中保持 running 状态，下次启动继续"""
+    global _job_store
+    tasks = list(_job_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if _job_store is not None:
+        _job_store.close()
+        _job_store = None
+
+
+async def _run_ingest_job(job_id: str) -> None:
+    global _job_slots
+    if _job_slots is None:
+        _job_slots = asyncio.Semaphore(max(1, JOB_WORKERS))
+    store = _get_job_store()
+
+    async with _job_slots:
+        job = store.get_job(job_id)
+        if job is None or job["status"] not in ACTIVE_STATES:
+            return
+        store.set_status(job_id, RUNNING)
+        try:
+            status, error = await _process_ingest_job(store, job)
+        except asyncio.CancelledError:
+            # 用户取消时状态已设为 cancelled；服务器关闭时保持 running，下次启动继续
+            raise
+        except Exception as e:
+            status, error = FAILED, str(e)
+        # 任务运行期间可能已被取消，此时不覆盖状态
+        if store.get_job(job_id)["status"] == RUNNING:
+            store.set_status(job_id, status, error)
+            _log.info("导入任务结束", extra={"job_id": job_id, "job_status": status, "error": error})
+
+
+async def _process_ingest_job(store: IngestJobStore, job: dict) -> tuple:
+    """
+    执行一个导入任务：扫描（仅首次）→ 上传 pending/failed 文件 → 分批提交嵌入
+
+    Returns:
+        (最终状态, 错误信息)
+    """
+    job_id, workspace, folder_name = job["id"], job["workspace"], job["folder_name"]
+    root = Path(job["root"])
+    if not root.is_dir():
+        return FAILED, f"文件夹不存在: {root}"
+
+    if not job["scanned"]:
+        rel_paths = await asyncio.to_thread(
+            lambda: [p.relative_to(root).as_posix() for p in _collect_files(root)]
+        )
+        store.add_files(job_id, rel_paths)
+
+    # 每批嵌入成功后立即落盘，中断后不会重复提交
+    async def commit(adds: List[str], deletes: List[str]):
+        try:
+            result = await _get_client().update_embeddings(workspace, adds=adds)
+        except Exception as e:
+            store.mark_embed_failed(job_id, adds, str(e))
+            raise
+        store.mark_embedded(job_id, adds)
+        index = _get_content_index()
+        if index is not None:
+            index.add_refs(adds, workspace, UPLOAD_OWNER)
+        return result
+
+    committer = EmbeddingCommitter(
+        commit, batch_size=EMBED_BATCH_SIZE,
+        concurrency=EMBED_CONCURRENCY, max_retries=EMBED_MAX_RETRIES,
+    )
+
+    try:
+        # 上次已上传但尚未嵌入的文件只需重新提交嵌入
+        for row in store.files(job_id, [FILE_UPLOADED]):
+            committer.add(row["location"])
+
+        limit = max(1, job["concurrency"] or UPLOAD_CONCURRENCY)
+        for _ in range(max(1, JOB_MAX_ATTEMPTS)):
+            rows = store.files(job_id, [FILE_PENDING, FILE_FAILED], max_attempts=JOB_MAX_ATTEMPTS)
+            if not rows:
+                break
+            pending = iter(rows)
+
+            async def worker():
+                for row in pending:
+                    rel_path = row["rel_path"]
+                    location, error, embedded = await _upload_folder_file(root / rel_path, root, folder_name, workspace)
+                    if location:
+                        store.mark_uploaded(job_id, rel_path, location)
+                        if embedded:
+                            store.mark_embedded(job_id, [location])
+                        else:
+                            committer.add(location)
+                    else:
+                        store.mark_failed(job_id, rel_path, error)
+
+            await asyncio.gather(*(worker() for _ in range(limit)))
+
+        await committer.finish()
+    finally:
+        # 任务被取消（或出错）时后台批次不能在任务结束后继续提交 update-embeddings
+        await committer.cancel()
+
+    counts = store.counts(job_id)
+    if counts[FILE_EMBEDDED] == counts["total"]:
+        return COMPLETED, None
+    return PARTIAL, f"{counts[FILE_FAILED]} 个文件上传失败，{counts[FILE_UPLOADED]} 个文件未完成嵌入"
+
+
+def _job_summary(store: IngestJobStore, job: dict) -> dict:
+    counts = store.counts(job["id"])
+    done = counts[FILE_EMBEDDED] + counts[FILE_FAILED]
+    end = job["finished"] or datetime.datetime.now().timestamp()
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "workspace": job["workspace"],
+        "folder_path": job["root"],
+        "folder_name": job["folder_name"],
+        "files": counts,
+        "progress": round(done / counts["total"], 4) if counts["total"] else (1.0 if job["scanned"] else 0.0),
+        "scanned": bool(job["scanned"]),
+        "error": job["error"],
+        "created": datetime.datetime.fromtimestamp(job["created"]).isoformat(timespec="seconds"),
+        "elapsed_seconds": round(end - job["created"], 1),
+    }
+
+
+@mcp.tool
+async def submit_ingest_job(workspace: str, folder_path: str, concurrency: Optional[int] = None) -> dict:
+    """
+    提交后台导入任务：把文件夹上传到 workspace，立即返回 job_id
+
+    任务状态保存在本地 SQLite 数据库中，服务器重启后从中断处继续，已上传的文件不会重复上传。
+    使用 get_ingest_job 查询进度，cancel_ingest_job 取消，resume_ingest_job 重试失败的文件。
+
+    Args:
+        workspace (str): 目标 workspace 的名称
+        folder_path (str): 要上传的本地文件夹路径
+        concurrency (int, optional): 同时上传的文件数上限，默认取环境变量 ANYTHINGLLM_UPLOAD_CONCURRENCY（8）
+
+    Returns:
+        dict: job_id、初始状态和上传使用的 folder_name
+    """
+    root = Path(folder_path).expanduser().resolve()
+    if not root.exists() or not root.is_dir():
+        return {"status": "error", "message": f"文件夹不存在: {folder_path}"}
+    try:
+        workspace = await _resolve_workspace(workspace)
+    except UnknownWorkspaceError as e:
+        return {"status": "error", "message": str(e)}
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    folder_name = f"{root.name}_{timestamp}"
+    job_id = _get_job_store().create_job(workspace, root, folder_name, concurrency)
+    _start_ingest_job(job_id)
+    return {"job_id": job_id, "status": QUEUED, "folder_name": folder_name}
+
+
+@mcp.tool
+async def get_ingest_job(job_id: str, failed_limit: int = 20) -> dict:
+    """
+    查询导入任务的状态和进度
+
+    Args:
+        job_id (str): submit_ingest_job 返回的任务 ID
+        failed_limit (int): 最多返回多少个失败文件及其错误，默认 20
+
+    Returns:
+        dict: 任务状态、各状态的文件数、进度以及部分失败文件
+    """
+    store = _get_job_store()
+    job = store.get_job(job_id)
+    if job is None:
+        return {"status": "error", "message": f"任务不存在: {job_id}"}
+    summary = _job_summary(store, job)
+    summary["failed_files"] = [
+        {"path": row["rel_path"], "attempts": row["attempts"], "error": row["error"]}
+        for row in store.files(job_id, [FILE_FAILED], limit=max(0, failed_limit))
+    ]
+    return summary
+
+
+@mcp.tool
+async def list_ingest_jobs(limit: int = 20) -> List[dict]:
+    """
+    列出最近的导入任务（按创建时间倒序）
+
+    Args:
+        limit (int): 最多返回的任务数，默认 20
+    """
+    store = _get_job_store()
+    return [_job_summary(store, job) for job in store.list_jobs(limit=max(1, limit))]
+
+
+@mcp.tool
+async def cancel_ingest_job(job_id: str) -> dict:
+    """
+    取消排队中或运行中的导入任务（已上传的文件保留，可用 resume_ingest_job 继续）
+
+    Args:
+        job_id (str): 任务 ID
+    """
+    store = _get_job_store()
+    job = store.get_job(job_id)
+    if job is None:
+        return {"status": "error", "message": f"任务不存在: {job_id}"}
+    if job["status"] not in ACTIVE_STATES:
+        return {"status": "error", "message": f"任务已结束: {job['status']}"}
+    store.set_status(job_id, CANCELLED)
+    task = _job_tasks.get(job_id)
+    if task is not None:
+        task.cancel()
+    return _job_summary(store, store.get_job(job_id))
+
+
+@mcp.tool
+async def resume_ingest_job(job_id: str) -> dict:
+    """
+    继续已取消、部分完成或失败的导入任务：失败文件的尝试次数清零后重新上传，
+    已上传但未嵌入的文件重新提交嵌入
+
+    Args:
+        job_id (str): 任务 ID
+    """
+    store = _get_job_store()
+    job = store.get_job(job_id)
+    if job is None:
+        return {"status": "error", "message": f"任务不存在: {job_id}"}
+    if job["status"] == COMPLETED:
+        return {"status": "error", "message": "任务已完成"}
+    if job["status"] not in ACTIVE_STATES:
+        store.reset_failed(job_id)
+        store.set_status(job_id, QUEUED)
+    _start_ingest_job(job_id)
+    return _job_summary(store, store.get_job(job_id))
+
+
+# ---------- 文件夹监视（持续同步） ----------
+# debounce：最后一次变化后等待的安静时间；max_delay：持续变化时两次同步的最长间隔；
+# poll_interval：未安装 watchfiles 或系统监视不可用时的轮询间隔；WATCH_POLLING 强制轮询
+WATCH_DEBOUNCE = _env_float("ANYTHINGLLM_WATCH_DEBOUNCE", 2.0)
+WATCH_MAX_DELAY = _env_float("ANYTHINGLLM_WATCH_MAX_DELAY", 30.0)
+WATCH_POLL_INTERVAL = _env_float("ANYTHINGLLM_WATCH_POLL_INTERVAL", 5.0)
+WATCH_POLLING = _env_bool("ANYTHINGLLM_WATCH_POLLING")
+WATCHES_FILE = STATE_DIR / "watches.json"
+
+_watches: Dict[str, FolderWatch] = {}
+# 已警告过的无效监视配置（leader 每轮对照 watches.json，避免重复警告）
+_invalid_watch_specs: Set[str] = set()
+
+
+def _start_watch(watch_id: str, workspace: str, root: Path, debounce: float,
+                 initial_sync: bool = True) -> FolderWatch:
+    """创建并启动监视，变化后通过 _sync_folder 增量同步"""
+    async def sync() -> dict:
+        # 文件夹被卸载或改名时不同步（扫描结果为空会被当成文件全部删除）
+        if not root.is_dir():
+            _log.warning("监视的文件夹不存在，跳过同步", extra={
+                "watch_id": watch_id, "folder": str(root), "workspace": workspace})
+            return {"status": "error", "message": f"文件夹不存在，跳过同步: {root}"}
+        result = await _sync_folder(workspace, root, None, UploadProgress())
+        if result.get("uploaded") or result.get("deleted") or result.get("failed"):
+            _log.info("文件夹监视同步", extra={
+                "watch_id": watch_id, "folder": str(root), "workspace": workspace, "sync_status": result["status"],
+                "uploaded": result.get("uploaded", 0), "deleted": result.get("deleted", 0),
+                "failed": result.get("failed", 0)})
+        return result
+
+    watch = FolderWatch(
+        watch_id, workspace, root, sync,
+        debounce=debounce, max_delay=WATCH_MAX_DELAY, poll_interval=WATCH_POLL_INTERVAL,
+        use_polling=WATCH_POLLING, excludes=SCAN_EXCLUDES,
+    )
+    _watches[watch_id] = watch
+    watch.start(initial_sync=initial_sync)
+    return watch
+
+
+def _register_watch(spec: dict) -> Optional[dict]:
+    """
+    把监视登记到 watches.json（加锁读-改-写，多个 worker 同时登记也不会互相覆盖）
+
+    Returns:
+        同一 (workspace, 文件夹) 已有的登记；新登记成功时返回 None
+    """
+    with FileLock(WATCHES_FILE.with_suffix(".lock")):
+        specs = load_watch_specs(WATCHES_FILE)
+        for existing in specs:
+            if existing.get("workspace") == spec["workspace"] and existing.get("folder") == spec["folder"]:
+                return existing
+        save_watch_specs(WATCHES_FILE, specs + [spec])
+    return None
+
+
+def _unregister_watch(watch_id: str) -> Optional[dict]:
+    """从 watches.json 删除监视登记，返回被删除的登记（不存在时返回 None）"""
+    with FileLock(WATCHES_FILE.with_suffix(".lock")):
+        specs = load_watch_specs(WATCHES_FILE)
+        removed = [spec for spec in specs if spec.get("watch_id") == watch_id]
+        if removed:
+            save_watch_specs(WATCHES_FILE, [spec for spec in specs if spec.get("watch_id") != watch_id])
+    return removed[0] if removed else None
+
+
+async def _reconcile_watches() -> None:
+    """
+    按 watches.json 启动尚未运行的监视（先同步一次未监视期间的变化），停止已注销的监视
+
+    服务器启动时调用一次；多 worker 时 leader 每轮调用，接手其他 worker 登记或注销的监视。
+    """
+    registered = set()
+    for spec in load_watch_specs(WATCHES_FILE):
+        try:
+            watch_id = spec["watch_id"]
+            registered.add(watch_id)
+            if watch_id not in _watches:
+                _start_watch(watch_id, spec["workspace"], Path(spec["folder"]),
+                             float(spec.get("debounce", WATCH_DEBOUNCE)))
+        except (KeyError, TypeError, ValueError) as e:
+            if repr(spec) not in _invalid_watch_specs:
+                _invalid_watch_specs.add(repr(spec))
+                _log.warning("忽略无效的文件夹监视配置", extra={"spec": spec, "error": str(e)})
+    stale = [watch for watch_id, watch in _watches.items() if watch_id not in registered]
+    for watch in stale:
+        _watches.pop(watch.watch_id, None)
+    await asyncio.gather(*(watch.stop() for watch in stale))
+
+
+async def _stop_watches() -> None:
+    """关闭服务器时停止所有监视（注册信息保留，下次启动继续）"""
+    watches = list(_watches.values())
+    _watches.clear()
+    await asyncio.gather(*(w.stop() for w in watches))
+
+
+@mcp.tool
+async def watch_folder(workspace: str, folder_path: str, debounce: Optional[float] = None) -> dict:
+    """
+    持续把文件夹同步到 workspace：先同步一次，之后文件新增、修改或删除时自动增量同步
+
+    变化由 watchfiles（Linux 上基于 inotify）检测，不可用时定时轮询。一批连续变化在安静
+    debounce 秒后只触发一次同步；只上传变化的文件，删除的文件从 workspace 中移除。
+    监视注册保存在 ANYTHINGLLM_STATE_DIR/watches.json，服务器重启后自动恢复。
+
+    Args:
+        workspace (str): 目标 workspace 的名称
+        folder_path (str): 要监视的本地文件夹路径
+        debounce (float, optional): 最后一次变化后等待的秒数，默认取环境变量 ANYTHINGLLM_WATCH_DEBOUNCE（2）
+
+    Returns:
+        dict: 监视信息（watch_id、检测方式、状态和最近一次同步结果）
+    """
+    root = Path(folder_path).expanduser().resolve()
+    if not root.exists() or not root.is_dir():
+        return {"status": "error", "message": f"文件夹不存在: {folder_path}"}
+    try:
+        workspace = await _resolve_workspace(workspace)
+    except UnknownWorkspaceError as e:
+        return {"status": "error", "message": str(e)}
+
+    spec = {"watch_id": new_watch_id(), "workspace": workspace, "folder": str(root),
+            "debounce": WATCH_DEBOUNCE if debounce is None else debounce}
+    existing = _register_watch(spec)
+    if existing is not None:
+        watch = _watches.get(existing.get("watch_id"))
+        return {"status": "exists", **(watch.to_dict() if watch else existing)}
+    if not _owns_background():
+        # 监视运行在 leader worker 中，由它在下一轮启动
+        return {"status": "watching", **spec, "state": "pending"}
+
+    watch = _start_watch(spec["watch_id"], workspace, root, spec["debounce"])
+    return {"status": "watching", **watch.to_dict()}
+
+
+@mcp.tool
+async def list_watches() -> List[dict]:
+    """
+    列出所有被监视的文件夹及其状态、事件数、同步次数和最近一次同步结果
+
+    多 worker 部署时监视运行在 leader worker 中；请求落到其他 worker 时只返回登记信息（state 为 remote）。
+    """
+    if _owns_background():
+        return [watch.to_dict() for watch in _watches.values()]
+    return [{**spec, "state": "remote"} for spec in load_watch_specs(WATCHES_FILE)]
+
+
+@mcp.tool
+async def unwatch_folder(watch_id: str) -> dict:
+    """
+    停止监视文件夹（已同步到 workspace 的文档保持不变）
+
+    Args:
+        watch_id (str): watch_folder 返回的监视 ID
+    """
+    spec = _unregister_watch(watch_id)
+    watch = _watches.pop(watch_id, None)
+    if watch is None:
+        if spec is None:
+            return {"status": "error", "message": f"监视不存在: {watch_id}"}
+        # 监视运行在 leader worker 中，由它在下一轮停止
+        return {"status": "stopping", **spec}
+    await watch.stop()
+    return {"status": "stopped", **watch.to_dict()}
+
+
+# ---------- 多 worker 协调 ----------
+async def _coordinate_background() -> None:
+    """
+    多 worker 部署时每隔 WORKER_SYNC_INTERVAL 秒运行一轮：尚无 leader 锁时尝试获取；
+    leader 按共享的任务数据库和 watches.json 启动或取消导入任务、启动或停止文件夹监视。
+    其他 worker 上的工具调用只修改共享状态，由 leader 在下一轮执行。
+    """
+    while True:
+        try:
+            if not _leader_lock.held and _leader_lock.try_acquire():
+                _log.info("本 worker 成为 leader，运行后台导入任务和文件夹监视", extra={"pid": os.getpid()})
+            if _leader_lock.held:
+                _resume_ingest_jobs()
+                await _reconcile_watches()
+        except Exception as e:
+            _log.warning("后台任务协调失败", extra={"error": str(e)})
+        await asyncio.sleep(WORKER_SYNC_INTERVAL)
 
 
 # 辅助函数: 获取文件MIME类型
@@ -415,6 +1548,12 @@ def get_mime_type(file_path: Path) -> str:
 
 
 
+async def _query(workspace: str, prompt: str, mode: str = "query") -> dict:
+    """查询单个 workspace（先查缓存，并发的相同查询合并为一次上游请求）；workspace 不存在时不发送请求"""
+    workspace = await _resolve_workspace(workspace)
+    return await _get_client().chat(workspace, prompt, mode)
+
+
 @mcp.tool
 async def query(workspace: str, prompt: str, mode: str = "query") -> dict:
     """
@@ -432,17 +1571,129 @@ async def query(workspace: str, prompt: str, mode: str = "query") -> dict:
         result = await query("my_workspace", "项目的主要功能是什么？")
         result = await query("my_workspace", "详细解释认证流程", mode="chat")
     """
-    payload = {"message": prompt, "mode": mode}
-    return await _anything_request(
-        "POST", f"/api/v1/workspace/{workspace}/chat", json=payload
+    return await _query(workspace, prompt, mode)
+
+
+# 多 workspace 查询：同时进行中的查询数上限，以及整个调用的截止时间（秒）
+QUERY_FANOUT_CONCURRENCY = _env_int("ANYTHINGLLM_QUERY_FANOUT_CONCURRENCY", 8)
+QUERY_FANOUT_TIMEOUT = _env_float("ANYTHINGLLM_QUERY_FANOUT_TIMEOUT", 60.0)
+
+
+@mcp.tool
+async def query_many(
+    workspaces: List[str], prompt: str, mode: str = "query", concurrency: Optional[int] = None,
+    timeout: Optional[float] = None, stream_results: bool = False, ctx: Optional[Context] = None
+) -> dict:
+    """
+    向多个 workspace 并发提问，合并各自的回答和去重后的 sources
+
+    总耗时接近最慢的 workspace，而不是所有 workspace 之和。每个 workspace 完成时发送
+    MCP 进度通知；超过 timeout 仍未完成的 workspace 记为超时，不影响其他结果。
+
+    Args:
+        workspaces (List[str]): 要查询的 workspace 名称列表
+        prompt (str): 用户的查询内容
+        mode (str, optional): 查询模式，"query" 或 "chat"，默认 "query"
+        concurrency (int, optional): 同时查询的 workspace 数上限，默认取环境变量
+            ANYTHINGLLM_QUERY_FANOUT_CONCURRENCY（8）
+        timeout (float, optional): 整个调用的截止时间（秒），默认取环境变量 ANYTHINGLLM_QUERY_FANOUT_TIMEOUT（60）
+        stream_results (bool): 为 True 时每个 workspace 的回答在完成时立即作为日志通知
+            （logger "anythingllm.query"）发送
+
+    Returns:
+        dict: answers 为各 workspace 的回答（按完成顺序，含状态和耗时），sources 为按文档片段
+            去重、按 score 排序的合并结果（workspaces 字段列出包含该片段的 workspace）
+    """
+    workspaces = list(dict.fromkeys(workspaces))
+    if not workspaces:
+        return {"status": "error", "message": "workspaces 不能为空"}
+    total = len(workspaces)
+    done = 0
+
+    async def on_result(workspace: str, result: dict):
+        nonlocal done
+        done += 1
+        if ctx is None:
+            return
+        try:
+            if stream_results:
+                event = {"event": "answer", "workspace": workspace, "status": result["status"],
+                         "seconds": result["seconds"]}
+                if result["status"] == "ok":
+                    event["textResponse"] = result["response"].get("textResponse")
+                    event["sources"] = result["response"].get("sources") or []
+                else:
+                    event["error"] = result["error"]
+                await ctx.log("answer", level="info", logger_name="anythingllm.query", extra=event)
+            await ctx.report_progress(done, total, f"{workspace}: {result['status']}（{done}/{total}）")
+        except Exception:
+            pass
+
+    start = time.perf_counter()
+    results = await fan_out(
+        workspaces, lambda workspace: _query(workspace, prompt, mode),
+        concurrency=concurrency or QUERY_FANOUT_CONCURRENCY,
+        timeout=QUERY_FANOUT_TIMEOUT if timeout is None else timeout,
+        on_result=on_result,
     )
 
+    answers, sources = [], {}
+    for workspace, result in results.items():
+        answer = {"workspace": workspace, "status": result["status"], "seconds": result["seconds"]}
+        if result["status"] == "ok":
+            response = result["response"] or {}
+            answer["textResponse"] = response.get("textResponse")
+            answer["sources"] = len(response.get("sources") or [])
+            sources[workspace] = response.get("sources") or []
+        else:
+            answer["error"] = result["error"]
+        answers.append(answer)
+
+    succeeded = len(sources)
+    status = "ok" if succeeded == total else ("partial" if succeeded else "error")
+    return {
+        "status": status,
+        "answers": answers,
+        "sources": merge_sources(sources),
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+@mcp.resource(uri="anythingllm://status")
+async def get_status() -> dict:
+    """返回服务器运行状态：熔断器状态、query 缓存命中统计、请求合并统计、上游限流状态、workspace 目录、内容去重统计、worker 信息和 CPU 进程池状态"""
+    return {
+        **_get_client().stats(),
+        "workspaces": _get_client().catalog.stats(),
+        "dedup": _get_content_index().stats() if DEDUP_ENABLED else None,
+        "worker": {"pid": os.getpid(), "workers": WORKERS, "background_leader": _owns_background()},
+        "cpu_offload": _get_cpu().stats(),
+    }
+
 
  
 
 # ------------------------------------------------------------------
 # 入口
 # ------------------------------------------------------------------
+def create_app():
+    """
+    多 worker 模式下每个 worker 的 ASGI 应用：无状态 Streamable HTTP（/mcp），每个请求自成一体，
+    可以由任意 worker 处理（SSE 会话绑定在建立连接的进程上，不能跨进程分发）
+
+    也可以交给外部进程管理器启动，此时同样要设置 ANYTHINGLLM_WORKERS：
+        uvicorn server_v2:create_app --factory --workers 4 --port 8203
+    """
+    return mcp.http_app(transport="http", stateless_http=True)
+
+
 if __name__ == "__main__":
-    print("Starting AnythingLLM-Full server on port 8003 (SSE)...")
-    mcp.run(transport="sse", port=8203)
\ No newline at end of file
+    if WORKERS > 1:
+        import uvicorn
+
+        _log.info("Starting AnythingLLM-Full server on port 8203 (streamable HTTP at /mcp, %d workers)", WORKERS)
+        uvicorn.run("server_v2:create_app", factory=True, host=fastmcp.settings.host, port=8203,
+                    workers=WORKERS, app_dir=str(Path(__file__).resolve().parent))
+    else:
+        _log.info("Starting AnythingLLM-Full server on port 8203 (SSE)")
+        mcp.run(transport="sse", port=8203)
\ No newline at end of file
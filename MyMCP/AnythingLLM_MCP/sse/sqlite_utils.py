@@ -0,0 +1,19 @@
+"""
+本地 SQLite 状态库（导入任务、内容索引）共用的小工具
+"""
+
+import sqlite3
+
+
+class Transaction:
+    """autocommit 连接上的显式事务，批量写入只提交一次"""
+
+    def __init__(self, db: sqlite3.Connection):
+        self._db = db
+
+    def __enter__(self):
+        self._db.execute("BEGIN")
+
+    def __exit__(self, exc_type, exc, tb):
+        self._db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
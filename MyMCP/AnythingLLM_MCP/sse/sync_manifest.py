@@ -0,0 +1,97 @@
+"""
+增量同步使用的本地文件清单（manifest）
+
+每个 (workspace, 文件夹) 对应一个 JSON 文件，以相对路径为键记录文件的
+size、mtime、内容哈希以及上传到 AnythingLLM 后得到的 location。
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MANIFEST_VERSION = 1
+
+
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """分块计算文件的 sha256，避免一次性读入整个文件"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FolderManifest:
+    """
+    单个文件夹同步到单个 workspace 的清单
+
+    条目格式:
+        {"size": int, "mtime": float, "sha256": str, "location": str, "embedded": bool}
+    """
+
+    def __init__(self, path: Path, workspace: str, root: Path, entries: Optional[Dict[str, dict]] = None,
+                 pending_deletes: Optional[List[str]] = None):
+        self.path = path
+        self.workspace = workspace
+        self.root = root
+        self.entries: Dict[str, dict] = entries or {}
+        # 已从清单移除、但尚未成功从 workspace 删除的 location
+        self.pending_deletes: List[str] = pending_deletes or []
+
+    @staticmethod
+    def path_for(state_dir: Path, workspace: str, root: Path) -> Path:
+        """(workspace, root) 对应的清单文件路径"""
+        key = hashlib.sha1(f"{workspace}\0{root}".encode("utf-8")).hexdigest()[:16]
+        return Path(state_dir) / "manifests" / f"{root.name}_{key}.json"
+
+    @classmethod
+    def for_folder(cls, state_dir: Path, workspace: str, root: Path) -> "FolderManifest":
+        """加载 (workspace, root) 对应的清单，不存在或损坏时返回空清单"""
+        path = cls.path_for(state_dir, workspace, root)
+        entries, pending_deletes = {}, []
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    entries = data.get("files", {})
+                    pending_deletes = data.get("pending_deletes", [])
+            except (OSError, ValueError):
+                entries, pending_deletes = {}, []
+        return cls(path, workspace, root, entries, pending_deletes)
+
+    def get(self, rel_path: str) -> Optional[dict]:
+        return self.entries.get(rel_path)
+
+    def set(self, rel_path: str, *, size: int, mtime: float, sha256: str,
+            location: str, embedded: bool) -> None:
+        self.entries[rel_path] = {
+            "size": size,
+            "mtime": mtime,
+            "sha256": sha256,
+            "location": location,
+            "embedded": embedded,
+        }
+
+    def remove(self, rel_path: str) -> Optional[dict]:
+        return self.entries.pop(rel_path, None)
+
+    def items(self) -> Iterator[Tuple[str, dict]]:
+        return iter(list(self.entries.items()))
+
+    def save(self) -> None:
+        """先写临时文件再替换，保证中途退出时旧清单仍然完整"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        data = {
+            "version": MANIFEST_VERSION,
+            "workspace": self.workspace,
+            "root": str(self.root),
+            "files": self.entries,
+            "pending_deletes": self.pending_deletes,
+        }
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,142 @@
+"""
+Tests for CpuOffload: success/failure counters, exceptions raised by the task,
+starting the pool explicitly, rebuilding a broken pool and the fallback to
+threads when the pool cannot be created.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cpu_offload import CpuOffload
+from sync_manifest import hash_file
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def die_once(marker):
+    """Kill the pool process the first time, succeed once the marker exists."""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return os.getpid()
+
+
+def test_thread_mode_counts_only_successes_as_completed():
+    async def main():
+        cpu = CpuOffload(0, 4)
+        await cpu.start()
+        assert await cpu.run(sum, [1, 2, 3]) == 6
+        with pytest.raises(ValueError, match="boom"):
+            await cpu.run(fail, "boom")
+        return cpu.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["mode"], stats["completed"], stats["failed"], stats["in_pool"]) == ("thread", 1, 1, 0)
+
+
+def test_runs_in_threads_until_started():
+    async def main():
+        cpu = CpuOffload(2, 4)
+        assert await cpu.run(sum, [1, 2]) == 3
+        return cpu.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["mode"], stats["fallback_error"], stats["completed"]) == ("thread", None, 1)
+
+
+def test_falls_back_to_threads_when_pool_cannot_be_created(monkeypatch, caplog):
+    async def unstartable():
+        raise OSError("[Errno 11] Resource temporarily unavailable")
+
+    async def main():
+        cpu = CpuOffload(2, 4)
+        monkeypatch.setattr(cpu, "_create_pool", unstartable)
+        await cpu.start()
+        await cpu.start()               # no second attempt, no second warning
+        results = [await cpu.run(sum, [i, 1]) for i in range(3)]
+        return cpu, results
+
+    with caplog.at_level("WARNING", logger="anythingllm.cpu"):
+        cpu, results = asyncio.run(main())
+    assert results == [1, 2, 3]
+    stats = cpu.stats()
+    assert stats["mode"] == "thread"
+    assert stats["fallback_error"] == "OSError: [Errno 11] Resource temporarily unavailable"
+    assert (stats["completed"], stats["failed"]) == (3, 0)
+    assert len([r for r in caplog.records if r.name == "anythingllm.cpu"]) == 1
+
+
+def test_task_errors_in_process_pool_do_not_trigger_fallback(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_bytes(b"abc")
+
+    async def main():
+        cpu = CpuOffload(1, 1)
+        await cpu.start()
+        try:
+            digest = await cpu.run(hash_file, path)
+            with pytest.raises(FileNotFoundError):
+                await cpu.run(hash_file, tmp_path / "missing.txt")
+            return digest, cpu.stats()
+        finally:
+            cpu.shutdown()
+
+    digest, stats = asyncio.run(main())
+    assert digest == "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+    assert (stats["mode"], stats["fallback_error"]) == ("process", None)
+    assert (stats["completed"], stats["failed"]) == (1, 1)
+
+
+def test_broken_pool_is_rebuilt_once(tmp_path):
+    async def main():
+        cpu = CpuOffload(1, 1)
+        await cpu.start()
+        try:
+            pid = await cpu.run(die_once, str(tmp_path / "marker"))
+            return pid, cpu.stats()
+        finally:
+            cpu.shutdown()
+
+    pid, stats = asyncio.run(main())
+    assert pid != os.getpid()
+    assert (stats["mode"], stats["pool_restarts"], stats["fallback_error"]) == ("process", 1, None)
+    assert (stats["completed"], stats["failed"]) == (1, 0)
+
+
+def test_shutdown_returns_to_threads():
+    async def main():
+        cpu = CpuOffload(1, 1)
+        await cpu.start()
+        in_pool = await cpu.run(os.getpid)
+        cpu.shutdown()
+        in_thread = await cpu.run(os.getpid)
+        return in_pool, in_thread, cpu.mode
+
+    in_pool, in_thread, mode = asyncio.run(main())
+    assert in_pool != os.getpid()
+    assert (in_thread, mode) == (os.getpid(), "thread")
+
+
+def test_queue_bounds_tasks_handed_to_the_pool():
+    async def main():
+        cpu = CpuOffload(0, 1)          # one running plus one queued
+        observed = []
+
+        def work():
+            observed.append(cpu.in_pool)
+            time.sleep(0.02)
+
+        await asyncio.gather(*(cpu.run(work) for _ in range(6)))
+        return observed, cpu.stats()
+
+    observed, stats = asyncio.run(main())
+    assert max(observed) == 2
+    assert (stats["completed"], stats["waiting"], stats["in_pool"]) == (6, 0, 0)
@@ -0,0 +1,168 @@
+"""
+Tests for EmbeddingCommitter: batching of update-embeddings calls, location
+dedup, retry of failed batches only, and deletes riding on the last batch.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from embedding_batches import EmbeddingCommitter
+
+
+class FakeCommit:
+    """Records every commit call; fails the listed call numbers (1-based)."""
+
+    def __init__(self, fail_calls=()):
+        self.calls = []
+        self.fail_calls = set(fail_calls)
+
+    async def __call__(self, adds, deletes):
+        self.calls.append((list(adds), list(deletes)))
+        await asyncio.sleep(0)
+        if len(self.calls) in self.fail_calls:
+            raise RuntimeError(f"call {len(self.calls)} failed")
+        return {"ok": True}
+
+
+def run_committer(commit, locations, deletes=None, **kwargs):
+    async def main():
+        committer = EmbeddingCommitter(commit, retry_delay=0, **kwargs)
+        for location in locations:
+            committer.add(location)
+        return await committer.finish(deletes=deletes)
+
+    return asyncio.run(main())
+
+
+def test_full_batches_then_remainder_with_deletes():
+    commit = FakeCommit()
+    locations = [f"doc-{i}" for i in range(7)]
+    summary = run_committer(commit, locations, deletes=["old-1"], batch_size=3)
+
+    assert commit.calls == [
+        (["doc-0", "doc-1", "doc-2"], []),
+        (["doc-3", "doc-4", "doc-5"], []),
+        (["doc-6"], ["old-1"]),
+    ]
+    assert summary["embedded"] == locations
+    assert summary["failed"] == []
+    assert summary["deletes_committed"] is True
+    assert [b["status"] for b in summary["batches"]] == ["ok", "ok", "ok"]
+
+
+def test_duplicate_locations_are_committed_once():
+    commit = FakeCommit()
+    summary = run_committer(commit, ["a", "b", "a", "c", "b"], batch_size=2)
+    assert commit.calls == [(["a", "b"], []), (["c"], [])]
+    assert summary["embedded"] == ["a", "b", "c"]
+
+
+def test_exact_multiple_of_batch_size_has_no_empty_batch():
+    commit = FakeCommit()
+    summary = run_committer(commit, ["a", "b", "c", "d"], batch_size=2)
+    assert commit.calls == [(["a", "b"], []), (["c", "d"], [])]
+    assert len(summary["batches"]) == 2
+
+
+def test_deletes_only_are_sent_in_their_own_batch():
+    commit = FakeCommit()
+    summary = run_committer(commit, [], deletes=["old"], batch_size=10)
+    assert commit.calls == [([], ["old"])]
+    assert summary["deletes_committed"] is True
+
+
+def test_nothing_to_commit():
+    commit = FakeCommit()
+    summary = run_committer(commit, [])
+    assert commit.calls == []
+    assert summary == {"embedded": [], "failed": [], "deletes_committed": True, "batches": []}
+
+
+def test_only_failed_batch_is_retried():
+    commit = FakeCommit(fail_calls={2})
+    summary = run_committer(commit, ["a", "b", "c", "d"], batch_size=2, max_retries=2)
+
+    assert commit.calls == [(["a", "b"], []), (["c", "d"], []), (["c", "d"], [])]
+    assert summary["embedded"] == ["a", "b", "c", "d"]
+    assert summary["failed"] == []
+    assert [(b["status"], b["attempts"]) for b in summary["batches"]] == [("ok", 1), ("ok", 2)]
+
+
+def test_batch_failing_every_attempt_is_reported():
+    commit = FakeCommit(fail_calls={2, 3, 4, 5})
+    summary = run_committer(commit, ["a", "b", "c"], deletes=["old"], batch_size=2, max_retries=2)
+
+    assert len(commit.calls) == 4          # two batches plus two retries of the last one
+    assert summary["embedded"] == ["a", "b"]
+    assert summary["failed"] == ["c"]
+    assert summary["deletes_committed"] is False
+    last = summary["batches"][-1]
+    assert (last["status"], last["attempts"], last["error"]) == ("failed", 3, "call 4 failed")
+
+
+def test_no_retries():
+    commit = FakeCommit(fail_calls={1})
+    summary = run_committer(commit, ["a"], batch_size=5, max_retries=0)
+    assert len(commit.calls) == 1
+    assert summary["failed"] == ["a"]
+
+
+def test_full_batches_are_committed_while_adding():
+    async def main():
+        commit = FakeCommit()
+        committer = EmbeddingCommitter(commit, batch_size=2)
+        committer.add("a")
+        committer.add("b")
+        await asyncio.sleep(0.01)
+        committed_before_finish = list(commit.calls)
+        committer.add("c")
+        await committer.finish()
+        return committed_before_finish, commit.calls
+
+    before, calls = asyncio.run(main())
+    assert before == [(["a", "b"], [])]
+    assert calls == [(["a", "b"], []), (["c"], [])]
+
+
+def test_concurrency_limit():
+    async def main():
+        active = peak = 0
+
+        async def commit(adds, deletes):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+        committer = EmbeddingCommitter(commit, batch_size=1, concurrency=2)
+        for i in range(6):
+            committer.add(str(i))
+        summary = await committer.finish()
+        return peak, summary
+
+    peak, summary = asyncio.run(main())
+    assert peak == 2
+    assert len(summary["embedded"]) == 6
+
+
+def test_cancel_stops_background_batches():
+    async def main():
+        finished = []
+
+        async def commit(adds, deletes):
+            await asyncio.sleep(0.05)
+            finished.append(adds)
+
+        committer = EmbeddingCommitter(commit, batch_size=1, concurrency=1)
+        for location in ("a", "b", "c"):
+            committer.add(location)
+        await asyncio.sleep(0)
+        await committer.cancel()
+        await asyncio.sleep(0.2)
+        return finished
+
+    assert asyncio.run(main()) == []
@@ -0,0 +1,50 @@
+"""
+Tests for upload_folder with bundle=True: files uploaded individually are
+still deduplicated and counted, and a bundle that cannot be written fails
+only its own files.
+"""
+
+import asyncio
+
+import pytest
+
+import file_bundles
+
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / "docs"
+    root.mkdir()
+    for i in range(4):
+        (root / f"note{i}.txt").write_text(f"note {i}\n")
+    (root / "image.png").write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(range(256)))
+    return root
+
+
+def upload(server, folder):
+    return asyncio.run(server.upload_folder("ws", str(folder), bundle=True))
+
+
+def test_bundle_mode_reports_dedup_of_individual_files(server, backend, folder):
+    first = upload(server, folder)
+    assert first["status"] == "indexed"
+    assert first["bundles"]["bundled_files"] == 4
+    assert first["dedup"]["misses"] == 1
+
+    second = upload(server, folder)
+    assert second["dedup"]["hits"] == 1
+    assert backend.uploads.count("image.png") == 1
+
+
+def test_failed_bundle_write_fails_only_its_files(server, backend, folder, monkeypatch, tmp_path):
+    def broken_write(path, entries):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(file_bundles, "write_bundle", broken_write)
+    monkeypatch.setattr(file_bundles.tempfile, "tempdir", str(tmp_path))
+    result = upload(server, folder)
+    assert result["status"] == "indexed"
+    assert (result["successful"], result["failed"]) == (1, 4)
+    assert sorted(result["failed_files"]) == sorted(str(folder / f"note{i}.txt") for i in range(4))
+    assert backend.uploads == ["image.png"]
+    assert not list(tmp_path.glob("anythingllm-bundles-*"))
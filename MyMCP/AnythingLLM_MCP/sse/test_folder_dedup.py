@@ -0,0 +1,74 @@
+"""
+Tests for content deduplication in the folder upload paths: a document that is
+already embedded in the target workspace is not sent to update-embeddings
+again by upload_folder, sync_folder or an ingest job.
+"""
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / "docs"
+    root.mkdir()
+    for name in ("a.txt", "b.md", "c.txt"):
+        (root / name).write_text(f"contents of {name}\n")
+    return root
+
+
+def test_second_upload_folder_is_not_embedded_again(server, backend, folder):
+    first = asyncio.run(server.upload_folder("ws", str(folder)))
+    assert first["status"] == "indexed"
+    assert len(backend.embedded()) == 3
+
+    second = asyncio.run(server.upload_folder("ws", str(folder)))
+    assert second["status"] == "indexed"
+    assert second["dedup"]["hits"] == 3
+    assert second["progress"]["embedded"] == 3
+    assert sorted(second["locations"]) == sorted(first["locations"])
+    assert len(backend.uploads) == 3
+    assert len(backend.embeddings) == 1
+
+
+def test_upload_to_another_workspace_is_embedded_there(server, backend, folder):
+    asyncio.run(server.upload_folder("ws", str(folder)))
+    result = asyncio.run(server.upload_folder("other", str(folder)))
+    assert result["dedup"]["hits"] == 3
+    assert len(backend.uploads) == 3
+    assert [workspace for workspace, _, _ in backend.embeddings] == ["ws", "other"]
+
+
+def test_sync_of_uploaded_folder_marks_documents_embedded(server, backend, folder):
+    asyncio.run(server.upload_folder("ws", str(folder)))
+    result = asyncio.run(server.sync_folder("ws", str(folder)))
+    assert result["status"] == "up to date"
+    assert result["dedup"]["hits"] == 3
+    assert len(backend.embeddings) == 1
+
+    # the manifest records them as embedded, so the next sync has nothing to commit
+    assert asyncio.run(server.sync_folder("ws", str(folder)))["unchanged"] == 3
+    assert len(backend.embeddings) == 1
+
+    # the sync holds its own reference: removing a file does not delete the upload's document
+    (folder / "a.txt").unlink()
+    result = asyncio.run(server.sync_folder("ws", str(folder)))
+    assert result["removed"] == 1
+    assert backend.deleted() == []
+
+
+def test_ingest_job_skips_embedded_documents(server, backend, folder, monkeypatch):
+    asyncio.run(server.upload_folder("ws", str(folder)))
+    monkeypatch.setattr(server, "_job_store", None)
+    store = server._get_job_store()
+    try:
+        job_id = store.create_job("ws", folder, "docs_job", None)
+        status, error = asyncio.run(server._process_ingest_job(store, store.get_job(job_id)))
+        counts = store.counts(job_id)
+    finally:
+        store.close()
+    assert (status, error) == (server.COMPLETED, None)
+    assert counts[server.FILE_EMBEDDED] == 3
+    assert len(backend.uploads) == 3
+    assert len(backend.embeddings) == 1
@@ -0,0 +1,128 @@
+"""
+Tests for the single-pass directory scanner used by upload_folder, sync_folder
+and the folder watcher: default excludes, .gitignore precedence and negation,
+directory pruning and error reporting.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import folder_scanner
+from folder_scanner import scan_files
+
+
+def make_tree(root: Path, files: dict) -> None:
+    for rel_path, content in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def scan(root: Path, **kwargs) -> list:
+    return [p.relative_to(root).as_posix() for p in scan_files(root, **kwargs)]
+
+
+def test_default_excludes_and_sorted_order(tmp_path):
+    make_tree(tmp_path, {
+        "b.txt": "", "a.txt": "", "src/z.py": "", "src/m.py": "",
+        ".git/config": "", "node_modules/pkg/index.js": "", "src/__pycache__/m.pyc": "",
+    })
+    assert scan(tmp_path) == ["a.txt", "b.txt", "src/m.py", "src/z.py"]
+
+
+def test_custom_excludes_replace_defaults(tmp_path):
+    make_tree(tmp_path, {"a.txt": "", "b.log": "", ".git/config": ""})
+    # files of a directory come before its subdirectories
+    assert scan(tmp_path, excludes=["*.log"]) == ["a.txt", ".git/config"]
+
+
+def test_later_rule_in_same_file_wins(tmp_path):
+    make_tree(tmp_path, {
+        ".gitignore": "*.tmp\n!important.tmp\n",
+        "a.tmp": "", "important.tmp": "", "keep.txt": "",
+    })
+    assert scan(tmp_path) == [".gitignore", "important.tmp", "keep.txt"]
+
+
+def test_deeper_gitignore_overrides_parent(tmp_path):
+    make_tree(tmp_path, {
+        ".gitignore": "*.log\n",
+        "root.log": "",
+        "logs/.gitignore": "!keep.log\n",
+        "logs/keep.log": "",
+        "logs/drop.log": "",
+        "other/keep.log": "",
+    })
+    assert scan(tmp_path) == [".gitignore", "logs/.gitignore", "logs/keep.log"]
+
+
+def test_deeper_gitignore_can_ignore_again(tmp_path):
+    make_tree(tmp_path, {
+        ".gitignore": "*.dat\n!*.dat\n",
+        "a.dat": "",
+        "sub/.gitignore": "*.dat\n",
+        "sub/b.dat": "",
+    })
+    assert scan(tmp_path) == [".gitignore", "a.dat", "sub/.gitignore"]
+
+
+def test_ignored_directory_is_pruned(tmp_path):
+    # A file cannot be re-included when its parent directory is excluded (as in git)
+    make_tree(tmp_path, {
+        ".gitignore": "build/\n!build/keep.txt\n",
+        "build/keep.txt": "",
+        "build/out/obj.o": "",
+        "src/build.txt": "",
+    })
+    assert scan(tmp_path) == [".gitignore", "src/build.txt"]
+
+
+def test_directory_only_pattern_does_not_match_files(tmp_path):
+    make_tree(tmp_path, {".gitignore": "data/\n", "data": "", "sub/data/x.csv": ""})
+    assert scan(tmp_path) == [".gitignore", "data"]
+
+
+def test_anchored_pattern_is_relative_to_its_gitignore(tmp_path):
+    make_tree(tmp_path, {
+        ".gitignore": "/top.txt\n",
+        "top.txt": "",
+        "sub/top.txt": "",
+        "sub/.gitignore": "/local.txt\n",
+        "sub/local.txt": "",
+        "local.txt": "",
+    })
+    assert scan(tmp_path) == [".gitignore", "local.txt", "sub/.gitignore", "sub/top.txt"]
+
+
+def test_use_gitignore_false(tmp_path):
+    make_tree(tmp_path, {".gitignore": "*.log\n", "a.log": ""})
+    assert scan(tmp_path, use_gitignore=False) == [".gitignore", "a.log"]
+
+
+def test_missing_root_is_reported(tmp_path):
+    errors = []
+    missing = tmp_path / "missing"
+    assert scan(missing, on_error=lambda path, e: errors.append((path, type(e)))) == []
+    assert errors == [(str(missing), FileNotFoundError)]
+
+
+def test_unreadable_directory_is_reported_and_skipped(tmp_path, monkeypatch):
+    make_tree(tmp_path, {"a.txt": "", "locked/b.txt": "", "open/c.txt": ""})
+    real_scandir = os.scandir
+
+    def scandir(path):
+        if os.path.basename(path) == "locked":
+            raise PermissionError(13, "Permission denied", path)
+        return real_scandir(path)
+
+    monkeypatch.setattr(folder_scanner.os, "scandir", scandir)
+    errors = []
+    assert scan(tmp_path, on_error=lambda path, e: errors.append(path)) == ["a.txt", "open/c.txt"]
+    assert errors == [str(tmp_path / "locked")]
+
+
+def test_errors_are_silently_skipped_without_callback(tmp_path):
+    assert scan(tmp_path / "missing") == []
@@ -0,0 +1,197 @@
+"""
+Tests for FolderWatch with the polling backend: a burst of changes is
+debounced into one sync, changes made during a sync trigger a follow-up
+sync, and a watchfiles watch that ends falls back to polling.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import folder_watcher
+from folder_watcher import IDLE, FolderWatch, load_watch_specs, save_watch_specs
+
+
+async def wait_for(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+def touch(path, text):
+    path.write_text(text)
+    # make sure the poller sees a new mtime even on coarse clocks
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def make_watch(root, sync, **kwargs):
+    options = {"debounce": 0.3, "max_delay": 10.0, "poll_interval": 0.1, "use_polling": True}
+    options.update(kwargs)
+    return FolderWatch("w1", "ws", root, sync, **options)
+
+
+def test_burst_of_changes_gives_one_sync(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    calls = []
+
+    async def sync():
+        calls.append(asyncio.get_running_loop().time())
+        return {"status": "indexed"}
+
+    async def main():
+        watch = make_watch(tmp_path, sync)
+        watch.start(initial_sync=False)
+        try:
+            await asyncio.sleep(0.2)        # first snapshot
+            for i in range(4):
+                touch(tmp_path / f"file{i}.txt", str(i))
+                await asyncio.sleep(0.12)
+            await wait_for(lambda: calls)
+            await asyncio.sleep(0.6)
+            return watch.to_dict()
+        finally:
+            await watch.stop()
+
+    state = asyncio.run(main())
+    assert len(calls) == 1
+    assert state["syncs"] == 1
+    assert state["events"] >= 4
+    assert state["state"] == IDLE
+    assert state["backend"] == "polling"
+
+
+def test_changes_during_sync_trigger_a_follow_up_sync(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    calls = []
+
+    async def sync():
+        calls.append(len(calls) + 1)
+        if len(calls) == 1:
+            touch(tmp_path / "b.txt", "written while syncing")
+            await asyncio.sleep(0.4)        # the poller sees the change meanwhile
+        return {"status": "indexed"}
+
+    async def main():
+        watch = make_watch(tmp_path, sync, debounce=0.1)
+        watch.start(initial_sync=True)
+        try:
+            await wait_for(lambda: len(calls) >= 2)
+            await asyncio.sleep(0.5)
+            return watch.syncs
+        finally:
+            await watch.stop()
+
+    assert asyncio.run(main()) == 2
+    assert calls == [1, 2]
+
+
+def test_max_delay_bounds_continuous_changes(tmp_path):
+    calls = []
+
+    async def sync():
+        calls.append(1)
+        return {"status": "indexed"}
+
+    async def main():
+        watch = make_watch(tmp_path, sync, debounce=0.3, max_delay=0.5)
+        watch.start(initial_sync=False)
+        try:
+            for _ in range(12):             # a change every 0.1 s, never quiet for 0.3 s
+                watch.trigger()
+                await asyncio.sleep(0.1)
+            return len(calls)
+        finally:
+            await watch.stop()
+
+    assert asyncio.run(main()) >= 1
+
+
+def test_sync_error_is_reported(tmp_path):
+    async def sync():
+        raise RuntimeError("backend down")
+
+    async def main():
+        watch = make_watch(tmp_path, sync, debounce=0)
+        watch.start(initial_sync=True)
+        try:
+            await wait_for(lambda: watch.syncs == 1)
+            return watch.to_dict()
+        finally:
+            await watch.stop()
+
+    state = asyncio.run(main())
+    assert state["last_error"] == "backend down"
+    assert state["last_result"] is None
+
+
+def test_watchfiles_ending_falls_back_to_polling(tmp_path, monkeypatch):
+    class EndingWatchfiles:
+        @staticmethod
+        async def awatch(root, **kwargs):
+            yield {("added", str(root / "a.txt"))}
+            # returns normally, as when the watched folder is removed
+
+    monkeypatch.setattr(folder_watcher, "watchfiles", EndingWatchfiles)
+    calls = []
+
+    async def sync():
+        calls.append(1)
+        return {"status": "indexed"}
+
+    async def main():
+        watch = make_watch(tmp_path, sync, use_polling=False, debounce=0.1)
+        assert watch.backend == "watchfiles"
+        watch.start(initial_sync=False)
+        try:
+            await wait_for(lambda: len(calls) == 1)
+            assert watch.backend == "polling"
+            await asyncio.sleep(0.2)
+            touch(tmp_path / "later.txt", "changed after the fallback")
+            await wait_for(lambda: len(calls) == 2)
+        finally:
+            await watch.stop()
+
+    asyncio.run(main())
+
+
+def test_missing_folder_is_reported_until_it_is_back(tmp_path):
+    root = tmp_path / "docs"
+    root.mkdir()
+    (root / "a.txt").write_text("a")
+    calls = []
+
+    async def sync():
+        calls.append(1)
+        return {"status": "indexed"}
+
+    async def main():
+        watch = make_watch(root, sync, debounce=0.1)
+        watch.start(initial_sync=False)
+        try:
+            await asyncio.sleep(0.2)
+            parked = tmp_path / "parked"
+            root.rename(parked)
+            await wait_for(lambda: watch.last_error is not None)
+            assert calls == []              # a missing folder is not an empty one
+            parked.rename(root)
+            await wait_for(lambda: watch.last_error is None)
+            touch(root / "a.txt", "edited")
+            await wait_for(lambda: len(calls) == 1)
+        finally:
+            await watch.stop()
+
+    asyncio.run(main())
+
+
+def test_watch_specs_round_trip(tmp_path):
+    path = tmp_path / "state" / "watches.json"
+    assert load_watch_specs(path) == []
+    specs = [{"watch_id": "w1", "workspace": "ws", "folder": "/data/docs", "debounce": 2.0}]
+    save_watch_specs(path, specs)
+    assert load_watch_specs(path) == specs
+    path.write_text("[]")
+    assert load_watch_specs(path) == []
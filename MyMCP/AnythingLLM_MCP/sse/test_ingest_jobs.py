@@ -0,0 +1,174 @@
+"""
+Tests for IngestJobStore: job and file state transitions, and resuming a job
+from the database after the process restarts. Also checks that cancelling a
+running job stops its embedding commits.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ingest_jobs import (
+    CANCELLED, COMPLETED, FILE_EMBEDDED, FILE_FAILED, FILE_PENDING, FILE_UPLOADED, QUEUED, RUNNING,
+    IngestJobStore,
+)
+from sqlite_utils import Transaction
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = IngestJobStore(tmp_path / "jobs.sqlite3")
+    yield store
+    store.close()
+
+
+def rel_paths(rows):
+    return [row["rel_path"] for row in rows]
+
+
+def test_job_status_transitions(store, tmp_path):
+    job_id = store.create_job("docs", tmp_path, "folder", concurrency=4)
+    job = store.get_job(job_id)
+    assert (job["status"], job["scanned"], job["finished"], job["concurrency"]) == (QUEUED, 0, None, 4)
+
+    store.set_status(job_id, RUNNING)
+    assert store.get_job(job_id)["finished"] is None
+    store.set_status(job_id, COMPLETED)
+    job = store.get_job(job_id)
+    assert job["status"] == COMPLETED
+    assert job["finished"] is not None
+    assert store.get_job("missing") is None
+
+
+def test_list_jobs_filters_by_state(store, tmp_path):
+    done = store.create_job("docs", tmp_path, "a")
+    active = store.create_job("docs", tmp_path, "b")
+    store.set_status(done, COMPLETED)
+    assert [job["id"] for job in store.list_jobs(states=[QUEUED, RUNNING])] == [active]
+    assert {job["id"] for job in store.list_jobs()} == {done, active}
+    assert len(store.list_jobs(limit=1)) == 1
+
+
+def test_file_state_transitions(store, tmp_path):
+    job_id = store.create_job("docs", tmp_path, "folder")
+    assert store.add_files(job_id, ["b.md", "a.md", "c.md"]) == 3
+    assert store.get_job(job_id)["scanned"] == 1
+    assert rel_paths(store.files(job_id, [FILE_PENDING])) == ["a.md", "b.md", "c.md"]
+
+    store.mark_uploaded(job_id, "a.md", "loc-a")
+    store.mark_uploaded(job_id, "b.md", "loc-b")
+    store.mark_failed(job_id, "c.md", "timeout")
+    assert store.counts(job_id) == {
+        FILE_PENDING: 0, FILE_UPLOADED: 2, FILE_EMBEDDED: 0, FILE_FAILED: 1, "total": 3,
+    }
+
+    store.mark_embed_failed(job_id, ["loc-b"], "HTTP 503")
+    store.mark_embedded(job_id, ["loc-a"])
+    rows = {row["rel_path"]: row for row in store.files(job_id, [FILE_UPLOADED, FILE_EMBEDDED, FILE_FAILED])}
+    assert (rows["a.md"]["state"], rows["a.md"]["error"]) == (FILE_EMBEDDED, None)
+    assert (rows["b.md"]["state"], rows["b.md"]["error"]) == (FILE_UPLOADED, "HTTP 503")
+    assert (rows["c.md"]["state"], rows["c.md"]["attempts"], rows["c.md"]["error"]) == (FILE_FAILED, 1, "timeout")
+
+
+def test_shared_location_is_embedded_for_every_file(store, tmp_path):
+    job_id = store.create_job("docs", tmp_path, "folder")
+    store.add_files(job_id, ["a.md", "copy-of-a.md"])
+    store.mark_uploaded(job_id, "a.md", "loc-a")
+    store.mark_uploaded(job_id, "copy-of-a.md", "loc-a")
+    store.mark_embedded(job_id, ["loc-a"])
+    assert store.counts(job_id)[FILE_EMBEDDED] == 2
+
+
+def test_failed_files_retry_until_max_attempts(store, tmp_path):
+    job_id = store.create_job("docs", tmp_path, "folder")
+    store.add_files(job_id, ["a.md", "b.md"])
+    for _ in range(3):
+        store.mark_failed(job_id, "a.md", "HTTP 500")
+    store.mark_failed(job_id, "b.md", "HTTP 500")
+
+    retryable = store.files(job_id, [FILE_PENDING, FILE_FAILED], max_attempts=3)
+    assert rel_paths(retryable) == ["b.md"]
+    assert store.reset_failed(job_id) == 2
+    assert rel_paths(store.files(job_id, [FILE_FAILED], max_attempts=3)) == ["a.md", "b.md"]
+
+    store.mark_uploaded(job_id, "a.md", "loc-a")
+    row = store.files(job_id, [FILE_UPLOADED])[0]
+    assert (row["attempts"], row["error"]) == (1, None)
+
+
+def test_files_limit_and_batched_add(store, tmp_path):
+    job_id = store.create_job("docs", tmp_path, "folder")
+    names = [f"f{i:03d}.md" for i in range(25)]
+    assert store.add_files(job_id, names, batch_size=10) == 25
+    assert rel_paths(store.files(job_id, [FILE_PENDING], limit=5)) == names[:5]
+
+
+def test_resume_after_restart_keeps_file_states(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    store = IngestJobStore(path)
+    job_id = store.create_job("docs", tmp_path, "folder")
+    store.set_status(job_id, RUNNING)
+    store.add_files(job_id, ["a.md", "b.md", "c.md"])
+    store.mark_uploaded(job_id, "a.md", "loc-a")
+    store.mark_embedded(job_id, ["loc-a"])
+    store.mark_uploaded(job_id, "b.md", "loc-b")
+    store.close()
+
+    store = IngestJobStore(path)
+    try:
+        assert [job["id"] for job in store.list_jobs(states=[QUEUED, RUNNING])] == [job_id]
+        # Scanning again after the restart must not reset files that already progressed
+        store.add_files(job_id, ["a.md", "b.md", "c.md", "d.md"])
+        assert store.counts(job_id) == {
+            FILE_PENDING: 2, FILE_UPLOADED: 1, FILE_EMBEDDED: 1, FILE_FAILED: 0, "total": 4,
+        }
+        assert store.files(job_id, [FILE_UPLOADED])[0]["location"] == "loc-b"
+        assert rel_paths(store.files(job_id, [FILE_PENDING])) == ["c.md", "d.md"]
+        store.set_status(job_id, CANCELLED, error="stopped")
+        assert store.get_job(job_id)["error"] == "stopped"
+    finally:
+        store.close()
+
+
+def test_transaction_rolls_back_on_error(store, tmp_path):
+    job_id = store.create_job("docs", tmp_path, "folder")
+    with pytest.raises(RuntimeError):
+        with Transaction(store._db):
+            store._db.execute(
+                "INSERT INTO job_files (job_id, rel_path, state) VALUES (?, ?, ?)", (job_id, "a.md", FILE_PENDING)
+            )
+            raise RuntimeError("abort")
+    assert store.counts(job_id)["total"] == 0
+
+
+def test_cancelled_job_stops_committing_embeddings(server, backend, tmp_path, monkeypatch):
+    root = tmp_path / "docs"
+    root.mkdir()
+    for i in range(6):
+        (root / f"{i}.txt").write_text(f"file {i}\n")
+    monkeypatch.setattr(server, "EMBED_BATCH_SIZE", 1)
+    monkeypatch.setattr(server, "_job_store", None)
+    monkeypatch.setattr(server, "_job_tasks", {})
+    monkeypatch.setattr(server, "_job_slots", None)
+    backend.embed_delay = 0.2
+
+    async def main():
+        job_id = (await server.submit_ingest_job("ws", str(root), concurrency=1))["job_id"]
+        task = server._job_tasks[job_id]
+        while not backend.uploads:
+            await asyncio.sleep(0.01)
+        assert (await server.cancel_ingest_job(job_id))["status"] == CANCELLED
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0.5)        # longer than a commit takes
+        return job_id
+
+    try:
+        job_id = asyncio.run(main())
+        assert server._get_job_store().get_job(job_id)["status"] == CANCELLED
+    finally:
+        server._get_job_store().close()
+    assert backend.embeddings == []
@@ -0,0 +1,152 @@
+"""
+Tests for the per-file ingest report: the .idx page offsets and paged reads
+across page boundaries, status filtering and the fallback without an index.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import ingest_report
+from ingest_report import IngestReport, LatencyHistogram, read_report_page
+
+PAGE = 3
+
+
+@pytest.fixture(autouse=True)
+def small_pages(monkeypatch):
+    monkeypatch.setattr(ingest_report, "PAGE_SIZE", PAGE)
+
+
+def write_report(directory, n, failed_every=0):
+    report = IngestReport(directory)
+    for i in range(n):
+        failed = failed_every and i % failed_every == 0
+        report.add(f"目录/文件-{i}.md", "failed" if failed else "uploaded",
+                   None if failed else f"loc-{i}", seconds=0.01, error="HTTP 500" if failed else None)
+    report.close()
+    return report
+
+
+def files(page):
+    return [int(record["file"].rsplit("-", 1)[1].split(".")[0]) for record in page["records"]]
+
+
+def test_index_has_one_offset_per_page(tmp_path):
+    report = write_report(tmp_path, 9)
+    index = json.loads(report.path.with_suffix(".idx").read_text())
+    assert index["records"] == 9
+    assert index["page_size"] == PAGE
+    assert len(index["offsets"]) == 3
+    with open(report.path, "rb") as f:
+        for offset in index["offsets"]:
+            f.seek(offset)
+            assert f.readline().startswith(b'{"f":')
+
+
+@pytest.mark.parametrize("offset, limit, expected, next_offset", [
+    (0, 3, [0, 1, 2], 3),
+    (2, 2, [2, 3], 4),           # crosses the first page boundary
+    (3, 3, [3, 4, 5], 6),        # starts exactly on a page offset
+    (5, 10, [5, 6, 7, 8, 9], None),
+    (7, 3, [7, 8, 9], None),     # ends exactly at the last record
+    (9, 5, [9], None),
+    (10, 5, [], None),           # exactly at the end
+    (50, 5, [], None),           # past the end
+])
+def test_paging_boundaries(tmp_path, offset, limit, expected, next_offset):
+    report = write_report(tmp_path, 10)
+    page = read_report_page(tmp_path, report.report_id, offset=offset, limit=limit)
+    assert files(page) == expected
+    assert page["next_offset"] == next_offset
+    assert page["total"] == 10
+
+
+def test_record_count_multiple_of_page_size(tmp_path):
+    report = write_report(tmp_path, 6)
+    assert files(read_report_page(tmp_path, report.report_id, offset=5, limit=5)) == [5]
+    page = read_report_page(tmp_path, report.report_id, offset=6, limit=5)
+    assert (page["records"], page["next_offset"]) == ([], None)
+
+
+def test_paging_walks_every_record_once(tmp_path):
+    report = write_report(tmp_path, 11)
+    seen, offset = [], 0
+    while offset is not None:
+        page = read_report_page(tmp_path, report.report_id, offset=offset, limit=4)
+        seen += files(page)
+        offset = page["next_offset"]
+    assert seen == list(range(11))
+
+
+def test_status_filter_offsets_count_filtered_records(tmp_path):
+    report = write_report(tmp_path, 10, failed_every=3)      # 0, 3, 6, 9 failed
+    page = read_report_page(tmp_path, report.report_id, offset=1, limit=2, status="failed")
+    assert files(page) == [3, 6]
+    assert page["next_offset"] == 3
+    assert "total" not in page
+    last = read_report_page(tmp_path, report.report_id, offset=3, limit=2, status="failed")
+    assert (files(last), last["next_offset"]) == ([9], None)
+    assert page["records"][0] == {
+        "file": "目录/文件-3.md", "status": "failed", "location": None, "seconds": 0.01, "error": "HTTP 500",
+    }
+
+
+def test_missing_index_falls_back_to_sequential_read(tmp_path):
+    report = write_report(tmp_path, 10)
+    report.path.with_suffix(".idx").unlink()
+    page = read_report_page(tmp_path, report.report_id, offset=4, limit=3)
+    assert files(page) == [4, 5, 6]
+    assert "total" not in page
+
+
+def test_corrupt_index_falls_back_to_sequential_read(tmp_path):
+    report = write_report(tmp_path, 10)
+    report.path.with_suffix(".idx").write_text("{not json")
+    assert files(read_report_page(tmp_path, report.report_id, offset=8, limit=3)) == [8, 9]
+
+
+@pytest.mark.parametrize("report_id", ["", "../etc/passwd", "ABCDEF012345", "0123456789abcdef"])
+def test_invalid_report_ids(tmp_path, report_id):
+    assert read_report_page(tmp_path, report_id) is None
+
+
+def test_unknown_report(tmp_path):
+    assert read_report_page(tmp_path, "0123456789ab") is None
+
+
+def test_create_keeps_most_recent_reports(tmp_path):
+    old = [write_report(tmp_path, 1) for _ in range(3)]
+    for i, report in enumerate(old):
+        os.utime(report.path, (1000 + i, 1000 + i))
+    new = IngestReport.create(tmp_path, keep=2)
+    new.close()
+    remaining = {p.stem for p in tmp_path.glob("*.jsonl")}
+    assert remaining == {old[2].report_id, new.report_id}
+    assert not old[0].path.with_suffix(".idx").exists()
+
+
+def test_summary_counts_and_failure_sample(tmp_path):
+    report = IngestReport(tmp_path, failure_sample=2)
+    for i in range(5):
+        report.add(f"f{i}", "failed", error=f"e{i}")
+    report.add("ok", "uploaded", "loc", seconds=20)
+    report.close()
+    summary = report.summary()
+    assert summary["records"] == 6
+    assert summary["counts"] == {"failed": 5, "uploaded": 1}
+    assert [f["file"] for f in summary["failures_sample"]] == ["f0", "f1"]
+    assert summary["upload_seconds"]["buckets"] == {"<=30s": 1}
+
+
+def test_latency_histogram_overflow_bucket():
+    histogram = LatencyHistogram(bounds=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 2.0):
+        histogram.add(seconds)
+    assert histogram.to_dict() == {
+        "count": 4, "mean_ms": 662.5, "max_ms": 2000.0, "buckets": {"<=0.1s": 2, "<=1s": 1, ">1s": 1},
+    }
@@ -0,0 +1,111 @@
+"""
+Tests for MultipartFileStream and ByteBudget: the declared Content-Length
+matches the bytes sent, the body can be sent again for a retry, and the
+budget is released when the consumer stops early.
+"""
+
+import asyncio
+import os
+import sys
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from multipart_stream import ByteBudget, MultipartFileStream
+
+
+def collect(stream):
+    async def main():
+        return b"".join([chunk async for chunk in stream])
+
+    return asyncio.run(main())
+
+
+def make_file(tmp_path, size):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(i % 251 for i in range(size)))
+    return path
+
+
+def test_content_length_matches_the_bytes_yielded(tmp_path):
+    for size in (0, 1, 1000, 4096, 10000):
+        path = make_file(tmp_path, size)
+        stream = MultipartFileStream(path, "报告 \"v2\".txt", "text/plain", budget=ByteBudget(8192), chunk_size=1024)
+        body = collect(stream)
+        assert int(stream.headers["Content-Length"]) == len(body)
+        assert path.read_bytes() in body
+
+
+def test_httpx_sends_the_declared_length_on_every_attempt(tmp_path):
+    path = make_file(tmp_path, 3000)
+    stream = MultipartFileStream(path, "docs/a.bin", "application/octet-stream", budget=ByteBudget(8192), chunk_size=512)
+    received = []
+
+    async def handler(request):
+        body = await request.aread()
+        received.append((int(request.headers["Content-Length"]), body))
+        return httpx.Response(503 if len(received) == 1 else 200)
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            for _ in range(2):      # the client's retry sends the same body object again
+                await client.post("http://backend/api/v1/document/upload", content=stream, headers=stream.headers)
+
+    asyncio.run(main())
+    assert [length for length, _ in received] == [len(body) for _, body in received]
+    assert received[0][1] == received[1][1]
+    assert received[0][1].startswith(f"--{stream.boundary}\r\n".encode())
+    assert b'name="file"; filename="docs/a.bin"' in received[0][1]
+
+
+def test_iterating_again_sends_the_same_body(tmp_path):
+    path = make_file(tmp_path, 5000)
+    stream = MultipartFileStream(path, "a.bin", "application/octet-stream", budget=ByteBudget(8192), chunk_size=700)
+    assert collect(stream) == collect(stream)
+
+
+def test_budget_is_released_when_the_consumer_stops_early(tmp_path):
+    path = make_file(tmp_path, 10000)
+    budget = ByteBudget(4096)
+
+    async def main():
+        stream = MultipartFileStream(path, "a.bin", "application/octet-stream", budget=budget, chunk_size=1024)
+        chunks = stream.__aiter__()
+        await chunks.__anext__()            # header
+        await chunks.__anext__()            # first file chunk, holding budget
+        held = budget.in_use
+        await chunks.aclose()               # e.g. the request failed mid-upload
+        return held
+
+    assert asyncio.run(main()) == 1024
+    assert budget.in_use == 0
+
+
+def test_budget_limits_bytes_in_flight_across_streams(tmp_path):
+    path = make_file(tmp_path, 8192)
+    budget = ByteBudget(2048)
+    peak = 0
+
+    async def consume(stream):
+        nonlocal peak
+        async for _ in stream:
+            peak = max(peak, budget.in_use)
+            await asyncio.sleep(0)
+
+    async def main():
+        streams = [MultipartFileStream(path, f"{i}.bin", "application/octet-stream", budget=budget, chunk_size=1024)
+                   for i in range(4)]
+        await asyncio.wait_for(asyncio.gather(*(consume(s) for s in streams)), 10)
+
+    asyncio.run(main())
+    assert peak == 2048
+    assert budget.in_use == 0
+
+
+def test_chunk_larger_than_budget_does_not_deadlock(tmp_path):
+    path = make_file(tmp_path, 5000)
+    budget = ByteBudget(100)
+    stream = MultipartFileStream(path, "a.bin", "application/octet-stream", budget=budget, chunk_size=4096)
+    assert path.read_bytes() in collect(stream)
+    assert budget.in_use == 0
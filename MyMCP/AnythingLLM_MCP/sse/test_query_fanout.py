@@ -0,0 +1,131 @@
+"""
+Tests for the multi-workspace query fan-out: merge_sources dedup and ordering,
+and fan_out's error, timeout and concurrency handling.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from query_fanout import fan_out, merge_sources
+
+
+# ---------- merge_sources ----------
+def test_dedup_by_id_keeps_highest_score_and_all_workspaces():
+    merged = merge_sources({
+        "a": [{"id": "1", "text": "x", "score": 0.5}],
+        "b": [{"id": "1", "text": "x", "score": 0.9, "title": "from b"}],
+        "c": [{"id": "1", "text": "x", "score": 0.7}],
+    })
+    assert merged == [{"id": "1", "text": "x", "score": 0.9, "title": "from b", "workspaces": ["a", "b", "c"]}]
+
+
+def test_dedup_same_document_and_text_with_different_ids():
+    merged = merge_sources({
+        "a": [{"id": "a-1", "chunkSource": "doc.pdf", "text": "same", "score": 0.8}],
+        "b": [{"id": "b-7", "chunkSource": "doc.pdf", "text": "same", "score": 0.6},
+              {"id": "b-8", "chunkSource": "doc.pdf", "text": "other", "score": 0.4}],
+    })
+    assert [(s["id"], s["workspaces"]) for s in merged] == [("a-1", ["a", "b"]), ("b-8", ["b"])]
+
+
+def test_document_falls_back_to_url_then_title():
+    merged = merge_sources({
+        "a": [{"url": "file://x", "text": "t", "score": 0.1},
+              {"title": "Guide", "text": "t", "score": 0.2}],
+        "b": [{"url": "file://x", "text": "t", "score": 0.3},
+              {"title": "Guide", "text": "t", "score": 0.1}],
+    })
+    assert [(s.get("url") or s["title"], s["score"], s["workspaces"]) for s in merged] == [
+        ("file://x", 0.3, ["a", "b"]),
+        ("Guide", 0.2, ["a", "b"]),
+    ]
+
+
+def test_same_text_in_different_documents_is_kept():
+    merged = merge_sources({"a": [{"title": "A", "text": "t"}], "b": [{"title": "B", "text": "t"}]})
+    assert len(merged) == 2
+
+
+def test_sources_without_keys_are_never_merged():
+    merged = merge_sources({"a": [{"score": 0.2}], "b": [{"score": 0.2}]})
+    assert [s["workspaces"] for s in merged] == [["a"], ["b"]]
+
+
+def test_ordering_by_score_with_stable_ties_and_missing_scores():
+    merged = merge_sources({
+        "a": [{"id": "1", "score": 0.3}, {"id": "2"}, {"id": "3", "score": 0.9}],
+        "b": [{"id": "4", "score": 0.3}, {"id": "5", "score": None}],
+    })
+    assert [s["id"] for s in merged] == ["3", "1", "4", "2", "5"]
+
+
+def test_duplicate_within_one_workspace_lists_it_once():
+    merged = merge_sources({"a": [{"id": "1", "score": 0.1}, {"id": "1", "score": 0.2}]})
+    assert merged == [{"id": "1", "score": 0.2, "workspaces": ["a"]}]
+
+
+def test_empty_and_missing_source_lists():
+    assert merge_sources({}) == []
+    assert merge_sources({"a": None, "b": []}) == []
+
+
+def test_inputs_are_not_modified():
+    source = {"id": "1", "score": 0.5}
+    merge_sources({"a": [source], "b": [dict(source)]})
+    assert source == {"id": "1", "score": 0.5}
+
+
+# ---------- fan_out ----------
+def test_fan_out_collects_ok_error_and_timeout():
+    async def query(workspace):
+        if workspace == "bad":
+            raise RuntimeError("HTTP 500")
+        if workspace == "slow":
+            await asyncio.sleep(5)
+        return {"textResponse": workspace}
+
+    async def main():
+        streamed = []
+
+        async def on_result(workspace, result):
+            streamed.append((workspace, result["status"]))
+
+        results = await fan_out(["ok", "bad", "slow", "ok"], query, timeout=0.2, on_result=on_result)
+        return results, streamed
+
+    results, streamed = asyncio.run(main())
+    assert list(results) == ["ok", "bad", "slow"]
+    assert results["ok"]["response"] == {"textResponse": "ok"}
+    assert results["bad"] == {"status": "error", "error": "HTTP 500", "seconds": results["bad"]["seconds"]}
+    assert results["slow"]["status"] == "timeout"
+    assert streamed == [("ok", "ok"), ("bad", "error"), ("slow", "timeout")]
+
+
+def test_fan_out_respects_concurrency():
+    async def main():
+        active = peak = 0
+
+        async def query(workspace):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return {}
+
+        results = await fan_out([f"w{i}" for i in range(6)], query, concurrency=2)
+        return peak, results
+
+    peak, results = asyncio.run(main())
+    assert peak == 2
+    assert all(r["status"] == "ok" for r in results.values())
+
+
+def test_fan_out_without_workspaces():
+    async def query(workspace):
+        raise AssertionError("not called")
+
+    assert asyncio.run(fan_out([], query)) == {}
@@ -0,0 +1,191 @@
+"""
+Tests for sync_folder and its FolderManifest: files that are added, modified
+or deleted, the guards that skip deletions (scan errors, every tracked file
+missing), retries of unembedded locations and failed deletes, and deletion
+of locations shared by several files.
+"""
+
+import asyncio
+
+import pytest
+
+from sync_manifest import FolderManifest
+
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / "docs"
+    (root / "sub").mkdir(parents=True)
+    (root / "a.txt").write_text("alpha\n")
+    (root / "b.txt").write_text("beta\n")
+    (root / "sub" / "c.txt").write_text("gamma\n")
+    return root
+
+
+def sync(server, folder, **kwargs):
+    return asyncio.run(server.sync_folder("ws", str(folder), **kwargs))
+
+
+def manifest(server, folder):
+    return FolderManifest.for_folder(server.STATE_DIR, "ws", folder)
+
+
+def location(server, folder, rel_path):
+    return manifest(server, folder).get(rel_path)["location"]
+
+
+def test_first_sync_uploads_and_embeds_everything(server, backend, folder):
+    result = sync(server, folder)
+    assert result["status"] == "indexed"
+    assert (result["uploaded"], result["unchanged"], result["removed"]) == (3, 0, 0)
+    entries = dict(manifest(server, folder).items())
+    assert sorted(entries) == ["a.txt", "b.txt", "sub/c.txt"]
+    assert all(entry["embedded"] for entry in entries.values())
+    assert sorted(backend.embedded()) == sorted(entry["location"] for entry in entries.values())
+
+    result = sync(server, folder)
+    assert result["status"] == "up to date"
+    assert result["unchanged"] == 3
+    assert len(backend.uploads) == 3
+    assert len(backend.embeddings) == 1
+
+
+def test_modified_file_replaces_its_old_document(server, backend, folder):
+    sync(server, folder)
+    old = location(server, folder, "a.txt")
+    (folder / "a.txt").write_text("alpha, second edition\n")
+
+    result = sync(server, folder)
+    assert (result["uploaded"], result["unchanged"]) == (1, 2)
+    new = location(server, folder, "a.txt")
+    assert new != old
+    assert backend.embeddings[-1][1:] == ([new], [old])
+
+
+def test_deleted_file_removes_its_document(server, backend, folder):
+    sync(server, folder)
+    old = location(server, folder, "b.txt")
+    (folder / "b.txt").unlink()
+
+    result = sync(server, folder)
+    assert result["status"] == "indexed"
+    assert (result["removed"], result["deleted"]) == (1, 1)
+    assert backend.embeddings[-1][1:] == ([], [old])
+    assert manifest(server, folder).get("b.txt") is None
+
+
+def test_scan_errors_skip_deletions(server, backend, folder, monkeypatch):
+    sync(server, folder)
+    collect = server._collect_files
+
+    def unreadable_sub(root, on_error=None):
+        # sub/ cannot be read this time: its files are missing from the scan
+        on_error(str(root / "sub"), PermissionError("permission denied"))
+        return (path for path in collect(root) if "sub" not in path.relative_to(root).parts)
+
+    monkeypatch.setattr(server, "_collect_files", unreadable_sub)
+    result = sync(server, folder)
+    assert result["status"] == "partial"
+    assert (result["removed"], result["removal_skipped"]) == (0, 1)
+    assert result["scan_errors"]
+    assert backend.deleted() == []
+    assert manifest(server, folder).get("sub/c.txt") is not None
+
+
+def test_removing_every_file_needs_allow_remove_all(server, backend, folder):
+    sync(server, folder)
+    locations = sorted(entry["location"] for _, entry in manifest(server, folder).items())
+    for path in (folder / "a.txt", folder / "b.txt", folder / "sub" / "c.txt"):
+        path.unlink()
+
+    result = sync(server, folder)
+    assert result["status"] == "partial"
+    assert (result["removed"], result["removal_skipped"]) == (0, 3)
+    assert "allow_remove_all" in result["warning"]
+    assert backend.deleted() == []
+
+    result = sync(server, folder, allow_remove_all=True)
+    assert result["status"] == "indexed"
+    assert result["removed"] == 3
+    assert sorted(backend.deleted()) == locations
+    assert list(manifest(server, folder).items()) == []
+
+
+def test_unembedded_locations_are_committed_on_the_next_sync(server, backend, folder, monkeypatch):
+    monkeypatch.setattr(server, "EMBED_MAX_RETRIES", 0)
+    backend.fail_embeddings = True
+    result = sync(server, folder)
+    assert result["status"] == "partial"
+    assert result["unembedded"] == 3
+    assert not any(entry["embedded"] for _, entry in manifest(server, folder).items())
+
+    backend.fail_embeddings = False
+    result = sync(server, folder)
+    assert result["status"] == "indexed"
+    assert (result["uploaded"], result["unchanged"]) == (0, 3)
+    assert len(backend.uploads) == 3
+    assert sorted(backend.embedded()) == sorted(entry["location"] for _, entry in manifest(server, folder).items())
+    assert all(entry["embedded"] for _, entry in manifest(server, folder).items())
+
+
+def test_failed_deletes_are_retried_on_the_next_sync(server, backend, folder, monkeypatch):
+    monkeypatch.setattr(server, "EMBED_MAX_RETRIES", 0)
+    sync(server, folder)
+    old = location(server, folder, "a.txt")
+    (folder / "a.txt").unlink()
+
+    backend.fail_embeddings = True
+    result = sync(server, folder)
+    assert result["status"] == "partial"
+    assert result["removed"] == 1
+    assert manifest(server, folder).pending_deletes == [old]
+
+    backend.fail_embeddings = False
+    result = sync(server, folder)
+    assert result["deleted"] == 1
+    assert backend.deleted() == [old]
+    assert manifest(server, folder).pending_deletes == []
+
+
+def test_shared_location_is_deleted_with_its_last_file(server, backend, folder):
+    (folder / "copy.txt").write_text("alpha\n")          # same content as a.txt
+    result = sync(server, folder)
+    assert result["dedup"]["hits"] == 1
+    shared = location(server, folder, "a.txt")
+    assert location(server, folder, "copy.txt") == shared
+
+    (folder / "copy.txt").unlink()
+    result = sync(server, folder)
+    assert result["removed"] == 1
+    assert backend.deleted() == []
+
+    (folder / "a.txt").unlink()
+    result = sync(server, folder)
+    assert result["removed"] == 1
+    assert backend.deleted() == [shared]
+
+
+def test_document_still_used_by_an_upload_is_kept(server, backend, folder):
+    asyncio.run(server.upload_file("ws", str(folder / "b.txt")))
+    sync(server, folder)
+    (folder / "b.txt").unlink()
+
+    result = sync(server, folder)
+    assert result["removed"] == 1
+    assert backend.deleted() == []
+
+
+def test_manifest_round_trip_and_corrupt_file(tmp_path):
+    root = tmp_path / "docs"
+    saved = FolderManifest.for_folder(tmp_path, "ws", root)
+    saved.set("a.txt", size=6, mtime=1.5, sha256="abc", location="custom-documents/a.json", embedded=True)
+    saved.pending_deletes = ["custom-documents/old.json"]
+    saved.save()
+
+    loaded = FolderManifest.for_folder(tmp_path, "ws", root)
+    assert loaded.get("a.txt")["location"] == "custom-documents/a.json"
+    assert loaded.pending_deletes == ["custom-documents/old.json"]
+    assert FolderManifest.path_for(tmp_path, "other", root) != saved.path
+
+    saved.path.write_text("{not json")
+    assert list(FolderManifest.for_folder(tmp_path, "ws", root).items()) == []
@@ -0,0 +1,50 @@
+"""
+Tests for the shape of upload_folder results: result_mode "full", "compact"
+and "auto", and the error returned for an unknown mode.
+"""
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / "docs"
+    root.mkdir()
+    for i in range(3):
+        (root / f"{i}.txt").write_text(f"file {i}\n")
+    return root
+
+
+def upload(server, folder, **kwargs):
+    return asyncio.run(server.upload_folder("ws", str(folder), **kwargs))
+
+
+def test_full_result_lists_files_and_locations(server, backend, folder):
+    result = upload(server, folder, result_mode="full")
+    assert result["status"] == "indexed"
+    assert len(result["successful_files"]) == len(result["locations"]) == 3
+    assert "embedding" not in result
+
+
+def test_compact_result_has_counts_only(server, backend, folder):
+    result = upload(server, folder, result_mode="compact")
+    assert result["status"] == "indexed"
+    assert "locations" not in result and "successful_files" not in result
+    assert result["embedding"]["batches"] == 1
+    assert result["report"]["report_id"]
+
+
+def test_auto_switches_to_compact_for_large_folders(server, backend, folder, monkeypatch):
+    assert "locations" in upload(server, folder)
+    monkeypatch.setattr(server, "FULL_RESULT_MAX_FILES", 2)
+    assert "locations" not in upload(server, folder)
+
+
+@pytest.mark.parametrize("mode", ["ful", "FULL", ""])
+def test_unknown_result_mode_is_an_error(server, backend, folder, mode):
+    result = upload(server, folder, result_mode=mode)
+    assert result["status"] == "error"
+    assert "result_mode" in result["message"]
+    assert backend.uploads == []
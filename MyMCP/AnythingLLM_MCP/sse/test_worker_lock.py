@@ -0,0 +1,100 @@
+"""
+Tests for FileLock, the leader election used by multi-worker deployments:
+only one holder at a time (across processes too), a new holder once the
+first releases or exits, and the async wait.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from worker_lock import FileLock
+
+HOLDER = """
+import sys
+sys.path.insert(0, {sse!r})
+from worker_lock import FileLock
+
+lock = FileLock({path!r})
+print("held" if lock.try_acquire() else "busy", flush=True)
+sys.stdin.readline()            # hold until the parent says so, then exit without releasing
+"""
+
+
+def start_holder(tmp_path, path):
+    script = tmp_path / "holder.py"
+    script.write_text(textwrap.dedent(HOLDER.format(sse=os.path.dirname(os.path.abspath(__file__)), path=str(path))))
+    proc = subprocess.Popen([sys.executable, str(script)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    return proc, proc.stdout.readline().strip()
+
+
+def test_only_one_holder_in_process(tmp_path):
+    path = tmp_path / "leader.lock"
+    first, second = FileLock(path), FileLock(path)
+    assert first.try_acquire()
+    assert first.try_acquire()          # already held by this instance
+    assert not second.try_acquire()
+    assert (first.held, second.held) == (True, False)
+
+    first.release()
+    assert second.try_acquire()
+    assert not first.try_acquire()
+    second.release()
+    assert not second.held
+
+
+def test_new_leader_after_holder_process_exits(tmp_path):
+    path = tmp_path / "leader.lock"
+    proc, state = start_holder(tmp_path, path)
+    try:
+        assert state == "held"
+        worker = FileLock(path)
+        assert not worker.try_acquire()
+
+        other, other_state = start_holder(tmp_path, path)
+        other.communicate("\n", timeout=30)
+        assert other_state == "busy"
+    finally:
+        proc.communicate("\n", timeout=30)
+    # the holder exited without releasing; the OS dropped its lock
+    assert worker.try_acquire()
+    worker.release()
+
+
+def test_async_acquire_waits_for_release(tmp_path):
+    path = tmp_path / "manifest.lock"
+
+    async def main():
+        first = FileLock(path)
+        first.try_acquire()
+        order = []
+
+        async def waiter():
+            async with FileLock(path, poll_interval=0.01):
+                order.append("second")
+
+        task = asyncio.create_task(waiter())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        order.append("first")
+        first.release()
+        await asyncio.wait_for(task, 5)
+        return order
+
+    assert asyncio.run(main()) == ["first", "second"]
+
+
+def test_sync_context_releases_on_error(tmp_path):
+    path = tmp_path / "watches.lock"
+    try:
+        with FileLock(path):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    lock = FileLock(path)
+    assert lock.try_acquire()
+    lock.release()
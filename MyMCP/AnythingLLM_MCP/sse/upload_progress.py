@@ -0,0 +1,176 @@
+"""
+上传工具的 MCP 进度通知
+
+上传路径上的回调只同步更新计数器；后台任务每隔 interval 秒把变化通过
+ctx.report_progress 发送给客户端（已扫描/已上传/已嵌入的文件数、发送字节数、
+速率和预计剩余时间），因此上传本身不会等待通知发送。
+
+stream_results=True 时，每个文件的上传结果和每个嵌入批次也会作为日志通知
+（logger "anythingllm.upload"，结构化数据在 extra 中）逐条发送，客户端可以在
+整个文件夹完成之前开始使用已嵌入的文档。
+"""
+
+import asyncio
+import time
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+LOGGER_NAME = "anythingllm.upload"
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class UploadProgress:
+    """
+    统计一次文件夹上传的进度并发送给客户端
+
+    用法:
+        async with UploadProgress(ctx, stream_results=True) as progress:
+            files = progress.track_scan(scan_files(root))
+            ...  # progress.file_result(path, location, seconds, error) / progress.embedded(locations)
+    """
+
+    def __init__(self, ctx=None, *, stream_results: bool = False, interval: float = 0.5):
+        self.ctx = ctx
+        self.stream_results = stream_results and ctx is not None
+        self.interval = interval
+        self.scanned = 0
+        self.scan_done = False
+        self.uploaded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.embedded_count = 0
+        self.bytes_sent = 0
+        self.started = time.monotonic()
+        self._events: deque = deque()
+        self._version = 0
+        self._reported = -1
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- 同步回调 ----------
+    def track_scan(self, files: Iterable[Path]) -> Iterator[Path]:
+        """包装扫描器：每产出一个文件计数一次，扫描结束后总数确定"""
+        for file_path in files:
+            self.scanned += 1
+            self._version += 1
+            yield file_path
+        self.scan_finished()
+
+    def file_scanned(self, count: int = 1) -> None:
+        self.scanned += count
+        self._version += 1
+
+    def scan_finished(self) -> None:
+        self.scan_done = True
+        self._version += 1
+
+    def file_skipped(self, count: int = 1) -> None:
+        """文件未变化、无需上传（sync_folder）"""
+        self.skipped += count
+        self._version += 1
+
+    def file_result(self, file_path: Path, location: Optional[str], seconds: Optional[float] = None,
+                    error: Optional[str] = None) -> None:
+        if location:
+            self.uploaded += 1
+            try:
+                self.bytes_sent += file_path.stat().st_size
+            except OSError:
+                pass
+        else:
+            self.failed += 1
+        self._version += 1
+        if self.stream_results:
+            self._events.append({
+                "event": "file",
+                "file": str(file_path),
+                "status": "uploaded" if location else "failed",
+                "location": location,
+                "seconds": round(seconds, 3) if seconds is not None else None,
+                "error": error,
+            })
+
+    def embedded(self, locations: List[str]) -> None:
+        self.embedded_count += len(locations)
+        self._version += 1
+        if self.stream_results:
+            self._events.append({"event": "embedded", "count": len(locations), "locations": list(locations)})
+
+    # ---------- 统计 ----------
+    def snapshot(self) -> dict:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        done = self.uploaded + self.failed + self.skipped
+        total = self.scanned if self.scan_done else None
+        rate = done / elapsed
+        eta = None
+        if total is not None and rate > 0:
+            eta = round(max(0, total - done) / rate, 1)
+        return {
+            "scanned": self.scanned,
+            "scan_done": self.scan_done,
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "embedded": self.embedded_count,
+            "bytes_sent": self.bytes_sent,
+            "elapsed_seconds": round(elapsed, 1),
+            "files_per_second": round(rate, 2),
+            "bytes_per_second": round(self.bytes_sent / elapsed),
+            "eta_seconds": eta,
+        }
+
+    def _message(self, snap: dict) -> str:
+        total = snap["scanned"] if snap["scan_done"] else f"{snap['scanned']}+"
+        parts = [f"上传 {snap['uploaded']}/{total}"]
+        if snap["skipped"]:
+            parts.append(f"未变化 {snap['skipped']}")
+        if snap["failed"]:
+            parts.append(f"失败 {snap['failed']}")
+        parts.append(f"已嵌入 {snap['embedded']}")
+        parts.append(f"{_format_bytes(snap['bytes_sent'])}，{snap['files_per_second']} 文件/秒")
+        if snap["eta_seconds"] is not None:
+            parts.append(f"预计剩余 {snap['eta_seconds']:.0f} 秒")
+        return "，".join(parts)
+
+    # ---------- 通知发送 ----------
+    async def __aenter__(self) -> "UploadProgress":
+        if self.ctx is not None:
+            self._task = asyncio.create_task(self._pump())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            await self.flush()
+        return False
+
+    async def _pump(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """发送排队的逐文件结果和最新进度（客户端断开等错误不影响上传）"""
+        if self.ctx is None:
+            return
+        try:
+            while self._events:
+                event = self._events.popleft()
+                await self.ctx.log(event["event"], level="info", logger_name=LOGGER_NAME, extra=event)
+            if self._version != self._reported:
+                self._reported = self._version
+                snap = self.snapshot()
+                done = snap["uploaded"] + snap["failed"] + snap["skipped"]
+                total = snap["scanned"] if snap["scan_done"] else None
+                await self.ctx.report_progress(done, total, self._message(snap))
+        except Exception:
+            pass
@@ -0,0 +1,99 @@
+"""
+跨进程文件锁（多 worker 部署时协调共享状态目录）
+
+POSIX 上使用 fcntl.flock，Windows 上使用 msvcrt.locking。锁随打开的文件描述符存在，
+持有锁的进程退出（包括崩溃）时由操作系统自动释放，不会留下需要手工清理的陈旧锁。
+
+用法：
+    FileLock(path).try_acquire()      后台任务的 leader 选举，拿不到立即返回 False
+    with FileLock(path): ...          短小的读-改-写临界区（同步等待）
+    async with FileLock(path): ...    可能较长的临界区，轮询等待，不阻塞事件循环
+"""
+
+import asyncio
+import os
+import time
+from pathlib import Path
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+    def _unlock(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class FileLock:
+    """
+    排他文件锁，不可重入：同一进程内对同一路径的两个 FileLock 也互斥
+
+    Args:
+        path: 锁文件路径（不存在时创建，内容无意义，释放后保留）
+        poll_interval: 等待锁时的重试间隔（秒）
+    """
+
+    def __init__(self, path: Path, poll_interval: float = 0.05):
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        """尝试加锁，已被其他进程持有时立即返回 False"""
+        if self._fd is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            _lock(fd)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def acquire(self) -> None:
+        while not self.try_acquire():
+            time.sleep(self.poll_interval)
+
+    async def acquire_async(self) -> None:
+        while not self.try_acquire():
+            await asyncio.sleep(self.poll_interval)
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            _unlock(self._fd)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    async def __aenter__(self) -> "FileLock":
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
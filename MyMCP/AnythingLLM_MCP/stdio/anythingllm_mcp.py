@@ -15,42 +15,45 @@ Environment variables:
 - WORKSPACE_NAME: Name of the workspace in AnythingLLM (default: my)
 """
 
-import asyncio
 import os
-import json
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-# 添加当前目录到 sys.path
+# 添加当前目录和上一级目录（共享的 anythingllm_common）到 sys.path
 sys.path.append(str(Path(__file__).parent))
-import httpx
-from typing import Optional, List, Dict, Any
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from typing import List, Dict, Any
 from dotenv import load_dotenv
 
 from fastmcp import FastMCP
-from mcp.types import TextContent
+from anythingllm_common import AnythingLLMClient, configure_logging
 
 # Load environment variables
 load_dotenv()
 
 # AnythingLLM configuration
-API_KEY = os.getenv("ANYTHINGLLM_API_KEY")
-BASE_URL = os.getenv("ANYTHINGLLM_BASE_URL", "http://localhost:3001")
 WORKSPACE = os.getenv("WORKSPACE_NAME", "my")
 if not WORKSPACE:
     WORKSPACE = os.getenv("WORKSPACE", "my")
 
+@asynccontextmanager
+async def _lifespan(server: FastMCP):
+    """Close the shared client's connection pool when the server stops."""
+    async with client:
+        yield {}
+
+
 # Create FastMCP server
 mcp = FastMCP(
     "AnythingLLM RAG Server",
-    dependencies=["httpx", "python-dotenv"]
+    lifespan=_lifespan
 )
 
-# Headers for AnythingLLM API requests
-HEADERS = {
-    "Authorization": f"Bearer {API_KEY}",
-    "Content-Type": "application/json",
-}
+# Shared AnythingLLM client (pooled connections, retries, circuit breaker and the
+# opt-in query cache, which is invalidated whenever the workspace's documents change)
+client = AnythingLLMClient.from_env()
+BASE_URL = client.base_url
 
 @mcp.tool
 async def query_knowledge_base(prompt: str) -> str:
@@ -63,14 +66,8 @@ async def query_knowledge_base(prompt: str) -> str:
     Returns:
         The response from AnythingLLM
     """
-    url = f"{BASE_URL}/api/v1/workspace/{WORKSPACE}/chat"
-    payload = {"message": prompt, "mode": "query"}
-    
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.post(url, headers=HEADERS, json=payload)
-            r.raise_for_status()
-            data = r.json()
+        data = await client.chat(WORKSPACE, prompt, "query")
         
         # Extract the text response
         return data.get("textResponse", "No response received")
@@ -85,69 +82,51 @@ async def list_documents() -> List[Dict[str, Any]]:
     Returns:
         A list of documents in the workspace
     """
-    url = f"{BASE_URL}/api/v1/workspace/{WORKSPACE}/documents"
-    
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.get(url, headers=HEADERS)
-            r.raise_for_status()
-            data = r.json()
-        
-        return data.get("documents", [])
+        return await client.workspace_documents(WORKSPACE)
     except Exception as e:
         return [{"error": f"Error listing documents: {str(e)}"}]
 
 @mcp.tool
 async def upload_document(file_path: str, chunk_size: int = 1500) -> Dict[str, Any]:
     """
-    Upload a document to the AnythingLLM workspace.
+    Upload a document and embed it in the AnythingLLM workspace.
     
     Args:
         file_path: Path to the file to upload
-        chunk_size: Size of chunks for processing (default: 1500)
+        chunk_size: Deprecated and ignored; AnythingLLM splits documents with the
+            text splitter settings configured on the instance
         
     Returns:
-        Response from the upload operation
+        Response from the embedding update, with the uploaded document's location
     """
-    url = f"{BASE_URL}/api/v1/workspace/{WORKSPACE}/documents/upload"
-    
     try:
         if not os.path.exists(file_path):
             return {"error": f"File not found: {file_path}"}
         
-        file_name = os.path.basename(file_path)
-        
-        # AnythingLLM expects multipart/form-data
-        files = {"file": (file_name, open(file_path, "rb"))}
-        data = {"chunkSize": str(chunk_size)}
-        
-        async with httpx.AsyncClient(timeout=60) as client:
-            # Remove the Content-Type header for multipart/form-data
-            headers = {k: v for k, v in HEADERS.items() if k != "Content-Type"}
-            r = await client.post(url, headers=headers, files=files, data=data)
-            r.raise_for_status()
-            return r.json()
+        uploaded = await client.upload_file(file_path)
+        documents = uploaded.get("documents") or []
+        if not documents or "location" not in documents[0]:
+            return {"error": "Error uploading document: no location in the upload response"}
+        location = documents[0]["location"]
+        result = await client.update_embeddings(WORKSPACE, adds=[location])
+        return {"location": location, **(result or {})}
     except Exception as e:
         return {"error": f"Error uploading document: {str(e)}"}
 
 @mcp.tool
 async def delete_document(document_id: str) -> Dict[str, Any]:
     """
-    Delete a document from the AnythingLLM workspace.
+    Remove a document from the AnythingLLM workspace.
     
     Args:
-        document_id: ID of the document to delete
+        document_id: Path of the document in the workspace ("docpath" in list_documents)
         
     Returns:
         Response from the delete operation
     """
-    url = f"{BASE_URL}/api/v1/workspace/{WORKSPACE}/documents/{document_id}"
-    
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.delete(url, headers=HEADERS)
-            r.raise_for_status()
-            return r.json()
+        return await client.update_embeddings(WORKSPACE, deletes=[document_id])
     except Exception as e:
         return {"error": f"Error deleting document: {str(e)}"}
 
@@ -159,13 +138,8 @@ async def get_workspace_info() -> Dict[str, Any]:
     Returns:
         Workspace information
     """
-    url = f"{BASE_URL}/api/v1/workspace/{WORKSPACE}"
-    
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.get(url, headers=HEADERS)
-            r.raise_for_status()
-            return r.json()
+        return {"workspace": await client.get_workspace(WORKSPACE)}
     except Exception as e:
         return {"error": f"Error getting workspace info: {str(e)}"}
 
@@ -173,25 +147,27 @@ async def get_workspace_info() -> Dict[str, Any]:
 async def get_status():
     """Return the current status of the AnythingLLM connection."""
     try:
-        url = f"{BASE_URL}/api/v1/system"
-        async with httpx.AsyncClient(timeout=10) as client:
-            r = await client.get(url, headers=HEADERS)
-            r.raise_for_status()
-            return {
-                "status": "connected",
-                "version": r.json().get("version", "unknown"),
-                "workspace": WORKSPACE,
-                "base_url": BASE_URL
-            }
+        system = await client.system()
+        return {
+            "status": "connected",
+            "version": system.get("version", "unknown"),
+            "workspace": WORKSPACE,
+            "base_url": BASE_URL,
+            "query_cache": client.cache.stats()
+        }
     except Exception as e:
         return {
             "status": "disconnected",
             "error": str(e),
             "workspace": WORKSPACE,
-            "base_url": BASE_URL
+            "base_url": BASE_URL,
+            "query_cache": client.cache.stats(),
+            "circuit_breaker": client.breaker.stats()
         }
 
 
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    # stdout carries the MCP protocol; logs go to stderr (or ANYTHINGLLM_LOG_FILE)
+    configure_logging()
+    mcp.run()
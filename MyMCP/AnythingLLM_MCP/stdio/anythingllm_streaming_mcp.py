@@ -10,45 +10,50 @@ Requirements:
 - A workspace configured in AnythingLLM
 """
 
-import asyncio
 import os
-import json
 import sys
-import httpx
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional, List, Dict, Any, AsyncGenerator
 from dotenv import load_dotenv
 
-# 添加当前目录到 sys.path
+# 添加当前目录和上一级目录（共享的 anythingllm_common）到 sys.path
 sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from fastmcp import FastMCP
-from mcp.types import TextContent, Content
+from mcp.types import TextContent
+from anythingllm_common import AnythingLLMClient, configure_logging
 
 # Load environment variables
 load_dotenv()
 
 # AnythingLLM configuration
-API_KEY = os.getenv("ANYTHINGLLM_API_KEY")
-BASE_URL = os.getenv("ANYTHINGLLM_BASE_URL", "http://localhost:3001")
 WORKSPACE = os.getenv("WORKSPACE_NAME", "my")
 if not WORKSPACE:
     WORKSPACE = os.getenv("WORKSPACE", "my")
 
+@asynccontextmanager
+async def _lifespan(server: FastMCP):
+    """Close the shared client's connection pool when the server stops."""
+    async with client:
+        yield {}
+
+
 # Create FastMCP server
 mcp = FastMCP(
     "AnythingLLM RAG Server with Streaming",
-    dependencies=["httpx", "python-dotenv"]
+    lifespan=_lifespan
 )
 
-# Headers for AnythingLLM API requests
-HEADERS = {
-    "Authorization": f"Bearer {API_KEY}",
-    "Content-Type": "application/json",
-}
+# Shared AnythingLLM client: pooled connections, retries and the circuit breaker
+# for BASE_URL (after repeated connection errors, timeouts or 5xx responses,
+# calls fail immediately instead of waiting out the timeout)
+client = AnythingLLMClient.from_env()
+BASE_URL = client.base_url
 
 @mcp.tool
-async def query_knowledge_base_stream(prompt: str) -> AsyncGenerator[Content, None]:
+async def query_knowledge_base_stream(prompt: str) -> AsyncGenerator[TextContent, None]:
     """
     Query the AnythingLLM knowledge base with a prompt and stream the response.
     
@@ -58,39 +63,28 @@ async def query_knowledge_base_stream(prompt: str) -> AsyncGenerator[Content, No
     Yields:
         Streaming content from AnythingLLM
     """
-    url = f"{BASE_URL}/api/v1/workspace/{WORKSPACE}/chat/stream"
-    payload = {"message": prompt, "mode": "query"}
-    
     try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            async with client.stream("POST", url, headers=HEADERS, json=payload) as response:
-                response.raise_for_status()
-                
-                buffer = ""
-                async for chunk in response.aiter_text():
-                    if chunk.strip():
-                        # AnythingLLM sends SSE data in the format: data: {...}
-                        if chunk.startswith("data:"):
-                            data_str = chunk[5:].strip()
-                            try:
-                                data = json.loads(data_str)
-                                if "textResponse" in data:
-                                    text_chunk = data["textResponse"]
-                                    yield Content(text=text_chunk)
-                                    buffer += text_chunk
-                            except json.JSONDecodeError:
-                                # Handle non-JSON data
-                                yield Content(text=data_str)
-                                buffer += data_str
-                        else:
-                            # Handle raw text
-                            yield Content(text=chunk)
-                            buffer += chunk
-                
-                # Return the final buffer as metadata
-                yield Content(text="", meta={"complete_response": buffer})
+        # Text chunks are collected in a list and joined once at the end
+        parts = []
+        sources = []
+        async for data in client.stream_chat(WORKSPACE, prompt, "query"):
+            if data.get("error"):
+                yield TextContent(type="text", text=f"Error querying knowledge base: {data['error']}")
+                return
+        
+            text_chunk = data.get("textResponse")
+            if text_chunk:
+                yield TextContent(type="text", text=text_chunk)
+                parts.append(text_chunk)
+            if data.get("sources"):
+                sources = data["sources"]
+            if data.get("close"):
+                break
+    
+        # Return the final response as metadata
+        yield TextContent(type="text", text="", _meta={"complete_response": "".join(parts), "sources": sources})
     except Exception as e:
-        yield Content(text=f"Error querying knowledge base: {str(e)}")
+        yield TextContent(type="text", text=f"Error querying knowledge base: {str(e)}")
 
 @mcp.tool
 async def list_workspaces() -> List[Dict[str, Any]]:
@@ -100,15 +94,8 @@ async def list_workspaces() -> List[Dict[str, Any]]:
     Returns:
         A list of workspaces
     """
-    url = f"{BASE_URL}/api/v1/workspaces"
-    
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.get(url, headers=HEADERS)
-            r.raise_for_status()
-            data = r.json()
-        
-        return data.get("workspaces", [])
+        return await client.list_workspaces()
     except Exception as e:
         return [{"error": f"Error listing workspaces: {str(e)}"}]
 
@@ -124,17 +111,9 @@ async def create_workspace(name: str, description: Optional[str] = None) -> Dict
     Returns:
         Response from the create operation
     """
-    url = f"{BASE_URL}/api/v1/workspace"
-    payload = {"name": name}
-    
-    if description:
-        payload["description"] = description
-    
+    settings = {"description": description} if description else {}
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.post(url, headers=HEADERS, json=payload)
-            r.raise_for_status()
-            return r.json()
+        return await client.create_workspace(name, **settings)
     except Exception as e:
         return {"error": f"Error creating workspace: {str(e)}"}
 
@@ -146,15 +125,8 @@ async def get_embedding_models() -> List[Dict[str, Any]]:
     Returns:
         A list of embedding models
     """
-    url = f"{BASE_URL}/api/v1/system/embedding-models"
-    
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.get(url, headers=HEADERS)
-            r.raise_for_status()
-            data = r.json()
-        
-        return data.get("embeddingModels", [])
+        return await client.embedding_models()
     except Exception as e:
         return [{"error": f"Error getting embedding models: {str(e)}"}]
 
@@ -166,15 +138,8 @@ async def get_llm_models() -> List[Dict[str, Any]]:
     Returns:
         A list of LLM models
     """
-    url = f"{BASE_URL}/api/v1/system/llm-models"
-    
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.get(url, headers=HEADERS)
-            r.raise_for_status()
-            data = r.json()
-        
-        return data.get("llmModels", [])
+        return await client.llm_models()
     except Exception as e:
         return [{"error": f"Error getting LLM models: {str(e)}"}]
 
@@ -182,18 +147,25 @@ async def get_llm_models() -> List[Dict[str, Any]]:
 async def get_system_info():
     """Return system information from AnythingLLM."""
     try:
-        url = f"{BASE_URL}/api/v1/system"
-        async with httpx.AsyncClient(timeout=10) as client:
-            r = await client.get(url, headers=HEADERS)
-            r.raise_for_status()
-            return r.json()
+        return await client.system()
     except Exception as e:
         return {
             "status": "error",
             "error": str(e)
         }
 
+@mcp.resource(uri="anythingllm://status")
+async def get_status():
+    """Return the circuit breaker state for the AnythingLLM connection (no request is made)."""
+    return {
+        "workspace": WORKSPACE,
+        "base_url": BASE_URL,
+        "circuit_breaker": client.breaker.stats()
+    }
+
  
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    # stdout carries the MCP protocol; logs go to stderr (or ANYTHINGLLM_LOG_FILE)
+    configure_logging()
+    mcp.run()